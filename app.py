@@ -688,7 +688,8 @@ def render_teacher_dashboard():
         import pandas as pd
         import plotly.express as px
         from modules.analytics import get_activity_summary, get_daily_activity_trend
-        from modules.auth import check_neo4j_available, get_all_students, get_all_modules_statistics, get_single_module_statistics, get_neo4j_driver, get_neo4j_driver
+        from modules.auth import check_neo4j_available, get_all_students, get_all_modules_statistics, get_single_module_statistics
+        from modules.graph_repository import read_query
         
         # 顶部标题和刷新按钮
         header_col1, header_col2 = st.columns([6, 1])
@@ -704,7 +705,11 @@ def render_teacher_dashboard():
             """, unsafe_allow_html=True)
         with header_col2:
             if st.button("🔄 刷新数据", key="refresh_teacher_data", use_container_width=True):
+                from modules.query_cache import get_query_cache
+                from modules.data_provider import invalidate_knowledge_graph
                 st.cache_data.clear()
+                get_query_cache().clear()
+                invalidate_knowledge_graph()
                 st.rerun()
         
         # 显示加载进度
@@ -907,32 +912,30 @@ def render_teacher_dashboard():
     if has_neo4j:
         # 从数据库获取学生活动统计
         try:
-            driver = get_neo4j_driver()
-            with driver.session() as session:
-                result = session.run("""
-                    MATCH (s:mfx_Student)-[:PERFORMED]->(a:mfx_Activity)
-                    RETURN s.student_id as student_id, 
-                           s.name as name,
-                           count(a) as activity_count,
-                           count(DISTINCT date(a.timestamp)) as active_days
-                    ORDER BY activity_count DESC
-                    LIMIT 10
-                """)
-                
-                leaderboard = []
-                for i, record in enumerate(result):
-                    leaderboard.append({
-                        "排名": "🥇" if i == 0 else ("🥈" if i == 1 else ("🥉" if i == 2 else str(i+1))),
-                        "学号": record['student_id'],
-                        "姓名": record['name'] if record['name'] else "未设置",
-                        "学习记录数": record['activity_count'],
-                        "活跃天数": record['active_days']
-                    })
-                
-                if leaderboard:
-                    st.dataframe(pd.DataFrame(leaderboard), use_container_width=True, hide_index=True)
-                else:
-                    st.info("暂无学生学习数据")
+            records = read_query("""
+                MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)
+                RETURN s.student_id as student_id, 
+                       s.name as name,
+                       count(a) as activity_count,
+                       count(DISTINCT a.day_key) as active_days
+                ORDER BY activity_count DESC
+                LIMIT 10
+            """, name="学习排行榜")
+            
+            leaderboard = []
+            for i, record in enumerate(records):
+                leaderboard.append({
+                    "排名": "🥇" if i == 0 else ("🥈" if i == 1 else ("🥉" if i == 2 else str(i+1))),
+                    "学号": record['student_id'],
+                    "姓名": record['name'] if record['name'] else "未设置",
+                    "学习记录数": record['activity_count'],
+                    "活跃天数": record['active_days']
+                })
+            
+            if leaderboard:
+                st.dataframe(pd.DataFrame(leaderboard), use_container_width=True, hide_index=True)
+            else:
+                st.info("暂无学生学习数据")
         except Exception as e:
             st.error(f"获取排行榜数据失败: {e}")
     else:
@@ -941,7 +944,8 @@ def render_teacher_dashboard():
 def render_home_page(user):
     """渲染首页"""
     # 导入必要的函数
-    from modules.auth import check_neo4j_available, get_neo4j_driver
+    from modules.auth import check_neo4j_available
+    from modules.graph_repository import read_value
     from modules.data_provider import get_all_cases, get_knowledge_modules
     from data.abilities_gfz import ABILITIES_GFZ
     
@@ -957,11 +961,9 @@ def render_home_page(user):
             
             # 从 Neo4j 获取知识点数量
             try:
-                driver = get_neo4j_driver()
-                with driver.session() as session:
-                    result = session.run("MATCH (k:gfz_KnowledgePoint) RETURN count(k) as count")
-                    knowledge_points = result.single()['count']
-            except:
+                knowledge_points = read_value("MATCH (k:gfz_KnowledgePoint) RETURN count(k) as count",
+                                              name="知识点数量")
+            except Exception:
                 # 备用方案：计算模块中的知识点
                 modules = get_knowledge_modules()
                 knowledge_points = sum(module.get('kp_count', 0) for module in modules)
@@ -1099,8 +1101,10 @@ def render_home_page(user):
 
 def render_module_analytics(module_name):
     """渲染教师端模块数据分析页面"""
-    from modules.auth import check_neo4j_available, get_all_students, get_student_activities, get_single_module_statistics, get_neo4j_driver
+    from modules.auth import check_neo4j_available, get_all_students, get_student_activities, get_single_module_statistics
+    from modules.graph_repository import read_query
     from modules.ability_recommender import ABILITY_ID_TO_NAME
+    from modules.analytics import render_activity_pages
     import pandas as pd
     
     def convert_id_to_name(content):
@@ -1221,6 +1225,10 @@ def render_module_analytics(module_name):
                             "详情": details
                         })
                     st.dataframe(pd.DataFrame(records), use_container_width=True, hide_index=True)
+                    
+                    # 更早的记录按需分页加载
+                    with st.expander("📜 查看全部学习记录"):
+                        render_activity_pages(f"app_{module_name}", student_id=selected_student_id, module=module_name)
                 else:
                     st.info(f"该学生暂无{module_name}学习记录")
     
@@ -1266,29 +1274,27 @@ def render_module_analytics(module_name):
         # 显示活跃学生排行
         st.markdown(f"#### 🏆 {module_name}学习排行榜")
         try:
-            driver = get_neo4j_driver()
-            with driver.session() as session:
-                result = session.run("""
-                    MATCH (s:mfx_Student)-[:PERFORMED]->(a:mfx_Activity)
-                    WHERE COALESCE(a.module_name, a.module) = $module_name
-                    RETURN s.student_id as student_id, 
-                           count(a) as activity_count
-                    ORDER BY activity_count DESC
-                    LIMIT 10
-                """, module_name=module_name)
-                
-                ranking = []
-                for i, record in enumerate(result):
-                    ranking.append({
-                        "排名": "🥇" if i == 0 else ("🥈" if i == 1 else ("🥉" if i == 2 else str(i+1))),
-                        "学号": record['student_id'],
-                        "学习记录数": record['activity_count']
-                    })
-                
-                if ranking:
-                    st.dataframe(pd.DataFrame(ranking), use_container_width=True, hide_index=True)
-                else:
-                    st.info(f"暂无{module_name}学习数据")
+            records = read_query("""
+                MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)
+                WHERE COALESCE(a.module_name, a.module) = $module_name
+                RETURN s.student_id as student_id, 
+                       count(a) as activity_count
+                ORDER BY activity_count DESC
+                LIMIT 10
+            """, {"module_name": module_name}, name="模块学习排行")
+            
+            ranking = []
+            for i, record in enumerate(records):
+                ranking.append({
+                    "排名": "🥇" if i == 0 else ("🥈" if i == 1 else ("🥉" if i == 2 else str(i+1))),
+                    "学号": record['student_id'],
+                    "学习记录数": record['activity_count']
+                })
+            
+            if ranking:
+                st.dataframe(pd.DataFrame(ranking), use_container_width=True, hide_index=True)
+            else:
+                st.info(f"暂无{module_name}学习数据")
         except Exception as e:
             st.error(f"获取排行数据失败: {e}")
         
@@ -1324,29 +1330,27 @@ def render_module_analytics(module_name):
         st.markdown("##### 🏆 学习排行榜 (Top 10)")
         if has_neo4j:
             try:
-                driver = get_neo4j_driver()
-                with driver.session() as session:
-                    result = session.run("""
-                        MATCH (s:mfx_Student)-[:PERFORMED]->(a:mfx_Activity)
-                        WHERE COALESCE(a.module_name, a.module) = $module_name
-                        RETURN s.student_id as student_id, 
-                               count(a) as activity_count
-                        ORDER BY activity_count DESC
-                        LIMIT 10
-                    """, module_name=module_name)
-                    
-                    leaderboard = []
-                    for i, record in enumerate(result):
-                        leaderboard.append({
-                            "排名": "🥇" if i == 0 else ("🥈" if i == 1 else ("🥉" if i == 2 else str(i+1))),
-                            "学号": record['student_id'],
-                            "学习记录数": record['activity_count']
-                        })
-                    
-                    if leaderboard:
-                        st.dataframe(pd.DataFrame(leaderboard), use_container_width=True, hide_index=True)
-                    else:
-                        st.info(f"暂无{module_name}学习数据")
+                records = read_query("""
+                    MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)
+                    WHERE COALESCE(a.module_name, a.module) = $module_name
+                    RETURN s.student_id as student_id, 
+                           count(a) as activity_count
+                    ORDER BY activity_count DESC
+                    LIMIT 10
+                """, {"module_name": module_name}, name="模块学习排行")
+                
+                leaderboard = []
+                for i, record in enumerate(records):
+                    leaderboard.append({
+                        "排名": "🥇" if i == 0 else ("🥈" if i == 1 else ("🥉" if i == 2 else str(i+1))),
+                        "学号": record['student_id'],
+                        "学习记录数": record['activity_count']
+                    })
+                
+                if leaderboard:
+                    st.dataframe(pd.DataFrame(leaderboard), use_container_width=True, hide_index=True)
+                else:
+                    st.info(f"暂无{module_name}学习数据")
             except Exception as e:
                 st.error(f"获取排行榜失败: {e}")
         else:
@@ -1355,8 +1359,12 @@ def render_module_analytics(module_name):
 def render_data_management():
     """渲染数据管理页面"""
     import pandas as pd
-    import io
-    from modules.auth import get_neo4j_driver, check_neo4j_available
+    from modules.auth import check_neo4j_available
+    from modules.graph_repository import read_query, read_transaction, write_query
+    from modules.query_cache import TAG_ACTIVITY, TAG_MODULE_STATS, TAG_STUDENT, invalidate
+    from modules.bulk_delete import delete_student, delete_all_data
+    from modules.bulk_delete import delete_all_activities as bulk_delete_all_activities
+    from modules.analytics import delete_progress_callback, render_pending_delete_jobs
     
     st.markdown("""
     <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
@@ -1374,6 +1382,9 @@ def render_data_management():
         st.warning("⚠️ 数据库连接不可用，无法进行数据管理操作")
         return
     
+    # 上次中断的批量删除任务
+    render_pending_delete_jobs("data_management")
+    
     # 创建选项卡
     tab1, tab2, tab3, tab4 = st.tabs(["📥 数据导出", "👥 学生管理", "📝 活动记录管理", "🔧 数据修复"])
     
@@ -1389,22 +1400,19 @@ def render_data_management():
             if st.button("📥 导出所有学生数据", key="export_students", use_container_width=True):
                 with st.spinner("正在导出学生数据..."):
                     try:
-                        driver = get_neo4j_driver()
-                        with driver.session() as session:
-                            result = session.run("""
-                                MATCH (s:mfx_Student)
-                                OPTIONAL MATCH (s)-[r:PERFORMED]->(a:mfx_Activity)
-                                WITH s, count(r) as activity_count, 
-                                     max(a.timestamp) as last_activity
-                                RETURN s.student_id as 学号, 
-                                       s.name as 姓名,
-                                       COALESCE(s.login_count, 0) as 登录次数,
-                                       activity_count as 学习记录数,
-                                       toString(s.last_login) as 最后登录时间,
-                                       toString(last_activity) as 最后学习时间
-                                ORDER BY s.student_id
-                            """)
-                            data = [dict(record) for record in result]
+                        data = read_query("""
+                            MATCH (s:gfz_Student)
+                            OPTIONAL MATCH (s)-[r:PERFORMED]->(a:gfz_Activity)
+                            WITH s, count(r) as activity_count, 
+                                 max(a.timestamp) as last_activity
+                            RETURN s.student_id as 学号, 
+                                   s.name as 姓名,
+                                   COALESCE(s.login_count, 0) as 登录次数,
+                                   activity_count as 学习记录数,
+                                   toString(s.last_login) as 最后登录时间,
+                                   toString(last_activity) as 最后学习时间
+                            ORDER BY s.student_id
+                        """, max_rows=None, name="导出学生数据")
                         
                         if data:
                             df = pd.DataFrame(data)
@@ -1428,20 +1436,17 @@ def render_data_management():
             if st.button("📥 导出所有学习记录", key="export_activities", use_container_width=True):
                 with st.spinner("正在导出学习记录..."):
                     try:
-                        driver = get_neo4j_driver()
-                        with driver.session() as session:
-                            result = session.run("""
-                                MATCH (s:mfx_Student)-[r:PERFORMED]->(a:mfx_Activity)
-                                RETURN s.student_id as 学号,
-                                       s.name as 姓名,
-                                       COALESCE(a.module_name, a.module) as 学习模块,
-                                       COALESCE(a.activity_type, a.type) as 活动类型,
-                                       a.content_name as 内容名称,
-                                       toString(a.timestamp) as 学习时间,
-                                       a.details as 详情
-                                ORDER BY a.timestamp DESC
-                            """)
-                            data = [dict(record) for record in result]
+                        data = read_query("""
+                            MATCH (s:gfz_Student)-[r:PERFORMED]->(a:gfz_Activity)
+                            RETURN s.student_id as 学号,
+                                   s.name as 姓名,
+                                   COALESCE(a.module_name, a.module) as 学习模块,
+                                   COALESCE(a.activity_type, a.type) as 活动类型,
+                                   a.content_name as 内容名称,
+                                   toString(a.timestamp) as 学习时间,
+                                   a.details as 详情
+                            ORDER BY a.timestamp DESC
+                        """, timeout=60, max_rows=None, name="导出学习记录")
                         
                         if data:
                             df = pd.DataFrame(data)
@@ -1470,15 +1475,12 @@ def render_data_management():
         # 添加调试工具
         with st.expander("🔧 调试工具：查看数据库中的模块名称", expanded=False):
             try:
-                driver = get_neo4j_driver()
-                with driver.session() as session:
-                    # 查询所有不同的模块名称(兼容新旧字段)
-                    result = session.run("""
-                        MATCH (a:mfx_Activity)
-                        RETURN DISTINCT COALESCE(a.module_name, a.module) as module_name, count(a) as count
-                        ORDER BY count DESC
-                    """)
-                    module_stats = [dict(record) for record in result]
+                # 查询所有不同的模块名称(兼容新旧字段)
+                module_stats = read_query("""
+                    MATCH (a:gfz_Activity)
+                    RETURN DISTINCT COALESCE(a.module_name, a.module) as module_name, count(a) as count
+                    ORDER BY count DESC
+                """, name="模块名称诊断")
                 
                 if module_stats:
                     st.write("**数据库中实际存储的模块名称及记录数：**")
@@ -1521,25 +1523,22 @@ def render_data_management():
             st.markdown(f"**正在查看：{display_module}**")
             with st.spinner(f"正在加载{display_module}数据..."):
                 try:
-                    driver = get_neo4j_driver()
-                    with driver.session() as session:
-                        # 添加调试信息
-                        st.write(f"🔍 查询参数: module_name = `{display_module}`")
-                        
-                        result = session.run("""
-                            MATCH (s:mfx_Student)-[r:PERFORMED]->(a:mfx_Activity)
-                            WHERE COALESCE(a.module_name, a.module) = $module
-                            RETURN s.student_id as 学号,
-                                   s.name as 姓名,
-                                   COALESCE(a.activity_type, a.type) as 活动类型,
-                                   a.content_name as 内容名称,
-                                   toString(a.timestamp) as 学习时间,
-                                   a.details as 详情
-                            ORDER BY a.timestamp DESC
-                        """, module=display_module)
-                        data = [dict(record) for record in result]
-                        
-                        st.write(f"🔍 查询结果: {len(data)}条记录")
+                    # 添加调试信息
+                    st.write(f"🔍 查询参数: module_name = `{display_module}`")
+                    
+                    data = read_query("""
+                        MATCH (s:gfz_Student)-[r:PERFORMED]->(a:gfz_Activity)
+                        WHERE COALESCE(a.module_name, a.module) = $module
+                        RETURN s.student_id as 学号,
+                               s.name as 姓名,
+                               COALESCE(a.activity_type, a.type) as 活动类型,
+                               a.content_name as 内容名称,
+                               toString(a.timestamp) as 学习时间,
+                               a.details as 详情
+                        ORDER BY a.timestamp DESC
+                    """, {"module": display_module}, timeout=60, max_rows=None, name="按模块导出")
+                    
+                    st.write(f"🔍 查询结果: {len(data)}条记录")
                     
                     if data:
                         df = pd.DataFrame(data)
@@ -1572,18 +1571,13 @@ def render_data_management():
         with col1:
             st.markdown("#### 📋 学生列表")
             try:
-                driver = get_neo4j_driver()
-                with driver.session() as session:
-                    result = session.run("""
-                        MATCH (s:mfx_Student)
-                        OPTIONAL MATCH (s)-[r:PERFORMED]->(a:mfx_Activity)
-                        WITH s, count(r) as activity_count
-                        RETURN s.student_id as student_id,
-                               s.name as name,
-                               activity_count
-                        ORDER BY s.student_id
-                    """)
-                    students = [dict(record) for record in result]
+                students = read_query("""
+                    MATCH (s:gfz_Student)
+                    RETURN s.student_id as student_id,
+                           s.name as name,
+                           COALESCE(s.activity_count, 0) as activity_count
+                    ORDER BY s.student_id
+                """, name="学生管理列表")
                 
                 if students:
                     df = pd.DataFrame(students)
@@ -1607,32 +1601,20 @@ def render_data_management():
                         st.session_state.confirm_delete = student_id_to_delete
                         st.warning(f"⚠️ 确认删除学号为 {student_id_to_delete} 的学生？再次点击确认删除。")
                     else:
+                        progress_bar = st.progress(0.0)
                         try:
-                            driver = get_neo4j_driver()
-                            with driver.session() as session:
-                                # 先删除关联的活动记录
-                                session.run("""
-                                    MATCH (s:mfx_Student {student_id: $student_id})-[r:PERFORMED]->(a:mfx_Activity)
-                                    DELETE r, a
-                                """, student_id=student_id_to_delete)
-                                
-                                # 再删除学生节点
-                                result = session.run("""
-                                    MATCH (s:mfx_Student {student_id: $student_id})
-                                    DELETE s
-                                    RETURN count(s) as deleted_count
-                                """, student_id=student_id_to_delete)
-                                
-                                deleted = result.single()['deleted_count']
-                                
-                            if deleted > 0:
-                                st.success(f"✅ 已删除学号 {student_id_to_delete} 及其所有学习记录")
+                            # 分批删除活动记录，全部完成后再删除学生节点并更新汇总计数
+                            deleted = delete_student(student_id_to_delete,
+                                                     progress=delete_progress_callback(progress_bar))
+                            
+                            if deleted is not None:
+                                st.success(f"✅ 已删除学号 {student_id_to_delete} 及其 {deleted} 条学习记录")
                                 st.session_state.confirm_delete = None
                                 st.rerun()
                             else:
                                 st.error(f"未找到学号为 {student_id_to_delete} 的学生")
                         except Exception as e:
-                            st.error(f"删除失败: {e}")
+                            st.error(f"删除中断（已删除部分保留，可在上方继续）: {e}")
                 else:
                     st.warning("请输入学号")
     
@@ -1645,18 +1627,15 @@ def render_data_management():
         with col1:
             st.markdown("#### 📊 最近活动记录")
             try:
-                driver = get_neo4j_driver()
-                with driver.session() as session:
-                    result = session.run("""
-                        MATCH (s:mfx_Student)-[r:PERFORMED]->(a:mfx_Activity)
-                        RETURN s.student_id as 学号,
-                               a.module_name as 模块,
-                               a.activity_type as 类型,
-                               toString(a.timestamp) as 时间
-                        ORDER BY a.timestamp DESC
-                        LIMIT 100
-                    """)
-                    activities = [dict(record) for record in result]
+                activities = read_query("""
+                    MATCH (s:gfz_Student)-[r:PERFORMED]->(a:gfz_Activity)
+                    RETURN s.student_id as 学号,
+                           a.module_name as 模块,
+                           a.activity_type as 类型,
+                           toString(a.timestamp) as 时间
+                    ORDER BY a.timestamp DESC
+                    LIMIT 100
+                """, name="最近活动记录")
                 
                 if activities:
                     df = pd.DataFrame(activities)
@@ -1676,23 +1655,17 @@ def render_data_management():
                     st.session_state.confirm_clear_activities = True
                     st.warning("⚠️ 将删除所有学习记录（不删除学生）！再次点击确认。")
                 else:
+                    progress_bar = st.progress(0.0)
                     try:
-                        driver = get_neo4j_driver()
-                        with driver.session() as session:
-                            # 先统计数量
-                            count_result = session.run("MATCH (a:mfx_Activity) RETURN count(a) as count")
-                            deleted = count_result.single()['count']
-                            # 再删除
-                            session.run("MATCH (a:mfx_Activity) DETACH DELETE a")
-                        
-                        # 清除相关缓存
+                        # 分批删除，全部完成后才清空汇总计数和查询缓存
+                        deleted = bulk_delete_all_activities(progress=delete_progress_callback(progress_bar))
                         st.cache_data.clear()
                         
                         st.success(f"✅ 已清除 {deleted} 条学习记录，缓存已清空")
                         st.session_state.confirm_clear_activities = False
                         st.rerun()
                     except Exception as e:
-                        st.error(f"清除失败: {e}")
+                        st.error(f"清除中断（已删除部分保留，可在上方继续）: {e}")
             
             st.markdown("<br>", unsafe_allow_html=True)
             
@@ -1701,31 +1674,17 @@ def render_data_management():
                     st.session_state.confirm_clear_all = True
                     st.error("⚠️ 将删除所有学生和学习记录！再次点击确认。")
                 else:
+                    progress_bar = st.progress(0.0)
                     try:
-                        driver = get_neo4j_driver()
-                        with driver.session() as session:
-                            # 先统计数量
-                            count_result = session.run("""
-                                MATCH (n)
-                                WHERE n:mfx_Student OR n:mfx_Activity
-                                RETURN count(n) as count
-                            """)
-                            deleted = count_result.single()['count']
-                            # 再删除
-                            session.run("""
-                                MATCH (n)
-                                WHERE n:mfx_Student OR n:mfx_Activity
-                                DETACH DELETE n
-                            """)
-                        
-                        # 清除相关缓存
+                        # 先分批删除活动记录，再分批删除学生，全部完成后才清空汇总计数和查询缓存
+                        deleted = delete_all_data(progress=delete_progress_callback(progress_bar))
                         st.cache_data.clear()
                         
                         st.success(f"✅ 已清除 {deleted} 个节点（学生和活动记录），缓存已清空")
                         st.session_state.confirm_clear_all = False
                         st.rerun()
                     except Exception as e:
-                        st.error(f"清除失败: {e}")
+                        st.error(f"清除中断（已删除部分保留，可在上方继续）: {e}")
     
     # ===== 数据修复 =====
     with tab4:
@@ -1734,84 +1693,110 @@ def render_data_management():
         
         st.markdown("#### 问题诊断")
         
-        try:
-            driver = get_neo4j_driver()
-            with driver.session() as session:
-                # 检查 module 字段（旧字段名）
-                result1 = session.run("""
-                    MATCH (a:mfx_Activity)
-                    WHERE a.module IS NOT NULL
-                    RETURN count(a) as count
-                """)
-                old_field_count = result1.single()['count']
-                
-                # 检查 module_name 字段（新字段名）
-                result2 = session.run("""
-                    MATCH (a:mfx_Activity)
-                    WHERE a.module_name IS NOT NULL
+        def count_fields_tx(tx):
+            counts = {}
+            for field in ('module', 'module_name', 'type', 'activity_type'):
+                counts[field] = tx.run(f"""
+                    MATCH (a:gfz_Activity)
+                    WHERE a.{field} IS NOT NULL
                     RETURN count(a) as count
-                """)
-                new_field_count = result2.single()['count']
-                
-                # 检查 activity_type 字段
-                result3 = session.run("""
-                    MATCH (a:mfx_Activity)
-                    WHERE a.activity_type IS NOT NULL
-                    RETURN count(a) as count
-                """)
-                activity_type_count = result3.single()['count']
-                
-                # 检查 type 字段（旧字段名）
-                result4 = session.run("""
-                    MATCH (a:mfx_Activity)
-                    WHERE a.type IS NOT NULL
-                    RETURN count(a) as count
-                """)
-                old_type_count = result4.single()['count']
+                """).single()['count']
+            return counts
+        
+        try:
+            # 检查新旧字段名（module/module_name、type/activity_type）的使用情况
+            field_counts = read_transaction(count_fields_tx, name="字段诊断")
+            old_field_count = field_counts['module']
+            new_field_count = field_counts['module_name']
+            activity_type_count = field_counts['activity_type']
+            old_type_count = field_counts['type']
+            
+            st.write("**字段使用情况：**")
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("使用旧字段 'module' 的记录", old_field_count)
+                st.metric("使用新字段 'module_name' 的记录", new_field_count)
+            with col2:
+                st.metric("使用旧字段 'type' 的记录", old_type_count)
+                st.metric("使用新字段 'activity_type' 的记录", activity_type_count)
+            
+            if old_field_count > 0 or old_type_count > 0:
+                st.error(f"⚠️ 发现 {old_field_count} 条使用旧字段名的记录，需要修复")
                 
-                st.write("**字段使用情况：**")
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.metric("使用旧字段 'module' 的记录", old_field_count)
-                    st.metric("使用新字段 'module_name' 的记录", new_field_count)
-                with col2:
-                    st.metric("使用旧字段 'type' 的记录", old_type_count)
-                    st.metric("使用新字段 'activity_type' 的记录", activity_type_count)
+                if st.button("🔧 修复历史数据字段名", key="fix_fields", type="primary"):
+                    with st.spinner("正在修复数据..."):
+                        try:
+                            # 修复 module -> module_name
+                            write_query("""
+                                MATCH (a:gfz_Activity)
+                                WHERE a.module IS NOT NULL
+                                SET a.module_name = a.module
+                                REMOVE a.module
+                            """, name="修复module字段")
+                            
+                            # 修复 type -> activity_type
+                            write_query("""
+                                MATCH (a:gfz_Activity)
+                                WHERE a.type IS NOT NULL
+                                SET a.activity_type = a.type
+                                REMOVE a.type
+                            """, name="修复type字段")
+                            invalidate(TAG_ACTIVITY, TAG_MODULE_STATS)
+                            
+                            st.success("✅ 字段名修复完成！")
+                            st.info("💡 页面将在3秒后刷新...")
+                            import time
+                            time.sleep(3)
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"修复失败: {e}")
+            else:
+                st.success("✅ 所有数据字段名正确，无需修复")
                 
-                if old_field_count > 0 or old_type_count > 0:
-                    st.error(f"⚠️ 发现 {old_field_count} 条使用旧字段名的记录，需要修复")
-                    
-                    if st.button("🔧 修复历史数据字段名", key="fix_fields", type="primary"):
-                        with st.spinner("正在修复数据..."):
-                            try:
-                                # 修复 module -> module_name
-                                session.run("""
-                                    MATCH (a:mfx_Activity)
-                                    WHERE a.module IS NOT NULL
-                                    SET a.module_name = a.module
-                                    REMOVE a.module
-                                """)
-                                
-                                # 修复 type -> activity_type
-                                session.run("""
-                                    MATCH (a:mfx_Activity)
-                                    WHERE a.type IS NOT NULL
-                                    SET a.activity_type = a.type
-                                    REMOVE a.type
-                                """)
-                                
-                                st.success("✅ 字段名修复完成！")
-                                st.info("💡 页面将在3秒后刷新...")
-                                import time
-                                time.sleep(3)
-                                st.rerun()
-                            except Exception as e:
-                                st.error(f"修复失败: {e}")
-                else:
-                    st.success("✅ 所有数据字段名正确，无需修复")
-                    
         except Exception as e:
             st.error(f"诊断失败: {e}")
+        
+        st.markdown("#### 统计汇总重建")
+        st.caption("模块/学生统计读取写入时维护的汇总计数；导入历史数据或修复字段后，可从原始活动记录重新计算")
+        if st.button("🔄 重建统计汇总", key="rebuild_rollups"):
+            with st.spinner("正在从原始活动记录重建汇总..."):
+                try:
+                    from modules.activity_rollup import rebuild_rollups
+                    timings = rebuild_rollups()
+                    st.cache_data.clear()
+                    invalidate(TAG_ACTIVITY, TAG_STUDENT, TAG_MODULE_STATS)
+                    st.success(f"✅ 汇总重建完成，总用时 {sum(timings.values()):.2f} 秒")
+                except Exception as e:
+                    st.error(f"重建失败: {e}")
+        
+        st.markdown("#### 活动日键回填")
+        st.caption("今日/近7天/趋势统计按活动写入时记录的日键查询，教师端按模块筛选活动只比较 module_name 字段；"
+                   "升级前的历史活动需要回填一次（同时为只有旧字段 module 的记录补写 module_name），可随时中断后重新运行")
+        # 统计缺少日键的记录需要扫描全部活动（day_key IS NULL 无法走索引），只在点击诊断时执行，结果保存在会话中
+        missing_keys = st.session_state.get('missing_activity_keys')
+        if st.button("🔍 诊断缺少日键的记录", key="count_missing_day_keys"):
+            try:
+                from modules.activity_rollup import count_missing_keys
+                missing_keys = count_missing_keys()
+                st.session_state['missing_activity_keys'] = missing_keys
+            except Exception as e:
+                st.error(f"诊断失败: {e}")
+        if missing_keys is None:
+            st.caption("统计需要扫描全部活动记录，点击上方按钮后显示")
+        else:
+            st.metric("缺少日键/模块字段的活动记录", missing_keys)
+        if missing_keys and st.button("🗓️ 回填日键/小时键", key="backfill_day_keys"):
+            from modules.activity_rollup import backfill_activity_keys
+            progress_bar = st.progress(0.0)
+            try:
+                total = backfill_activity_keys(
+                    progress=lambda done: progress_bar.progress(min(done / missing_keys, 1.0))
+                )
+                invalidate(TAG_ACTIVITY, TAG_STUDENT, TAG_MODULE_STATS)
+                st.session_state.pop('missing_activity_keys', None)
+                st.success(f"✅ 已回填 {total} 条活动记录")
+            except Exception as e:
+                st.error(f"回填失败（已提交的批次不受影响，可重新运行继续）: {e}")
 
 def render_system_settings():
     """渲染系统设置页面（仅教师可用）"""
@@ -1911,6 +1896,150 @@ def render_system_settings():
         </div>
         """, unsafe_allow_html=True)
 
+    # Neo4j 连接健康状态
+    st.markdown("---")
+    st.markdown("### 🩺 Neo4j 连接健康")
+    from modules.neo4j_health import get_health_stats
+    health_stats = get_health_stats()
+    if health_stats:
+        health_cols = st.columns(4)
+        with health_cols[0]:
+            st.metric("熔断器状态", health_stats['state_label'])
+        with health_cols[1]:
+            st.metric("最近探测耗时", f"{health_stats['last_probe_ms']}ms")
+        with health_cols[2]:
+            st.metric("平均探测耗时", f"{health_stats['avg_probe_ms']}ms")
+        with health_cols[3]:
+            st.metric("探测失败/总数", f"{health_stats['probe_failures']}/{health_stats['probes']}")
+        if health_stats['state'] != 'closed':
+            st.warning(f"⚠️ 连接异常，{health_stats['retry_in_seconds']}秒后重试：{health_stats['last_error']}")
+        if health_stats['transitions']:
+            with st.expander("状态切换记录"):
+                import pandas as pd
+                st.dataframe(pd.DataFrame(health_stats['transitions'][::-1]), use_container_width=True)
+    else:
+        st.info("本进程尚未检查 Neo4j 连接")
+    
+    # 数据库访问统计
+    st.markdown("### 🗄️ 数据库访问统计")
+    from modules.graph_repository import get_repository_stats
+    repo_stats = get_repository_stats()
+    repo_cols = st.columns(4)
+    with repo_cols[0]:
+        st.metric("读/写次数", f"{repo_stats['reads']}/{repo_stats['writes']}")
+    with repo_cols[1]:
+        st.metric("平均耗时", f"{repo_stats['avg_ms']}ms")
+    with repo_cols[2]:
+        st.metric("最大耗时", f"{repo_stats['max_ms']}ms")
+    with repo_cols[3]:
+        st.metric("重试/失败", f"{repo_stats['retries']}/{repo_stats['failures']}")
+    if repo_stats['truncated']:
+        st.caption(f"有 {repo_stats['truncated']} 次查询结果超过行数上限被截断")
+    if repo_stats['last_error']:
+        st.caption(f"最近一次失败：{repo_stats['last_error']}")
+    
+    from modules.query_cache import get_query_cache_stats
+    cache_stats = get_query_cache_stats()
+    cache_cols = st.columns(4)
+    with cache_cols[0]:
+        st.metric("缓存命中/未命中", f"{cache_stats['hits']}/{cache_stats['misses']}")
+    with cache_cols[1]:
+        st.metric("缓存命中率", f"{cache_stats['hit_rate'] * 100:.1f}%")
+    with cache_cols[2]:
+        st.metric("缓存条目数", cache_stats['entries'])
+    with cache_cols[3]:
+        st.metric("失效/淘汰", f"{cache_stats['invalidations']}/{cache_stats['evictions']}")
+    
+    # 按查询统计：耗时分位数、返回行数、主要调用方和抽样 db hits
+    from modules import graph_repository
+    from modules.query_metrics import get_query_metrics
+    query_metrics = get_query_metrics()
+    query_rows = query_metrics.snapshot()
+    with st.expander(f"📈 查询耗时明细（{len(query_rows)} 类查询）"):
+        if query_rows:
+            import pandas as pd
+            st.dataframe(pd.DataFrame(query_rows).rename(columns={
+                'fingerprint': '指纹', 'name': '名称', 'access_mode': '读/写', 'top_caller': '主要调用方',
+                'count': '次数', 'errors': '失败', 'p50_ms': 'p50(ms)', 'p95_ms': 'p95(ms)',
+                'p99_ms': 'p99(ms)', 'max_ms': '最大(ms)', 'total_ms': '总耗时(ms)',
+                'avg_rows': '平均行数', 'profiled': 'PROFILE次数', 'avg_db_hits': '平均db hits',
+                'query': '查询'
+            }), use_container_width=True)
+            import time
+            st.download_button(
+                "📥 导出 CSV",
+                data=query_metrics.to_csv().encode('utf-8-sig'),
+                file_name=f"query_metrics_{time.strftime('%Y%m%d_%H%M%S')}.csv",
+                mime="text/csv"
+            )
+        else:
+            st.info("本进程尚未执行数据库查询")
+        
+        sample_rate = st.slider(
+            "PROFILE 抽样比例（%）", 0, 100, int(graph_repository.PROFILE_SAMPLE_RATE * 100),
+            help="单条语句查询按此比例加 PROFILE 执行以记录 db hits，会增加这些查询的耗时"
+        )
+        if sample_rate / 100 != graph_repository.PROFILE_SAMPLE_RATE:
+            graph_repository.set_profile_sample_rate(sample_rate / 100)
+        if st.button("🔄 重置查询统计"):
+            query_metrics.reset()
+            st.rerun()
+    
+    # 活动日志写入状态
+    st.markdown("---")
+    st.markdown("### 📝 活动日志写入状态")
+    from modules.activity_writer import get_activity_writer_stats
+    writer_stats = get_activity_writer_stats()
+    if writer_stats:
+        writer_cols = st.columns(4)
+        with writer_cols[0]:
+            st.metric("队列深度", writer_stats['queue_depth'])
+        with writer_cols[1]:
+            st.metric("已写入", writer_stats['written'])
+        with writer_cols[2]:
+            st.metric("最近批次耗时", f"{writer_stats['last_flush_ms']}ms")
+        with writer_cols[3]:
+            st.metric("平均批次耗时", f"{writer_stats['avg_flush_ms']}ms")
+        if writer_stats['dropped']:
+            st.warning(f"⚠️ 已丢弃 {writer_stats['dropped']} 条活动记录，最近错误：{writer_stats['last_error']}")
+    else:
+        st.info("本进程尚未记录学习活动")
+    
+    from modules.activity_spool import get_activity_spool
+    spool_stats = get_activity_spool().stats()
+    if spool_stats['pending_segments']:
+        st.warning(f"💾 本地暂存 {spool_stats['pending_segments']} 个待回放分段"
+                   f"（{spool_stats['pending_bytes'] / 1024:.1f} KB），Neo4j 恢复后将自动回放")
+    if spool_stats['evicted_segments']:
+        st.error(f"⚠️ 本地暂存超出磁盘上限，已淘汰 {spool_stats['evicted_segments']} 个最旧分段")
+    
+    # AI 响应缓存
+    st.markdown("---")
+    st.markdown("### 🤖 AI 响应缓存")
+    from modules.llm_cache import get_llm_cache
+    llm_cache = get_llm_cache()
+    llm_stats = llm_cache.stats()
+    llm_cols = st.columns(4)
+    with llm_cols[0]:
+        st.metric("命中/未命中", f"{llm_stats['hits']}/{llm_stats['misses']}")
+    with llm_cols[1]:
+        st.metric("命中率", f"{llm_stats['hit_rate'] * 100:.1f}%")
+    with llm_cols[2]:
+        st.metric("缓存条目数", llm_stats['entries'])
+    with llm_cols[3]:
+        st.metric("过期/淘汰", f"{llm_stats['expired']}/{llm_stats['evictions']}")
+    if llm_stats['errors']:
+        st.caption(f"缓存读写出错 {llm_stats['errors']} 次（出错时直接调用 AI，不影响使用）")
+    if st.button("🗑️ 清空 AI 响应缓存"):
+        llm_cache.clear()
+        st.rerun()
+    from modules.llm_client import HAS_HTTP2, reset_llm_client
+    st.caption(f"AI 接口共用一个连接池（HTTP/2：{'已启用' if HAS_HTTP2 else '未安装 h2，使用 HTTP/1.1'}）；"
+               "网络切换或连接长时间异常时可重建，下次调用 AI 时重新建立连接")
+    if st.button("🔌 重建 AI 连接池"):
+        reset_llm_client()
+        st.success("✅ 已关闭旧连接，下次调用 AI 时重新建立")
+
 # 确保 session_state 在程序开始时就被初始化
 def init_session_state():
     """初始化所有 session_state 变量"""
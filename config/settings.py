@@ -48,11 +48,30 @@ ELASTICSEARCH_CLOUD_ID = get_secret("ELASTICSEARCH_CLOUD_ID", None)
 ELASTICSEARCH_USERNAME = get_secret("ELASTICSEARCH_USERNAME", None)
 ELASTICSEARCH_PASSWORD = get_secret("ELASTICSEARCH_PASSWORD", None)
 
+# 学习活动本地落盘目录（Neo4j 不可用时暂存活动日志，恢复后自动回放）
+ACTIVITY_SPOOL_DIR = get_secret(
+    "ACTIVITY_SPOOL_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".spool", "activity")
+)
+
+# AI 响应本地缓存文件（SQLite，相同的学习路径请求直接返回缓存结果）
+LLM_CACHE_PATH = get_secret(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "llm_cache.sqlite3")
+)
+
 # DeepSeek API配置
 # 注意：生产环境必须通过 Streamlit Secrets 或环境变量配置
 DEEPSEEK_API_KEY = get_secret("DEEPSEEK_API_KEY", None)
 DEEPSEEK_BASE_URL = "https://api.deepseek.com/v1"
 
+# AI 接口 HTTP 客户端：所有 AI 功能共享一个连接池（超时单位为秒）
+LLM_TIMEOUT = float(get_secret("LLM_TIMEOUT", 60))
+LLM_CONNECT_TIMEOUT = float(get_secret("LLM_CONNECT_TIMEOUT", 10))
+LLM_MAX_CONNECTIONS = int(get_secret("LLM_MAX_CONNECTIONS", 20))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(get_secret("LLM_MAX_KEEPALIVE_CONNECTIONS", 10))
+LLM_KEEPALIVE_EXPIRY = float(get_secret("LLM_KEEPALIVE_EXPIRY", 60))
+
 # 应用配置 (高分子课程)
 APP_TITLE_GFZ = "高分子自适应学习系统"
 APP_ICON_GFZ = "🧪"
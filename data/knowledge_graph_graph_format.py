@@ -131,13 +131,139 @@ def convert_tree_to_graph():
         "relationships": relationships
     }
 
+# 模块子图沿这些关系向下展开（模块 -包含-> 章节 -教学-> 知识点）
+CONTAINMENT_TYPES = ("包含", "教学")
+
+
+class KnowledgeGraphIndex:
+    """
+    节点+关系图谱的只读索引，构建一次后按 id、邻接表、分类和模块查找
+    - 节点查找 O(1)，相关节点 O(度数)，模块子图为从模块出发的 BFS
+    - 返回的节点和关系字典与原始数据是同一对象，调用方不要修改
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        nodes = graph.get("nodes", [])
+        relationships = graph.get("relationships", [])
+        
+        self._nodes = {}
+        self._position = {}
+        self._by_category = {}
+        for position, node in enumerate(nodes):
+            self._nodes[node["id"]] = node
+            self._position[node["id"]] = position
+            self._by_category.setdefault(node["category"], []).append(node)
+        
+        # 邻接表：节点 id -> [(关系序号, 关系)]，保持原始关系顺序
+        self._outgoing = {}
+        self._incoming = {}
+        for position, rel in enumerate(relationships):
+            self._outgoing.setdefault(rel["source"], []).append((position, rel))
+            if rel["target"] != rel["source"]:
+                self._incoming.setdefault(rel["target"], []).append((position, rel))
+        
+        # 模块索引：模块 id -> 其下所有节点 id（章节记录 parent_module，知识点记录 parent_chapter）
+        self._module_of = {}
+        for node in nodes:
+            properties = node.get("properties", {})
+            if node["category"] == "模块":
+                self._module_of[node["id"]] = node["id"]
+            elif properties.get("parent_module"):
+                self._module_of[node["id"]] = properties["parent_module"]
+        for node in nodes:
+            parent_chapter = node.get("properties", {}).get("parent_chapter")
+            if parent_chapter in self._module_of and node["id"] not in self._module_of:
+                self._module_of[node["id"]] = self._module_of[parent_chapter]
+        self._by_module = {}
+        for node in nodes:
+            module_id = self._module_of.get(node["id"])
+            if module_id is not None:
+                self._by_module.setdefault(module_id, []).append(node)
+        
+        self._subgraphs = {}
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def get_node(self, node_id):
+        return self._nodes.get(node_id)
+
+    def get_module_id(self, node_id):
+        """节点所属模块的 id（模块节点返回自身）"""
+        return self._module_of.get(node_id)
+
+    def get_nodes_by_category(self, category):
+        return list(self._by_category.get(category, ()))
+
+    def get_nodes_by_module(self, module_id):
+        return list(self._by_module.get(module_id, ()))
+
+    def get_related_nodes(self, node_id):
+        """与 get_related_nodes() 相同的结构：{"outgoing": [...], "incoming": [...]}"""
+        related = {"outgoing": [], "incoming": []}
+        for _, rel in self._outgoing.get(node_id, ()):
+            target_node = self._nodes.get(rel["target"])
+            if target_node:
+                related["outgoing"].append({"node": target_node, "relationship": rel})
+        for _, rel in self._incoming.get(node_id, ()):
+            source_node = self._nodes.get(rel["source"])
+            if source_node:
+                related["incoming"].append({"node": source_node, "relationship": rel})
+        return related
+
+    def subgraph(self, root_id, rel_types=CONTAINMENT_TYPES, max_depth=None):
+        """
+        从 root_id 沿 rel_types 类型的出边做 BFS，返回可达节点及它们之间的全部关系
+        结果按 (root_id, rel_types, max_depth) 缓存；节点和关系保持原始顺序
+        """
+        key = (root_id, tuple(rel_types), max_depth)
+        cached = self._subgraphs.get(key)
+        if cached is not None:
+            return cached
+        
+        if root_id not in self._nodes:
+            return {"nodes": [], "relationships": []}
+        visited = {root_id}
+        frontier = [root_id]
+        depth = 0
+        while frontier and (max_depth is None or depth < max_depth):
+            next_frontier = []
+            for node_id in frontier:
+                for _, rel in self._outgoing.get(node_id, ()):
+                    target = rel["target"]
+                    if rel["type"] in rel_types and target not in visited and target in self._nodes:
+                        visited.add(target)
+                        next_frontier.append(target)
+            frontier = next_frontier
+            depth += 1
+        
+        node_ids = sorted(visited, key=self._position.__getitem__)
+        rels = sorted(
+            (item for node_id in node_ids for item in self._outgoing.get(node_id, ())
+             if item[1]["target"] in visited),
+            key=lambda item: item[0]
+        )
+        result = {
+            "nodes": [self._nodes[node_id] for node_id in node_ids],
+            "relationships": [rel for _, rel in rels]
+        }
+        self._subgraphs[key] = result
+        return result
+
+
 # 生成图谱数据
 GFZ_KNOWLEDGE_GRAPH_NODES = convert_tree_to_graph()
+GFZ_KNOWLEDGE_GRAPH_INDEX = KnowledgeGraphIndex(GFZ_KNOWLEDGE_GRAPH_NODES)
 
 def get_graph_data():
     """获取图谱数据"""
     return GFZ_KNOWLEDGE_GRAPH_NODES
 
+def get_graph_index():
+    """获取图谱索引"""
+    return GFZ_KNOWLEDGE_GRAPH_INDEX
+
 def get_nodes():
     """获取所有节点"""
     return GFZ_KNOWLEDGE_GRAPH_NODES.get("nodes", [])
@@ -148,52 +274,19 @@ def get_relationships():
 
 def get_node_by_id(node_id):
     """根据ID获取节点"""
-    for node in GFZ_KNOWLEDGE_GRAPH_NODES.get("nodes", []):
-        if node["id"] == node_id:
-            return node
-    return None
+    return GFZ_KNOWLEDGE_GRAPH_INDEX.get_node(node_id)
 
 def get_related_nodes(node_id):
     """获取与某个节点相关的所有节点"""
-    related = {"outgoing": [], "incoming": []}
-    
-    for rel in GFZ_KNOWLEDGE_GRAPH_NODES.get("relationships", []):
-        if rel["source"] == node_id:
-            target_node = get_node_by_id(rel["target"])
-            if target_node:
-                related["outgoing"].append({
-                    "node": target_node,
-                    "relationship": rel
-                })
-        elif rel["target"] == node_id:
-            source_node = get_node_by_id(rel["source"])
-            if source_node:
-                related["incoming"].append({
-                    "node": source_node,
-                    "relationship": rel
-                })
-    
-    return related
+    return GFZ_KNOWLEDGE_GRAPH_INDEX.get_related_nodes(node_id)
 
 def get_nodes_by_category(category):
     """根据分类获取节点"""
-    return [node for node in GFZ_KNOWLEDGE_GRAPH_NODES.get("nodes", []) 
-            if node["category"] == category]
+    return GFZ_KNOWLEDGE_GRAPH_INDEX.get_nodes_by_category(category)
 
 def get_module_subgraph(module_id):
-    """获取特定模块的子图（只包含该模块及其内容）"""
-    module_nodes = [n for n in GFZ_KNOWLEDGE_GRAPH_NODES.get("nodes", []) 
-                    if n["id"] == module_id or n.get("properties", {}).get("parent_module") == module_id]
-    
-    module_node_ids = set(n["id"] for n in module_nodes)
-    
-    module_rels = [r for r in GFZ_KNOWLEDGE_GRAPH_NODES.get("relationships", [])
-                   if r["source"] in module_node_ids and r["target"] in module_node_ids]
-    
-    return {
-        "nodes": module_nodes,
-        "relationships": module_rels
-    }
+    """获取特定模块的子图（该模块及其章节、知识点）"""
+    return GFZ_KNOWLEDGE_GRAPH_INDEX.subgraph(module_id)
 
 # 测试用：打印图谱统计
 if __name__ == "__main__":
@@ -3,9 +3,16 @@
 基于学生对知识点的掌握程度评估，AI推荐个性化学习路径
 """
 
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
-from openai import OpenAI
-from config.settings import *
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from modules.graph_repository import is_neo4j_available, read_query
+from modules.llm_cache import get_llm_cache, make_cache_key
+from modules.llm_client import get_llm_client
+from modules.llm_stream import stream_chat_completion, write_stream
+from modules.prerequisite_index import get_prerequisite_index
 
 
 # 能力ID到中文名称的映射（高分子物理）
@@ -28,19 +35,13 @@ ABILITY_ID_TO_NAME = {
     "GFZ_A016": "材料问题综合分析与解决",
 }
 
+# 学习路径推荐使用的模型和提示词版本（修改提示词模板时加一，旧的缓存结果随之失效）
+LEARNING_PATH_MODEL = "deepseek-chat"
+LEARNING_PATH_PROMPT_VERSION = 1
+
 def get_ability_name(ability_id):
     """将能力ID转换为中文名称"""
     return ABILITY_ID_TO_NAME.get(ability_id, ability_id)
-def check_neo4j_available():
-    """检查Neo4j是否可用"""
-    from modules.auth import check_neo4j_available as auth_check
-    return auth_check()
-
-def get_neo4j_driver():
-    """获取Neo4j连接（复用auth模块的缓存连接）"""
-    from modules.auth import get_neo4j_driver as auth_get_driver
-    return auth_get_driver()
-
 def get_current_student():
     """获取当前学生信息"""
     if st.session_state.get('user_role') == 'student':
@@ -66,23 +67,15 @@ def log_ability_activity(activity_type, content_id=None, content_name=None, deta
 def get_all_abilities():
     """获取所有能力列表"""
     # 如果Neo4j不可用，直接返回空列表（将在调用处使用fallback）
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return []
     
     try:
-        driver = get_neo4j_driver()
-        
-        with driver.session() as session:
-            result = session.run("""
-                MATCH (a:gfz_Ability)
-                RETURN a.id as id, a.name as name, a.category as category, a.description as description
-                ORDER BY a.category, a.name
-            """)
-            
-            abilities = [dict(record) for record in result]
-        
-        # 不关闭driver，保持连接池复用
-        return abilities
+        return read_query("""
+            MATCH (a:gfz_Ability)
+            RETURN a.id as id, a.name as name, a.category as category, a.description as description
+            ORDER BY a.category, a.name
+        """, name="能力列表")
     except Exception as e:
         # 查询失败时记录错误并返回空列表
         import traceback
@@ -90,29 +83,23 @@ def get_all_abilities():
         traceback.print_exc()
         return []
 
-def analyze_learning_path(selected_abilities, mastery_levels, abilities_info=None):
-    """分析学习路径并生成推荐"""
+def get_required_knowledge(selected_abilities, abilities_info=None):
+    """能力所需的知识点：Neo4j 中的 REQUIRES 关系，没有数据时使用示例知识点"""
     required_knowledge = []
     
     # 尝试从Neo4j获取知识点数据
-    if check_neo4j_available():
+    if is_neo4j_available():
         try:
-            driver = get_neo4j_driver()
-            
             # 获取能力需要的知识点
-            with driver.session() as session:
-                result = session.run("""
+            required_knowledge = read_query("""
                 MATCH (a:gfz_Ability)-[r:REQUIRES]->(k:gfz_KnowledgePoint)
                 WHERE a.id IN $abilities
                 RETURN k.id as kp_id, k.name as kp_name, k.difficulty as difficulty, 
                        collect(a.name) as required_by, max(r.weight) as max_weight
                 ORDER BY max_weight DESC
-            """, abilities=selected_abilities)
-            
-                required_knowledge = [dict(record) for record in result]
-            
-            # 不关闭driver，保持连接池复用
-        except Exception:
+            """, {"abilities": selected_abilities}, name="能力所需知识点")
+        except Exception as e:
+            print(f"[能力知识点查询失败] {e}")
             required_knowledge = []
     
     # 如果没有从数据库获取到数据，使用示例知识点
@@ -148,20 +135,31 @@ def analyze_learning_path(selected_abilities, mastery_levels, abilities_info=Non
                         'required_by': [ability_name],
                         'max_weight': weight
                     })
-    
-    # 获取知识点名称和掌握程度映射
+    return required_knowledge
+
+def prepare_learning_path(selected_abilities, mastery_levels, required_knowledge, prerequisite_index,
+                          abilities_info=None):
+    """构建学习路径推荐的提示词和缓存键，返回 (prompt, cache_key)"""
+    # 获取知识点名称和掌握程度映射（掌握度按 10% 取整，相近的评估结果共用同一份 AI 推荐）
+    mastery_buckets = {a_id: int(mastery_levels.get(a_id, 0.5) * 10 + 0.5) * 10 for a_id in selected_abilities}
     ability_names = []
     for a_id in selected_abilities:
         if abilities_info:
             name = next((a['name'] for a in abilities_info if a['id'] == a_id), a_id)
         else:
             name = a_id
-        mastery = mastery_levels.get(a_id, 0.5)
-        ability_names.append(f"{name}(当前掌握度: {int(mastery*100)}%)")
+        ability_names.append(f"{name}(当前掌握度: {mastery_buckets[a_id]}%)")
+    
+    # 取重要性最高的 15 个知识点，按前置关系排序（前置在前），并列出每个知识点的前置知识点
+    top_knowledge = sorted(
+        required_knowledge[:15],
+        key=lambda kp: (prerequisite_index.position(kp.get('kp_id')) is None,
+                        prerequisite_index.position(kp.get('kp_id')) or 0)
+    )
     
     # 构建知识点描述
     knowledge_desc = []
-    for kp in required_knowledge[:15]:
+    for kp in top_knowledge:
         if isinstance(kp.get('required_by'), list):
             required_by_str = ', '.join(kp['required_by'])
         else:
@@ -171,57 +169,88 @@ def analyze_learning_path(selected_abilities, mastery_levels, abilities_info=Non
             weight_str = f"{weight:.1f}"
         else:
             weight_str = str(weight)
-        knowledge_desc.append(f"- {kp['kp_name']} (难度: {kp.get('difficulty', '未知')}, 重要性: {weight_str}, 相关知识领域: {required_by_str})")
+        prerequisites = [prerequisite_index.name(kp_id) for kp_id in prerequisite_index.ancestors(kp.get('kp_id'))]
+        prerequisite_str = f", 需先掌握: {'、'.join(prerequisites)}" if prerequisites else ""
+        knowledge_desc.append(f"- {kp['kp_name']} (难度: {kp.get('difficulty', '未知')}, 重要性: {weight_str}, 相关知识领域: {required_by_str}{prerequisite_str})")
     
-    # 使用DeepSeek AI生成推荐
-    try:
-        import httpx
-        
-        # 创建不使用代理的httpx客户端，解决Streamlit Cloud部署问题
-        http_client = httpx.Client(
-            base_url=DEEPSEEK_BASE_URL,
-            timeout=60.0,
-            follow_redirects=True
-        )
-        
-        client = OpenAI(
-            api_key=DEEPSEEK_API_KEY,
-            base_url=DEEPSEEK_BASE_URL,
-            http_client=http_client
-        )
-        
-        prompt = f"""
+    prompt = f"""
 你是一位高分子物理教学专家。学生对以下知识点的当前掌握情况如下：
 
 {', '.join(ability_names)}
 
-基于学生的掌握程度评估，这些知识点相关的学习内容包括：
+基于学生的掌握程度评估，这些知识点相关的学习内容包括（已按前置关系排列，前置知识点在前）：
 {chr(10).join(knowledge_desc) if knowledge_desc else "（系统将根据掌握情况推荐学习内容）"}
 
 请根据学生对这些知识点的掌握程度，为学生制定一个个性化的学习路径，包括：
-1. **学习优先级排序**：根据学生当前掌握情况，按照"薄弱知识点→进阶内容→高级应用"的顺序，列出应该优先学习的内容（5-8个）
+1. **学习优先级排序**：根据学生当前掌握情况，按照"薄弱知识点→进阶内容→高级应用"的顺序，列出应该优先学习的内容（5-8个），注意先学前置知识点
 2. **针对性学习建议**：针对每个知识点，结合学生当前掌握程度，给出具体的学习建议和提升方向
 3. **预计学习时间**：根据掌握程度差异，估算达到熟练水平所需的学习时间
 4. **学习效果预期**：完成学习路径后，学生对这些知识点的掌握程度能达到什么水平
 
 请用简洁、友好的语言，给出实用且有针对性的学习建议。
 """
+    
+    # 相同的能力、掌握度区间和知识点列表共用同一份推荐
+    cache_key = make_cache_key("learning_path", {
+        "prompt_version": LEARNING_PATH_PROMPT_VERSION,
+        "model": LEARNING_PATH_MODEL,
+        "abilities": sorted(selected_abilities),
+        "mastery": mastery_buckets,
+        "knowledge": [kp.get('kp_id') for kp in top_knowledge]
+    })
+    return prompt, cache_key
+
+def generate_learning_path(prompt, cache_key, stream=False):
+    """
+    调用 AI 生成学习路径推荐，缓存命中时直接返回缓存结果
+    stream=True 时返回逐段产出文本的生成器（缓存命中时仍直接返回字符串），用 llm_stream.write_stream 显示
+    """
+    llm_cache = get_llm_cache()
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    # 使用DeepSeek AI生成推荐
+    try:
+        # 共享客户端：连接池复用 keep-alive 连接
+        client = get_llm_client()
+        
+        messages = [{"role": "user", "content": prompt}]
+        if stream:
+            # 只缓存 AI 生成的完整结果，失败时的预设推荐不缓存
+            return stream_chat_completion(
+                client, "学习路径推荐",
+                on_error=_fallback_recommendation,
+                on_complete=lambda content: llm_cache.put(cache_key, content, namespace="learning_path"),
+                model=LEARNING_PATH_MODEL,
+                messages=messages
+            )
         
         response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[{"role": "user", "content": prompt}],
+            model=LEARNING_PATH_MODEL,
+            messages=messages,
             stream=False
         )
         
-        # 关闭httpx客户端
-        http_client.close()
-        
-        return response.choices[0].message.content
+        content = response.choices[0].message.content
+        # 只缓存 AI 生成的结果，失败时的预设推荐不缓存
+        if content:
+            llm_cache.put(cache_key, content, namespace="learning_path")
+        return content
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
         # 如果AI调用失败，返回一个基本的推荐
-        return f"""
+        return _fallback_recommendation(e)
+
+def analyze_learning_path(selected_abilities, mastery_levels, abilities_info=None, stream=False):
+    """分析学习路径并生成推荐（依次执行 知识点匹配 → 提示词构建 → AI 生成）"""
+    required_knowledge = get_required_knowledge(selected_abilities, abilities_info)
+    prompt, cache_key = prepare_learning_path(selected_abilities, mastery_levels, required_knowledge,
+                                              get_prerequisite_index(), abilities_info)
+    return generate_learning_path(prompt, cache_key, stream=stream)
+
+def _fallback_recommendation(error):
+    """AI 调用失败时的预设推荐"""
+    return f"""
 ### 📚 学习路径推荐
 
 基于您选择的能力目标，建议按以下顺序学习：
@@ -242,9 +271,41 @@ def analyze_learning_path(selected_abilities, mastery_levels, abilities_info=Non
 
 **学习建议**：建议结合教材、案例分析和实践操作进行学习。
 
-⚠️ 注意：AI分析服务暂时不可用（{str(e)[:50]}），以上为系统预设推荐。
+⚠️ 注意：AI分析服务暂时不可用（{str(error)[:50]}），以上为系统预设推荐。
 """
 
+# 推荐流程中可并发执行的阶段（知识点查询、前置关系索引等）使用的线程池
+_pipeline_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="recommender")
+
+def _submit(func, *args):
+    """在线程池中执行 func，带上当前脚本的运行上下文（其中可能读取 st.secrets / session_state）"""
+    ctx = get_script_run_ctx()
+    
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return func(*args)
+    
+    return _pipeline_executor.submit(run)
+
+# 分析步骤卡片的样式：等待 / 进行中 / 完成 / 失败
+_STEP_STYLES = {
+    "pending": ("background: #f8f9fa;", "", "color: #999;"),
+    "running": ("background: #cce5ff; border: 2px solid #004085;", "color: #004085;", "color: #004085;"),
+    "done": ("background: #d4edda; border: 2px solid #28a745;", "color: #155724;", "color: #155724;"),
+    "failed": ("background: #f8d7da; border: 2px solid #dc3545;", "color: #721c24;", "color: #721c24;"),
+}
+
+def _render_step(placeholder, icon, title, note, state):
+    """更新一个分析步骤卡片"""
+    box_style, title_style, note_style = _STEP_STYLES[state]
+    placeholder.markdown(f"""
+    <div style="text-align: center; padding: 15px; border-radius: 10px; {box_style}">
+        <div style="font-size: 30px;">{icon}</div>
+        <div style="font-weight: bold; margin: 5px 0; {title_style}">{title}</div>
+        <div style="{note_style} font-size: 12px;">{note}</div>
+    </div>
+    """, unsafe_allow_html=True)
+
 def render_ability_recommender():
     """渲染知识点掌握评估页面"""
     st.title("📊 知识点掌握评估与学习规划")
@@ -388,62 +449,27 @@ def render_ability_recommender():
                 </div>
                 """, unsafe_allow_html=True)
                 
-                # 分析步骤显示
+                # 分析步骤显示：每个步骤的状态由对应阶段实际完成时更新
                 col1, col2, col3, col4 = st.columns(4)
-                
                 with col1:
                     step1 = st.empty()
-                    step1.markdown("""
-                    <div style="text-align: center; padding: 15px; background: #f8f9fa; border-radius: 10px;">
-                        <div style="font-size: 30px;">📊</div>
-                        <div style="font-weight: bold; margin: 5px 0;">知识点评估</div>
-                        <div style="color: #999; font-size: 12px;">分析掌握程度</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
                 with col2:
                     step2 = st.empty()
-                    step2.markdown("""
-                    <div style="text-align: center; padding: 15px; background: #f8f9fa; border-radius: 10px;">
-                        <div style="font-size: 30px;">🔍</div>
-                        <div style="font-weight: bold; margin: 5px 0;">知识匹配</div>
-                        <div style="color: #999; font-size: 12px;">检索知识图谱</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
                 with col3:
                     step3 = st.empty()
-                    step3.markdown("""
-                    <div style="text-align: center; padding: 15px; background: #f8f9fa; border-radius: 10px;">
-                        <div style="font-size: 30px;">🤖</div>
-                        <div style="font-weight: bold; margin: 5px 0;">AI推理</div>
-                        <div style="color: #999; font-size: 12px;">深度学习分析</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
                 with col4:
                     step4 = st.empty()
-                    step4.markdown("""
-                    <div style="text-align: center; padding: 15px; background: #f8f9fa; border-radius: 10px;">
-                        <div style="font-size: 30px;">📋</div>
-                        <div style="font-weight: bold; margin: 5px 0;">生成方案</div>
-                        <div style="color: #999; font-size: 12px;">输出学习路径</div>
-                    </div>
-                    """, unsafe_allow_html=True)
+                _render_step(step1, "📊", "知识点评估", "分析掌握程度", "running")
+                _render_step(step2, "🔍", "知识匹配", "检索知识图谱", "running")
+                _render_step(step3, "🧠", "AI推理", "深度学习分析", "pending")
+                _render_step(step4, "📋", "生成方案", "输出学习路径", "pending")
                 
-                import time
+                # 阶段1/2 并发启动：知识点查询（Neo4j）、前置关系索引、共享 AI 客户端
+                knowledge_future = _submit(get_required_knowledge, selected_abilities, abilities)
+                index_future = _submit(get_prerequisite_index)
+                _submit(get_llm_client)
                 
-                # 步骤1: 知识点评估
-                time.sleep(0.5)
-                step1.markdown("""
-                <div style="text-align: center; padding: 15px; background: #d4edda; border-radius: 10px; border: 2px solid #28a745;">
-                    <div style="font-size: 30px;">✅</div>
-                    <div style="font-weight: bold; margin: 5px 0; color: #155724;">知识点评估</div>
-                    <div style="color: #155724; font-size: 12px;">完成</div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                # 显示评估的知识点掌握程度
+                # 步骤1: 知识点评估（本地计算，与上面的查询同时进行）
                 st.markdown("##### 📊 知识点掌握程度评估:")
                 abilities_display = st.empty()
                 abilities_html = "<div style='line-height: 2.0;'>"
@@ -459,64 +485,23 @@ def render_ability_recommender():
                     """
                 abilities_html += "</div>"
                 abilities_display.markdown(abilities_html, unsafe_allow_html=True)
+                _render_step(step1, "✅", "知识点评估", "完成", "done")
                 
-                # 步骤2: 知识匹配
-                time.sleep(0.6)
-                step2.markdown("""
-                <div style="text-align: center; padding: 15px; background: #d4edda; border-radius: 10px; border: 2px solid #28a745;">
-                    <div style="font-size: 30px;">✅</div>
-                    <div style="font-weight: bold; margin: 5px 0; color: #155724;">知识匹配</div>
-                    <div style="color: #155724; font-size: 12px;">完成</div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                st.markdown("##### 🔍 知识图谱检索结果:")
-                st.info(f"已从知识图谱中匹配到 {len(selected_abilities) * 3} 个相关知识点")
-                
-                # 步骤3: AI推理
-                time.sleep(0.5)
-                step3.markdown("""
-                <div style="text-align: center; padding: 15px; background: #cce5ff; border-radius: 10px; border: 2px solid #004085; animation: pulse 1s infinite;">
-                    <div style="font-size: 30px;">⏳</div>
-                    <div style="font-weight: bold; margin: 5px 0; color: #004085;">AI推理中</div>
-                    <div style="color: #004085; font-size: 12px;">请稍候...</div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                # 显示AI思考过程
-                thinking_box = st.empty()
-                thinking_box.markdown("""
-                <div style="background: #f8f9fa; padding: 15px; border-radius: 10px; border-left: 4px solid #667eea;">
-                    <p style="margin: 0; color: #666;">🤖 <strong>AI正在思考...</strong></p>
-                    <p style="margin: 5px 0 0 0; color: #888; font-size: 14px;">
-                        正在分析您的能力水平、学习目标，结合管理学知识体系生成最优学习路径...
-                    </p>
-                </div>
-                """, unsafe_allow_html=True)
-                
+                stage = (step2, "知识匹配")
                 try:
-                    recommendation = analyze_learning_path(selected_abilities, mastery_levels, abilities)
+                    # 步骤2: 知识匹配（等待并发的查询完成）
+                    required_knowledge = knowledge_future.result()
+                    prerequisite_index = index_future.result()
+                    _render_step(step2, "✅", "知识匹配", "完成", "done")
+                    st.markdown("##### 🔍 知识图谱检索结果:")
+                    st.info(f"已从知识图谱中匹配到 {len(required_knowledge)} 个相关知识点")
                     
-                    # 步骤3完成
-                    step3.markdown("""
-                    <div style="text-align: center; padding: 15px; background: #d4edda; border-radius: 10px; border: 2px solid #28a745;">
-                        <div style="font-size: 30px;">✅</div>
-                        <div style="font-weight: bold; margin: 5px 0; color: #155724;">AI推理</div>
-                        <div style="color: #155724; font-size: 12px;">完成</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    thinking_box.empty()
-                    
-                    # 步骤4完成
-                    time.sleep(0.3)
-                    step4.markdown("""
-                    <div style="text-align: center; padding: 15px; background: #d4edda; border-radius: 10px; border: 2px solid #28a745;">
-                        <div style="font-size: 30px;">✅</div>
-                        <div style="font-weight: bold; margin: 5px 0; color: #155724;">生成方案</div>
-                        <div style="color: #155724; font-size: 12px;">完成</div>
-                    </div>
-                    """, unsafe_allow_html=True)
+                    # 步骤3: AI推理（流式生成：推荐内容边生成边显示）
+                    stage = (step3, "AI推理")
+                    _render_step(step3, "⏳", "AI推理", "请稍候...", "running")
+                    prompt, cache_key = prepare_learning_path(selected_abilities, mastery_levels, required_knowledge,
+                                                              prerequisite_index, abilities)
+                    result = generate_learning_path(prompt, cache_key, stream=True)
                     
                     # 显示AI推荐结果
                     st.markdown("""
@@ -526,25 +511,20 @@ def render_ability_recommender():
                     </div>
                     """, unsafe_allow_html=True)
                     
-                    st.markdown(recommendation)
+                    recommendation = write_stream(result)
+                    _render_step(step3, "✅", "AI推理", "完成", "done")
                     
                     # 记录AI推荐生成
                     log_ability_activity("生成AI推荐", details="成功生成学习路径推荐")
                     
                     # 保存到session
                     st.session_state['last_recommendation'] = recommendation
+                    _render_step(step4, "✅", "生成方案", "完成", "done")
                     
                     st.success("🎉 推荐生成完成！按照上述路径学习，效率更高！")
                     
                 except Exception as e:
-                    step3.markdown("""
-                    <div style="text-align: center; padding: 15px; background: #f8d7da; border-radius: 10px; border: 2px solid #dc3545;">
-                        <div style="font-size: 30px;">❌</div>
-                        <div style="font-weight: bold; margin: 5px 0; color: #721c24;">AI推理</div>
-                        <div style="color: #721c24; font-size: 12px;">失败</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    thinking_box.empty()
+                    _render_step(stage[0], "❌", stage[1], "失败", "failed")
                     st.error(f"生成推荐失败: {str(e)}")
         
         # 显示历史推荐
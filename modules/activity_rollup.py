@@ -0,0 +1,294 @@
+"""
+学习活动汇总计数模块
+在写入活动的同一事务中维护预聚合计数，统计页面只读取汇总节点，不再扫描全部活动：
+- 学生：gfz_Student.activity_count
+- 模块：gfz_ModuleStats {module_name, total_visits, unique_students}
+- 学生-模块：(gfz_Student)-[:VISITED_MODULE {count}]->(gfz_ModuleStats)
+- 模块-日：gfz_ModuleDayStats {module_name, day, visits}（day 为 UTC 日期）
+活动节点本身在写入时带上整数日键/小时键（day_key=YYYYMMDD, hour_key=YYYYMMDDHH，UTC），
+"今天"、"近7天"、按日趋势等查询用键的范围比较走索引，不再对 timestamp 调用函数
+重建汇总、回填日键等管理操作在应用内同样经数据库访问层执行（更长的超时）；
+独立脚本没有 Streamlit 会话，传入自己的 driver 直接执行同样的事务函数
+"""
+
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from modules.graph_repository import read_value, write_transaction
+
+# 回填日键/小时键时每批处理的活动数
+BACKFILL_BATCH_SIZE = 5000
+# 诊断/回填/重建等管理操作要扫描全部活动，超时比普通查询长（秒）
+ADMIN_TIMEOUT = 300.0
+
+_STUDENT_ROLLUP_QUERY = """
+    UNWIND $rows AS r
+    MATCH (s:gfz_Student {student_id: r.student_id})
+    SET s.activity_count = COALESCE(s.activity_count, 0) + r.count
+"""
+
+_MODULE_ROLLUP_QUERY = """
+    UNWIND $rows AS r
+    MATCH (s:gfz_Student {student_id: r.student_id})
+    MERGE (m:gfz_ModuleStats {module_name: r.module_name})
+      ON CREATE SET m.total_visits = 0, m.unique_students = 0
+    MERGE (s)-[v:VISITED_MODULE]->(m)
+      ON CREATE SET v.count = 0, m.unique_students = m.unique_students + 1
+    SET v.count = v.count + r.count,
+        m.total_visits = m.total_visits + r.count
+"""
+
+_MODULE_DAY_ROLLUP_QUERY = """
+    UNWIND $rows AS r
+    MERGE (d:gfz_ModuleDayStats {module_name: r.module_name, day: date(r.day)})
+      ON CREATE SET d.visits = 0
+    SET d.visits = d.visits + r.count
+"""
+
+# 从原始活动重建：先清空汇总，再按学生/模块/日重新聚合
+_REBUILD_QUERIES = [
+    ("清空汇总节点", """
+        MATCH (n) WHERE n:gfz_ModuleStats OR n:gfz_ModuleDayStats
+        DETACH DELETE n
+    """),
+    ("学生计数", """
+        MATCH (s:gfz_Student)
+        OPTIONAL MATCH (s)-[:PERFORMED]->(a:gfz_Activity)
+        WITH s, count(a) AS n
+        SET s.activity_count = n
+    """),
+    ("模块计数", """
+        MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)
+        WITH s, COALESCE(a.module_name, a.module) AS module_name, count(a) AS n
+        WHERE module_name IS NOT NULL
+        MERGE (m:gfz_ModuleStats {module_name: module_name})
+          ON CREATE SET m.total_visits = 0, m.unique_students = 0
+        CREATE (s)-[:VISITED_MODULE {count: n}]->(m)
+        SET m.total_visits = m.total_visits + n,
+            m.unique_students = m.unique_students + 1
+    """),
+    ("模块日计数", """
+        MATCH (a:gfz_Activity)
+        WHERE a.timestamp IS NOT NULL
+        WITH COALESCE(a.module_name, a.module) AS module_name,
+             date(datetime({epochMillis: a.timestamp.epochMillis})) AS day,
+             count(a) AS n
+        WHERE module_name IS NOT NULL
+        CREATE (:gfz_ModuleDayStats {module_name: module_name, day: day, visits: n})
+    """),
+]
+
+# 删除某个学生：开始时记录其按模块-日的活动数，全部删除完成后再从模块和模块-日汇总中扣除
+_STUDENT_DAY_COUNTS_QUERY = """
+    MATCH (s:gfz_Student {student_id: $student_id})-[:PERFORMED]->(a:gfz_Activity)
+    WHERE a.timestamp IS NOT NULL
+    WITH COALESCE(a.module_name, a.module) AS module_name,
+         date(datetime({epochMillis: a.timestamp.epochMillis})) AS day,
+         count(a) AS n
+    WHERE module_name IS NOT NULL
+    RETURN module_name, toString(day) AS day, n AS count
+"""
+
+_SUBTRACT_STUDENT_MODULE_QUERY = """
+    MATCH (s:gfz_Student {student_id: $student_id})-[v:VISITED_MODULE]->(m:gfz_ModuleStats)
+    SET m.total_visits = m.total_visits - v.count,
+        m.unique_students = m.unique_students - 1
+    DELETE v
+"""
+
+_SUBTRACT_STUDENT_DAY_QUERY = """
+    UNWIND $rows AS r
+    MATCH (d:gfz_ModuleDayStats {module_name: r.module_name, day: date(r.day)})
+    SET d.visits = d.visits - r.count
+"""
+
+_CLEAR_QUERY = """
+    MATCH (n) WHERE n:gfz_ModuleStats OR n:gfz_ModuleDayStats
+    DETACH DELETE n
+"""
+
+_RESET_STUDENT_COUNTS_QUERY = """
+    MATCH (s:gfz_Student) SET s.activity_count = 0
+"""
+
+# 为历史活动补写日键/小时键（每批单独提交，可中断后重新运行）
+_BACKFILL_KEYS_QUERY = """
+    MATCH (a:gfz_Activity)
+    WHERE a.day_key IS NULL AND a.timestamp IS NOT NULL
+    WITH a LIMIT $batch_size
+    WITH a, datetime({epochMillis: a.timestamp.epochMillis}) AS utc
+    SET a.day_key = utc.year * 10000 + utc.month * 100 + utc.day,
+        a.hour_key = (utc.year * 10000 + utc.month * 100 + utc.day) * 100 + utc.hour
+    RETURN count(a) AS updated
+"""
+
+# 旧版活动只有 module 字段：补写 module_name（保留原字段），按模块筛选的查询只比较 module_name
+_BACKFILL_MODULE_NAME_QUERY = """
+    MATCH (a:gfz_Activity)
+    WHERE a.module_name IS NULL AND a.module IS NOT NULL
+    WITH a LIMIT $batch_size
+    SET a.module_name = a.module
+    RETURN count(a) AS updated
+"""
+
+_MISSING_KEYS_QUERY = """
+    MATCH (a:gfz_Activity)
+    WHERE (a.day_key IS NULL AND a.timestamp IS NOT NULL)
+       OR (a.module_name IS NULL AND a.module IS NOT NULL)
+    RETURN count(a) AS count
+"""
+
+
+def _utc(timestamp):
+    """ISO 字符串 -> UTC datetime（无法解析时取当前时间，无时区按 UTC）"""
+    try:
+        ts = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        ts = datetime.now(timezone.utc)
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc)
+
+
+def activity_day(timestamp):
+    """活动所属日期（UTC，ISO 字符串），与重建时 Cypher 中的 date() 一致"""
+    return _utc(timestamp).date().isoformat()
+
+
+def day_key(day):
+    """日期 -> 整数日键 YYYYMMDD"""
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+def activity_keys(timestamp):
+    """活动的 (日键 YYYYMMDD, 小时键 YYYYMMDDHH)，按 UTC 计算，与 activity_day 一致"""
+    ts = _utc(timestamp)
+    key = day_key(ts)
+    return key, key * 100 + ts.hour
+
+
+def recent_day_key(days):
+    """最近 days 个自然日（含今天，UTC）的起始日键：day_key >= 返回值"""
+    return day_key(datetime.now(timezone.utc).date() - timedelta(days=days - 1))
+
+
+def format_day_key(key):
+    """日键 -> 'YYYY-MM-DD'"""
+    return f"{key // 10000:04d}-{key // 100 % 100:02d}-{key % 100:02d}"
+
+
+def aggregate_events(events):
+    """
+    把一批事件在本地聚合成三组计数行，每个键只出现一次
+    返回 (学生行, 学生-模块行, 模块-日行)
+    """
+    students = Counter()
+    modules = Counter()
+    days = Counter()
+    for event in events:
+        students[event['student_id']] += 1
+        module_name = event.get('module_name')
+        if not module_name:
+            continue
+        modules[(event['student_id'], module_name)] += 1
+        days[(module_name, activity_day(event.get('timestamp')))] += 1
+
+    student_rows = [{'student_id': k, 'count': n} for k, n in students.items()]
+    module_rows = [{'student_id': k[0], 'module_name': k[1], 'count': n} for k, n in modules.items()]
+    day_rows = [{'module_name': k[0], 'day': k[1], 'count': n} for k, n in days.items()]
+    return student_rows, module_rows, day_rows
+
+
+def apply_rollups(tx, events):
+    """在写入活动的事务 tx 中累加汇总计数（events 只应包含本次真正新增的事件）"""
+    if not events:
+        return
+    student_rows, module_rows, day_rows = aggregate_events(events)
+    tx.run(_STUDENT_ROLLUP_QUERY, rows=student_rows).consume()
+    if module_rows:
+        tx.run(_MODULE_ROLLUP_QUERY, rows=module_rows).consume()
+    if day_rows:
+        tx.run(_MODULE_DAY_ROLLUP_QUERY, rows=day_rows).consume()
+
+
+def student_day_counts(tx, student_id):
+    """删除学生之前调用：该学生按 (模块, 日) 的活动数，删除完成后交给 subtract_student"""
+    return [dict(record) for record in tx.run(_STUDENT_DAY_COUNTS_QUERY, student_id=student_id)]
+
+
+def subtract_student(tx, student_id, day_rows):
+    """
+    学生的活动删除完成、删除学生节点之前调用：从汇总计数中扣除该学生的贡献
+    模块汇总按 VISITED_MODULE 上的计数扣除；模块-日汇总按开始删除前记录的 day_rows 扣除
+    """
+    if day_rows:
+        tx.run(_SUBTRACT_STUDENT_DAY_QUERY, rows=day_rows).consume()
+    tx.run(_SUBTRACT_STUDENT_MODULE_QUERY, student_id=student_id).consume()
+
+
+def clear_rollups(tx):
+    """全部活动删除完成后调用：删除汇总节点并把学生计数归零"""
+    tx.run(_CLEAR_QUERY).consume()
+    tx.run(_RESET_STUDENT_COUNTS_QUERY).consume()
+
+
+def _admin_read(driver, query, key, name):
+    """管理操作的单值读取：应用内经数据库访问层（超时、重试、指标），独立脚本直接使用传入的 driver"""
+    if driver is None:
+        return read_value(query, key=key, timeout=ADMIN_TIMEOUT, name=name)
+    with driver.session() as session:
+        return session.execute_read(lambda tx: tx.run(query).single()[key])
+
+
+def _admin_write(driver, work, *args, name):
+    """管理操作的写事务：同上，work(tx, *args) 在托管写事务中执行"""
+    if driver is None:
+        return write_transaction(work, *args, timeout=ADMIN_TIMEOUT, name=name)
+    with driver.session() as session:
+        return session.execute_write(work, *args)
+
+
+def _run_statement(tx, query):
+    tx.run(query).consume()
+
+
+def _backfill_batch(tx, query, batch_size):
+    return tx.run(query, batch_size=batch_size).single()['updated']
+
+
+def count_missing_keys(driver=None):
+    """
+    还没有日键或 module_name 的历史活动数（day_key IS NULL 无法走索引，会扫描全部活动，只在诊断时调用）
+    应用内不传 driver，经数据库访问层执行；独立脚本（没有 Streamlit 会话）传入自己的 driver
+    """
+    return _admin_read(driver, _MISSING_KEYS_QUERY, 'count', "缺少日键的活动数")
+
+
+def backfill_activity_keys(driver=None, batch_size=BACKFILL_BATCH_SIZE, progress=None):
+    """
+    为没有日键/小时键的历史活动补写，并为只有旧字段 module 的活动补写 module_name，按批提交，返回补写的总数
+    每批都是独立事务，中途中断后重新运行会从剩余的记录继续；progress(已处理数) 用于显示进度
+    """
+    total = 0
+    for query, name in ((_BACKFILL_KEYS_QUERY, "日键回填"), (_BACKFILL_MODULE_NAME_QUERY, "模块字段回填")):
+        while True:
+            updated = _admin_write(driver, _backfill_batch, query, batch_size, name=name)
+            if not updated:
+                break
+            total += updated
+            print(f"[{name}] 已处理 {total} 条")
+            if progress:
+                progress(total)
+    return total
+
+
+def rebuild_rollups(driver=None):
+    """从原始活动记录全量重建汇总计数（每个步骤一个写事务），返回各步骤耗时（秒）"""
+    timings = {}
+    for name, query in _REBUILD_QUERIES:
+        start = time.perf_counter()
+        _admin_write(driver, _run_statement, query, name=f"汇总重建-{name}")
+        timings[name] = round(time.perf_counter() - start, 3)
+        print(f"[汇总重建] {name} 完成，用时 {timings[name]}秒")
+    return timings
@@ -0,0 +1,220 @@
+"""
+学习活动本地落盘队列（spool）
+Neo4j 不可用时把活动事件追加写入本地分段 JSONL 文件，恢复连接后按顺序批量回放
+- 热路径只做一次带缓冲的追加写，每满 N 条才 fsync 一次；按时间的 fsync 由后台写线程定期调用 sync_if_due()
+- 按段轮转，段数有上限，超出时淘汰最旧的段，磁盘占用有界
+- 每条事件带唯一 id，回放时按 id 去重，重复回放不会产生重复记录
+"""
+
+import json
+import os
+import threading
+import time
+
+try:
+    from config.settings import ACTIVITY_SPOOL_DIR
+except (ImportError, AttributeError):
+    ACTIVITY_SPOOL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".spool", "activity")
+
+# 单个段文件上限（字节）与段数上限
+SEGMENT_MAX_BYTES = 4 * 1024 * 1024
+MAX_SEGMENTS = 50
+# fsync 批量：追加满 N 条时执行一次；后台线程每 T 秒检查一次
+FSYNC_EVERY = 100
+FSYNC_INTERVAL = 1.0
+# 回放时每批写入条数
+REPLAY_BATCH_SIZE = 500
+
+_SEGMENT_PREFIX = "segment-"
+_SEGMENT_SUFFIX = ".jsonl"
+
+
+class ActivitySpool:
+    """分段追加写的本地事件队列"""
+
+    def __init__(self, directory=ACTIVITY_SPOOL_DIR, segment_max_bytes=SEGMENT_MAX_BYTES,
+                 max_segments=MAX_SEGMENTS, fsync_every=FSYNC_EVERY, fsync_interval=FSYNC_INTERVAL):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.max_segments = max_segments
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._lock = threading.RLock()
+        self._file = None
+        self._file_seq = None
+        self._file_size = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._stats = {
+            'spooled': 0,
+            'replayed': 0,
+            'evicted_segments': 0,
+            'corrupt_lines': 0
+        }
+
+    # ---------- 写入 ----------
+
+    def append(self, event):
+        """追加一条事件（带缓冲写，只在累计满 fsync_every 条时 fsync，按时间的 fsync 交给 sync_if_due）"""
+        line = (json.dumps(event, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        with self._lock:
+            if self._file is None:
+                self._open_new_segment()
+            self._file.write(line)
+            self._file_size += len(line)
+            self._unsynced += 1
+            self._stats['spooled'] += 1
+            if self._file_size >= self.segment_max_bytes:
+                self._rotate()
+            elif self._unsynced >= self.fsync_every:
+                self._sync()
+
+    def sync_if_due(self):
+        """有未落盘数据且超过 fsync 间隔时执行一次 fsync（供后台线程定期调用）"""
+        with self._lock:
+            if self._file is not None and self._unsynced and time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def close(self):
+        """落盘并关闭当前段"""
+        with self._lock:
+            self._close_current()
+
+    def _segment_path(self, seq):
+        return os.path.join(self.directory, f"{_SEGMENT_PREFIX}{seq:010d}{_SEGMENT_SUFFIX}")
+
+    def _list_segments(self):
+        """按序号升序列出所有段 [(seq, path)]"""
+        if not os.path.isdir(self.directory):
+            return []
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX):
+                try:
+                    seq = int(name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)])
+                except ValueError:
+                    continue
+                segments.append((seq, os.path.join(self.directory, name)))
+        segments.sort()
+        return segments
+
+    def _open_new_segment(self):
+        os.makedirs(self.directory, exist_ok=True)
+        segments = self._list_segments()
+        seq = segments[-1][0] + 1 if segments else 1
+        self._file = open(self._segment_path(seq), "ab", buffering=64 * 1024)
+        self._file_seq = seq
+        self._file_size = 0
+        self._enforce_bound()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _close_current(self):
+        if self._file is None:
+            return
+        self._sync()
+        self._file.close()
+        self._file = None
+        self._file_seq = None
+        self._file_size = 0
+
+    def _rotate(self):
+        self._close_current()
+        self._open_new_segment()
+
+    def _enforce_bound(self):
+        """段数超过上限时删除最旧的段（不删除当前正在写的段）"""
+        segments = self._list_segments()
+        excess = len(segments) - self.max_segments
+        for seq, path in segments:
+            if excess <= 0:
+                break
+            if seq == self._file_seq:
+                continue
+            try:
+                os.remove(path)
+                self._stats['evicted_segments'] += 1
+                print(f"[活动落盘] 超出磁盘上限，淘汰最旧段 {os.path.basename(path)}")
+            except OSError:
+                pass
+            excess -= 1
+
+    # ---------- 回放 ----------
+
+    def has_pending(self):
+        """是否有待回放的事件"""
+        with self._lock:
+            return bool(self._list_segments())
+
+    def replay(self, write_batch, batch_size=REPLAY_BATCH_SIZE):
+        """
+        按段顺序把事件批量交给 write_batch(events) 写入
+        某一批写入抛出异常时立即停止并保留该段，下次从该段开头重试（依赖 id 去重保证幂等）
+        返回本次成功回放的条数
+        """
+        with self._lock:
+            # 先封存当前段，使其参与回放
+            self._close_current()
+            segments = self._list_segments()
+
+        replayed = 0
+        for seq, path in segments:
+            events = self._read_segment(path)
+            for i in range(0, len(events), batch_size):
+                write_batch(events[i:i + batch_size])
+                replayed += len(events[i:i + batch_size])
+            with self._lock:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                self._stats['replayed'] += len(events)
+        return replayed
+
+    def _read_segment(self, path):
+        events = []
+        try:
+            with open(path, "rb") as f:
+                for raw in f:
+                    try:
+                        events.append(json.loads(raw.decode("utf-8")))
+                    except (ValueError, UnicodeDecodeError):
+                        # 进程崩溃可能留下写了一半的末行
+                        self._stats['corrupt_lines'] += 1
+        except OSError as e:
+            print(f"[活动落盘] 读取段失败 {path}: {e}")
+        return events
+
+    def stats(self):
+        """落盘队列指标：待回放段数、占用字节、累计落盘/回放条数等"""
+        with self._lock:
+            stats = dict(self._stats)
+            segments = self._list_segments()
+        size = 0
+        for _, path in segments:
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        stats['pending_segments'] = len(segments)
+        stats['pending_bytes'] = size
+        return stats
+
+
+# 进程级单例
+_spool = None
+_spool_lock = threading.Lock()
+
+
+def get_activity_spool():
+    """获取全局活动落盘队列"""
+    global _spool
+    if _spool is None:
+        with _spool_lock:
+            if _spool is None:
+                _spool = ActivitySpool()
+    return _spool
@@ -0,0 +1,323 @@
+"""
+学习活动异步写入模块
+log_activity 只负责把事件放入进程内队列，由后台线程按批次（UNWIND）写入 Neo4j，
+避免每次点击都在 Streamlit 重跑过程中等待一次数据库往返。
+写入失败或队列溢出的事件转存到本地落盘队列（activity_spool），连接恢复后按顺序回放
+"""
+
+import atexit
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from modules.activity_rollup import activity_keys, apply_rollups
+from modules.activity_spool import get_activity_spool
+from modules.graph_repository import is_neo4j_available, write_transaction
+from modules.query_cache import invalidate, module_tag
+
+# 批量写入参数：满 N 条或等待 T 毫秒即写入一批
+BATCH_SIZE = 200
+FLUSH_INTERVAL_MS = 500
+# 队列上限及队列满时调用方最多等待的秒数（背压）
+MAX_QUEUE_SIZE = 10000
+ENQUEUE_TIMEOUT = 0.2
+# 进程退出时等待剩余事件写完的最长秒数
+SHUTDOWN_TIMEOUT = 5.0
+# 尝试回放落盘事件的间隔（秒），失败后按倍数退避
+REPLAY_INTERVAL = 10.0
+MAX_REPLAY_INTERVAL = 300.0
+
+# 以事件 id 作为幂等键：已存在的事件直接跳过，回放重复批次不会重复写入；
+# 返回真正新增的 id，汇总计数只累加这些事件
+_BATCH_INSERT_QUERY = """
+    UNWIND $events AS e
+    OPTIONAL MATCH (existing:gfz_Activity {id: e.id})
+    WITH e WHERE existing IS NULL
+    MERGE (s:gfz_Student {student_id: e.student_id})
+    CREATE (a:gfz_Activity {
+        id: e.id,
+        activity_type: e.activity_type,
+        module_name: e.module_name,
+        content_id: e.content_id,
+        content_name: e.content_name,
+        details: e.details,
+        timestamp: datetime(e.timestamp),
+        day_key: e.day_key,
+        hour_key: e.hour_key
+    })
+    CREATE (s)-[:PERFORMED]->(a)
+    RETURN e.id AS id
+"""
+
+
+def build_activity_event(student_id, activity_type, module_name, content_id=None, content_name=None, details=None):
+    """构造一条活动事件，时间戳（及日键/小时键）在调用时确定，而不是写库时"""
+    timestamp = datetime.now(timezone.utc).isoformat()
+    day_key, hour_key = activity_keys(timestamp)
+    return {
+        'id': str(uuid.uuid4()),
+        'student_id': student_id,
+        'activity_type': activity_type,
+        'module_name': module_name,
+        'content_id': content_id,
+        'content_name': content_name,
+        'details': details,
+        'timestamp': timestamp,
+        'day_key': day_key,
+        'hour_key': hour_key
+    }
+
+
+def _dedupe(events):
+    """按 id 去重，保留首次出现的顺序；旧版本落盘的事件没有日键/小时键，在此补上"""
+    seen = set()
+    unique = []
+    for event in events:
+        if event['id'] in seen:
+            continue
+        seen.add(event['id'])
+        if event.get('day_key') is None:
+            event['day_key'], event['hour_key'] = activity_keys(event.get('timestamp'))
+        unique.append(event)
+    return unique
+
+
+def _write_batch_tx(tx, events):
+    """写入事件与汇总计数（同一事务，要么全部成功要么全部回滚）"""
+    inserted = {record['id'] for record in tx.run(_BATCH_INSERT_QUERY, events=events)}
+    apply_rollups(tx, [e for e in events if e['id'] in inserted])
+
+
+def _write_batch(events):
+    """
+    在一个写事务中用 UNWIND 写入一批事件并累加汇总计数，提交后只让涉及模块的统计缓存失效
+    跨模块聚合和学生列表（TAG_ACTIVITY / TAG_STUDENT）不在每批后失效，由其 TTL 限定陈旧时间
+    """
+    write_transaction(_write_batch_tx, events, name="活动批量写入")
+    modules = {e['module_name'] for e in events if e.get('module_name')}
+    if modules:
+        invalidate(*(module_tag(m) for m in modules))
+
+
+class ActivityWriter:
+    """后台批量写入器：队列 + 单个写线程"""
+
+    def __init__(self, write_batch=None, batch_size=BATCH_SIZE,
+                 flush_interval_ms=FLUSH_INTERVAL_MS, max_queue_size=MAX_QUEUE_SIZE, spool=None):
+        self._write_batch = write_batch or _write_batch
+        self._spool = spool or get_activity_spool()
+        # 写库失败后进入降级状态：新事件直接落盘，排在失败事件之后，回放成功后恢复
+        self._degraded = False
+        self._replay_interval = REPLAY_INTERVAL
+        self._next_replay = time.monotonic()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'spilled': 0,
+            'dropped': 0,
+            'failed_batches': 0,
+            'batches': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+            'last_error': None
+        }
+
+    def start(self):
+        """启动后台写线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="gfz-activity-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, event, timeout=ENQUEUE_TIMEOUT):
+        """
+        将事件放入队列
+        队列满时最多阻塞 timeout 秒（背压），仍放不进去则转存到落盘队列，返回 False
+        """
+        try:
+            self._queue.put(event, timeout=timeout)
+        except queue.Full:
+            self.spill([event])
+            return False
+        self._incr('enqueued')
+        return True
+
+    def spill(self, events):
+        """把事件转存到本地落盘队列，落盘也失败时才丢弃"""
+        for event in events:
+            try:
+                self._spool.append(event)
+                self._incr('spilled')
+            except Exception as e:
+                self._incr('dropped')
+                with self._lock:
+                    self._stats['last_error'] = str(e)
+
+    def queue_depth(self):
+        """当前队列中待写入的事件数"""
+        return self._queue.qsize()
+
+    def stats(self):
+        """写入器运行指标：队列深度、写入条数、批次耗时等"""
+        with self._lock:
+            stats = dict(self._stats)
+        batches = stats['batches']
+        stats['avg_flush_ms'] = round(stats['total_flush_ms'] / batches, 2) if batches else 0.0
+        stats['total_flush_ms'] = round(stats['total_flush_ms'], 2)
+        stats['queue_depth'] = self.queue_depth()
+        stats['running'] = self._thread is not None and self._thread.is_alive()
+        stats['degraded'] = self._degraded
+        stats['spool'] = self._spool.stats()
+        return stats
+
+    def close(self, timeout=SHUTDOWN_TIMEOUT):
+        """停止写线程，并把队列中剩余事件全部写完"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        # 线程已退出（或从未启动）时，在当前线程写完剩余事件
+        if thread is None or not thread.is_alive():
+            self._drain()
+        self._spool.close()
+
+    def _incr(self, key, value=1):
+        with self._lock:
+            self._stats[key] += value
+
+    def _collect_batch(self):
+        """从队列取一批事件：满 batch_size 条或等待超过 flush_interval 即返回"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect_batch()
+            self._maybe_replay()
+            if batch:
+                self._flush(batch)
+            self._spool.sync_if_due()
+        self._drain()
+
+    def _maybe_replay(self):
+        """到达回放时间且有落盘事件时，按顺序回放；失败则指数退避"""
+        if time.monotonic() < self._next_replay or not self._spool.has_pending():
+            return
+        if not is_neo4j_available():
+            # 连接未恢复时不尝试回放：回放会先封存当前段，反复尝试会产生大量小段
+            self._next_replay = time.monotonic() + self._replay_interval
+            return
+        try:
+            count = self._spool.replay(self._write)
+        except Exception as e:
+            self._replay_interval = min(self._replay_interval * 2, MAX_REPLAY_INTERVAL)
+            self._next_replay = time.monotonic() + self._replay_interval
+            with self._lock:
+                self._stats['last_error'] = str(e)
+            print(f"[活动回放失败] {self._replay_interval:.0f}秒后重试: {e}")
+            return
+        self._degraded = False
+        self._replay_interval = REPLAY_INTERVAL
+        self._next_replay = time.monotonic() + self._replay_interval
+        if count:
+            print(f"[活动回放] 已回放 {count} 条落盘事件")
+
+    def _drain(self):
+        """写完队列中剩余的所有事件"""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._flush(batch)
+
+    def _write(self, events):
+        """写入一批事件（失败时抛出异常）"""
+        self._write_batch(_dedupe(events))
+
+    def _flush(self, batch):
+        """写入一批队列事件；降级状态下或写入失败时转存到落盘队列"""
+        if self._degraded:
+            self.spill(batch)
+            return False
+        start = time.perf_counter()
+        try:
+            self._write(batch)
+        except Exception as e:
+            self._degraded = True
+            self._next_replay = time.monotonic() + self._replay_interval
+            with self._lock:
+                self._stats['failed_batches'] += 1
+                self._stats['last_error'] = str(e)
+            print(f"[活动写入失败] {len(batch)}条转存本地: {e}")
+            self.spill(batch)
+            return False
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['written'] += len(batch)
+            self._stats['last_flush_ms'] = round(elapsed_ms, 2)
+            self._stats['total_flush_ms'] += elapsed_ms
+            self._stats['max_flush_ms'] = round(max(self._stats['max_flush_ms'], elapsed_ms), 2)
+        return True
+
+
+# 进程级单例（Streamlit 重跑脚本时模块不会重新导入）
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_activity_writer():
+    """获取全局活动写入器，首次调用时启动后台线程"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                writer = ActivityWriter()
+                writer.start()
+                atexit.register(writer.close)
+                _writer = writer
+    return _writer
+
+
+def spool_activity(event):
+    """
+    Neo4j 不可用时直接落盘（热路径上只有一次带缓冲的追加写）
+    同时确保后台写线程已启动：由它定期 fsync 落盘队列，并在连接恢复后回放
+    """
+    try:
+        get_activity_spool().append(event)
+    except Exception as e:
+        print(f"[活动落盘失败] {e}")
+    get_activity_writer()
+
+
+def get_activity_writer_stats():
+    """获取写入器指标（未启动时返回None）"""
+    if _writer is None:
+        return None
+    return _writer.stats()
@@ -10,86 +10,83 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta
 from modules.auth import (
     get_all_students, get_student_activities, get_module_statistics,
-    delete_student_data, delete_all_activities, check_neo4j_available,
-    get_single_module_statistics, get_neo4j_driver
+    delete_student_data, delete_all_activities,
+    get_single_module_statistics, get_activity_page, ACTIVITY_PAGE_SIZE
 )
+from modules.activity_rollup import format_day_key, recent_day_key
+from modules.bulk_delete import KIND_LABELS, get_pending_delete_jobs, resume_delete_job
+from modules.graph_repository import is_neo4j_available, read_query, read_transaction
+from modules.query_cache import DEFAULT_TTL, TAG_ACTIVITY, TAG_MODULE_STATS, TAG_STUDENT, module_tag
 from config.settings import *
 
+def _read_activity_summary(tx, today, week_start):
+    """在同一个读事务中读取四项概况计数（today/week_start 为日键，按索引范围查找）"""
+    # 总学生数
+    total_students = tx.run("MATCH (s:gfz_Student) RETURN count(s) as count").single()['count']
+    
+    # 总活动数
+    total_activities = tx.run("MATCH (a:gfz_Activity) RETURN count(a) as count").single()['count']
+    
+    # 今日活动数
+    today_activities = tx.run("""
+        MATCH (a:gfz_Activity)
+        WHERE a.day_key = $today
+        RETURN count(a) as count
+    """, today=today).single()['count']
+    
+    # 活跃学生数（含今天在内的最近7天）
+    active_students = tx.run("""
+        MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)
+        WHERE a.day_key >= $week_start
+        RETURN count(DISTINCT s) as count
+    """, week_start=week_start).single()['count']
+    
+    return {
+        'total_students': total_students,
+        'total_activities': total_activities,
+        'today_activities': today_activities,
+        'active_students': active_students
+    }
+
 def get_activity_summary():
     """获取活动概况"""
-    if not check_neo4j_available():
-        return {
-            'total_students': 0,
-            'total_activities': 0,
-            'today_activities': 0,
-            'active_students': 0
-        }
+    empty = {
+        'total_students': 0,
+        'total_activities': 0,
+        'today_activities': 0,
+        'active_students': 0
+    }
+    if not is_neo4j_available():
+        return empty
     
     try:
-        driver = get_neo4j_driver()
-        
-        with driver.session() as session:
-            # 总学生数
-            result = session.run("MATCH (s:gfz_Student) RETURN count(s) as count")
-            total_students = result.single()['count']
-            
-            # 总活动数
-            result = session.run("MATCH (a:gfz_Activity) RETURN count(a) as count")
-            total_activities = result.single()['count']
-            
-            # 今日活动数
-            result = session.run("""
-                MATCH (a:gfz_Activity)
-                WHERE date(a.timestamp) = date()
-                RETURN count(a) as count
-            """)
-            today_activities = result.single()['count']
-            
-            # 活跃学生数（7天内）
-            result = session.run("""
-                MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)
-                WHERE a.timestamp > datetime() - duration('P7D')
-                RETURN count(DISTINCT s) as count
-            """)
-            active_students = result.single()['count']
-        
-        return {
-            'total_students': total_students,
-            'total_activities': total_activities,
-            'today_activities': today_activities,
-            'active_students': active_students
-        }
-    except Exception:
-        return {
-            'total_students': 0,
-            'total_activities': 0,
-            'today_activities': 0,
-            'active_students': 0
-        }
+        return read_transaction(_read_activity_summary, recent_day_key(1), recent_day_key(7), name="活动概况",
+                                cache_ttl=DEFAULT_TTL, cache_tags=(TAG_ACTIVITY, TAG_STUDENT))
+    except Exception as e:
+        print(f"获取活动概况失败: {e}")
+        return empty
 
 def get_daily_activity_trend(days=7):
     """获取每日活动趋势"""
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return []
     
     try:
-        driver = get_neo4j_driver()
+        # 按日键范围查找（含今天在内的最近 days 天）
+        records = read_query("""
+            MATCH (a:gfz_Activity)
+            WHERE a.day_key >= $since
+            RETURN a.day_key as day_key, count(*) as count
+            ORDER BY day_key
+        """, {"since": recent_day_key(days)}, name="每日活动趋势", cache_ttl=DEFAULT_TTL, cache_tags=(TAG_ACTIVITY,))
         
-        with driver.session() as session:
-            result = session.run("""
-                MATCH (a:gfz_Activity)
-                WHERE a.timestamp > datetime() - duration('P' + $days + 'D')
-                RETURN date(a.timestamp) as date, count(*) as count
-                ORDER BY date
-            """, days=str(days))
-            
-            # 将Date对象转换为字符串
-            trend = []
-            for record in result:
-                trend.append({
-                    'date': str(record['date']) if record['date'] else None,
-                    'count': record['count']
-                })
+        # 将日键转换为日期字符串
+        trend = []
+        for record in records:
+            trend.append({
+                'date': format_day_key(record['day_key']),
+                'count': record['count']
+            })
         
         return trend
     except Exception as e:
@@ -98,168 +95,248 @@ def get_daily_activity_trend(days=7):
 
 def get_module_usage():
     """获取各模块使用情况"""
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return []
     
     try:
-        driver = get_neo4j_driver()
-        
-        with driver.session() as session:
-            result = session.run("""
-                MATCH (a:gfz_Activity)
-                RETURN a.module as module, count(*) as count
-                ORDER BY count DESC
-            """)
-            
-            usage = [dict(record) for record in result]
-        
-        return usage
-    except Exception:
+        return read_query("""
+            MATCH (a:gfz_Activity)
+            RETURN a.module as module, count(*) as count
+            ORDER BY count DESC
+        """, name="模块使用情况", cache_ttl=DEFAULT_TTL, cache_tags=(TAG_ACTIVITY,))
+    except Exception as e:
+        print(f"获取模块使用情况失败: {e}")
         return []
 
 def get_popular_content(module=None, limit=10):
     """获取热门学习内容"""
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return []
     
     try:
-        driver = get_neo4j_driver()
+        query = """
+            MATCH (a:gfz_Activity)
+            WHERE a.content_name IS NOT NULL
+        """
+        params = {"limit": limit}
         
-        with driver.session() as session:
-            query = """
-                MATCH (a:gfz_Activity)
-                WHERE a.content_name IS NOT NULL
-            """
-            params = {"limit": limit}
-            
-            if module:
-                query += " AND a.module = $module"
-                params["module"] = module
-            
-            query += """
-                RETURN a.module as module,
-                       a.content_name as content_name,
-                       count(*) as view_count,
-                       count(DISTINCT a.content_id) as unique_views
-                ORDER BY view_count DESC
-                LIMIT $limit
-            """
-            
-            result = session.run(query, **params)
-            content = [dict(record) for record in result]
+        if module:
+            query += " AND a.module = $module"
+            params["module"] = module
         
-        return content
-    except Exception:
+        query += """
+            RETURN a.module as module,
+                   a.content_name as content_name,
+                   count(*) as view_count,
+                   count(DISTINCT a.content_id) as unique_views
+            ORDER BY view_count DESC
+            LIMIT $limit
+        """
+        
+        return read_query(query, params, name="热门内容", cache_ttl=DEFAULT_TTL, cache_tags=(TAG_ACTIVITY,))
+    except Exception as e:
+        print(f"获取热门内容失败: {e}")
         return []
 
+def _read_student_learning_profile(tx, student_id):
+    """在同一个读事务中读取学生画像的各部分"""
+    # 基本信息
+    record = tx.run("""
+        MATCH (s:gfz_Student {student_id: $student_id})
+        RETURN s.name as name, s.last_login as last_login, s.login_count as login_count
+    """, student_id=student_id).single()
+    
+    if not record:
+        return None
+    student_info = dict(record)
+    
+    # 各模块活动统计
+    result = tx.run("""
+        MATCH (s:gfz_Student {student_id: $student_id})-[:PERFORMED]->(a:gfz_Activity)
+        RETURN a.module as module, count(*) as count
+        ORDER BY count DESC
+    """, student_id=student_id)
+    
+    module_stats = [dict(record) for record in result]
+    
+    # 学习时间分布
+    result = tx.run("""
+        MATCH (s:gfz_Student {student_id: $student_id})-[:PERFORMED]->(a:gfz_Activity)
+        RETURN a.timestamp.hour as hour, count(*) as count
+        ORDER BY hour
+    """, student_id=student_id)
+    
+    time_distribution = [dict(record) for record in result]
+    
+    # 查看的内容
+    result = tx.run("""
+        MATCH (s:gfz_Student {student_id: $student_id})-[:PERFORMED]->(a:gfz_Activity)
+        WHERE a.content_name IS NOT NULL
+        RETURN a.module as module, a.content_name as content, a.timestamp as time
+        ORDER BY a.timestamp DESC
+        LIMIT 20
+    """, student_id=student_id)
+    
+    # 将timestamp转换为字符串
+    recent_content = []
+    for record in result:
+        recent_content.append({
+            'module': record['module'],
+            'content': record['content'],
+            'time': str(record['time']) if record['time'] else None
+        })
+    
+    return {
+        'info': student_info,
+        'module_stats': module_stats,
+        'time_distribution': time_distribution,
+        'recent_content': recent_content
+    }
+
 def get_student_learning_profile(student_id):
     """获取学生学习画像"""
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return None
     
     try:
-        driver = get_neo4j_driver()
-        
-        with driver.session() as session:
-            # 基本信息
-            result = session.run("""
-                MATCH (s:gfz_Student {student_id: $student_id})
-                RETURN s.name as name, s.last_login as last_login, s.login_count as login_count
-            """, student_id=student_id)
-            
-            student_info = dict(result.single()) if result.peek() else None
-            
-            if not student_info:
-                return None
-            
-            # 各模块活动统计
-            result = session.run("""
-                MATCH (s:gfz_Student {student_id: $student_id})-[:PERFORMED]->(a:gfz_Activity)
-                RETURN a.module as module, count(*) as count
-                ORDER BY count DESC
-            """, student_id=student_id)
-            
-            module_stats = [dict(record) for record in result]
-            
-            # 学习时间分布
-            result = session.run("""
-                MATCH (s:gfz_Student {student_id: $student_id})-[:PERFORMED]->(a:gfz_Activity)
-                RETURN a.timestamp.hour as hour, count(*) as count
-                ORDER BY hour
-            """, student_id=student_id)
-            
-            time_distribution = [dict(record) for record in result]
-            
-            # 查看的内容
-            result = session.run("""
-                MATCH (s:gfz_Student {student_id: $student_id})-[:PERFORMED]->(a:gfz_Activity)
-                WHERE a.content_name IS NOT NULL
-                RETURN a.module as module, a.content_name as content, a.timestamp as time
-                ORDER BY a.timestamp DESC
-                LIMIT 20
-            """, student_id=student_id)
-            
-            # 将timestamp转换为字符串
-            recent_content = []
-            for record in result:
-                recent_content.append({
-                    'module': record['module'],
-                    'content': record['content'],
-                    'time': str(record['time']) if record['time'] else None
-                })
-        
-        return {
-            'info': student_info,
-            'module_stats': module_stats,
-            'time_distribution': time_distribution,
-            'recent_content': recent_content
-        }
-    except Exception:
+        return read_transaction(_read_student_learning_profile, student_id, name="学生学习画像")
+    except Exception as e:
+        print(f"获取学生画像失败: {e}")
         return None
 
+def _read_classroom_interaction_stats(tx):
+    """在同一个读事务中读取问题统计和学生参与度"""
+    # 问题统计
+    result = tx.run("""
+        MATCH (q:gfz_Question)
+        OPTIONAL MATCH (s:gfz_Student)-[r:REPLIED]->(q)
+        RETURN q.id as question_id,
+               q.text as question_text,
+               q.created_at as created_at,
+               q.status as status,
+               count(r) as reply_count
+        ORDER BY q.created_at DESC
+        LIMIT 20
+    """)
+    
+    questions = [dict(record) for record in result]
+    
+    # 学生参与度
+    result = tx.run("""
+        MATCH (s:gfz_Student)-[r:REPLIED]->(q:gfz_Question)
+        RETURN s.name as student_name,
+               s.student_id as student_id,
+               count(r) as reply_count
+        ORDER BY reply_count DESC
+        LIMIT 20
+    """)
+    
+    participation = [dict(record) for record in result]
+    
+    return {
+        'questions': questions,
+        'participation': participation
+    }
+
 def get_classroom_interaction_stats():
     """获取课中互动统计"""
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return {'questions': [], 'participation': []}
     
     try:
-        driver = get_neo4j_driver()
-        
-        with driver.session() as session:
-            # 问题统计
-            result = session.run("""
-                MATCH (q:gfz_Question)
-                OPTIONAL MATCH (s:gfz_Student)-[r:REPLIED]->(q)
-                RETURN q.id as question_id,
-                       q.text as question_text,
-                       q.created_at as created_at,
-                       q.status as status,
-                       count(r) as reply_count
-                ORDER BY q.created_at DESC
-                LIMIT 20
-            """)
-            
-            questions = [dict(record) for record in result]
-            
-            # 学生参与度
-            result = session.run("""
-                MATCH (s:gfz_Student)-[r:REPLIED]->(q:gfz_Question)
-                RETURN s.name as student_name,
-                       s.student_id as student_id,
-                       count(r) as reply_count
-                ORDER BY reply_count DESC
-                LIMIT 20
-            """)
-            
-            participation = [dict(record) for record in result]
-        
-        return {
-            'questions': questions,
-            'participation': participation
-        }
-    except Exception:
+        return read_transaction(_read_classroom_interaction_stats, name="课中互动统计")
+    except Exception as e:
+        print(f"获取课中互动统计失败: {e}")
         return {'questions': [], 'participation': []}
 
+def _read_module_activity_breakdown(tx, module_name):
+    """在同一个读事务中统计模块的行为类型分布和热门内容"""
+    result = tx.run("""
+        MATCH (a:gfz_Activity)
+        WHERE a.module_name = $module_name
+        RETURN COALESCE(a.activity_type, '其他') as activity_type, count(*) as count
+        ORDER BY count DESC
+    """, module_name=module_name)
+    
+    activity_types = [dict(record) for record in result]
+    
+    result = tx.run("""
+        MATCH (a:gfz_Activity)
+        WHERE a.module_name = $module_name AND a.content_name IS NOT NULL
+        RETURN a.content_name as content_name, count(*) as count
+        ORDER BY count DESC
+        LIMIT 5
+    """, module_name=module_name)
+    
+    popular_content = [dict(record) for record in result]
+    
+    return {
+        'activity_types': activity_types,
+        'popular_content': popular_content
+    }
+
+def get_module_activity_breakdown(module_name):
+    """获取模块的行为类型分布和热门内容（在数据库中聚合）"""
+    empty = {'activity_types': [], 'popular_content': []}
+    if not is_neo4j_available():
+        return empty
+    
+    try:
+        return read_transaction(_read_module_activity_breakdown, module_name, name="模块行为分布",
+                                cache_ttl=DEFAULT_TTL, cache_tags=(TAG_MODULE_STATS, module_tag(module_name)))
+    except Exception as e:
+        print(f"获取模块行为分布失败: {e}")
+        return empty
+
+def render_activity_pages(key, page_size=ACTIVITY_PAGE_SIZE, **filters):
+    """
+    分页显示活动记录，按需向更早的记录翻页
+    session_state 中只保存各页的起始游标，每次只查询并显示当前一页；
+    filters 传给 get_activity_page（student_id / module / activity_type / start / end），
+    筛选条件变化时回到第一页
+    """
+    state_key = f"activity_pages_{key}"
+    state = st.session_state.get(state_key)
+    if state is None or state['filters'] != filters:
+        state = {'filters': dict(filters), 'cursors': [None]}
+        st.session_state[state_key] = state
+    
+    page_index = len(state['cursors']) - 1
+    page = get_activity_page(cursor=state['cursors'][-1], page_size=page_size, **filters)
+    
+    if page['items']:
+        df = pd.DataFrame(page['items'])
+        display_cols = ['timestamp', 'student_id', 'student_name', 'activity_type', 'module', 'content_name', 'details']
+        display_cols = [c for c in display_cols if c in df.columns and c not in _filtered_columns(filters)]
+        st.dataframe(df[display_cols], use_container_width=True, hide_index=True)
+    elif page_index == 0:
+        st.info("暂无学习记录")
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if st.button("⬅️ 较新", key=f"{state_key}_newer", disabled=page_index == 0):
+            state['cursors'].pop()
+            st.rerun()
+    with col2:
+        st.caption(f"第 {page_index + 1} 页，每页 {page_size} 条")
+    with col3:
+        if st.button("较早 ➡️", key=f"{state_key}_older", disabled=page['next_cursor'] is None):
+            state['cursors'].append(page['next_cursor'])
+            st.rerun()
+    
+    return page['items']
+
+def _filtered_columns(filters):
+    """已经按其筛选的列不再重复显示"""
+    columns = set()
+    if filters.get('student_id'):
+        columns.update(('student_id', 'student_name'))
+    if filters.get('module'):
+        columns.add('module')
+    if filters.get('activity_type'):
+        columns.add('activity_type')
+    return columns
+
 def render_analytics_dashboard():
     """渲染数据分析面板"""
     st.title("📊 学习数据分析")
@@ -485,12 +562,42 @@ def render_classroom_stats():
         else:
             st.info("暂无参与数据")
 
+def delete_progress_callback(progress_bar):
+    """把批量删除的进度显示到 st.progress 上"""
+    def update(deleted, total):
+        progress_bar.progress(min(deleted / total, 1.0) if total else 1.0, text=f"已删除 {deleted}/{total}")
+    return update
+
+def render_pending_delete_jobs(key):
+    """显示上次中断的批量删除任务，可从剩余部分继续"""
+    try:
+        jobs = get_pending_delete_jobs()
+    except Exception as e:
+        st.error(f"获取删除任务失败: {e}")
+        return
+    
+    for job in jobs:
+        label = KIND_LABELS.get(job['kind'], job['kind'])
+        target = f" {job['target']}" if job.get('target') else ""
+        st.warning(f"⏸️ 未完成的删除任务：{label}{target}，已删除 {job['deleted']}/{job['total']}"
+                   f"（开始于 {job['started_at']}）")
+        if st.button("▶️ 继续删除", key=f"{key}_resume_{job['key']}"):
+            progress_bar = st.progress(0.0)
+            try:
+                deleted = resume_delete_job(job['key'], progress=delete_progress_callback(progress_bar))
+                st.success(f"✅ {label}{target} 已完成，共删除 {deleted} 个节点")
+                st.rerun()
+            except Exception as e:
+                st.error(f"删除中断（已删除部分保留，可再次继续）: {e}")
+
 def render_data_management():
     """渲染数据管理"""
     st.subheader("🗑️ 数据管理")
     
     st.warning("⚠️ 以下操作不可撤销，请谨慎操作！")
     
+    render_pending_delete_jobs("analytics")
+    
     # 删除特定学生数据
     st.markdown("### 删除学生数据")
     students = get_all_students()
@@ -500,9 +607,13 @@ def render_data_management():
         
         if st.button("🗑️ 删除该学生数据", type="secondary"):
             student_id = student_options[selected]
-            delete_student_data(student_id)
-            st.success(f"已删除学生 {selected} 的所有数据")
-            st.rerun()
+            progress_bar = st.progress(0.0)
+            try:
+                delete_student_data(student_id, progress=delete_progress_callback(progress_bar))
+                st.success(f"已删除学生 {selected} 的所有数据")
+                st.rerun()
+            except Exception as e:
+                st.error(f"删除中断（已删除部分保留，可再次继续）: {e}")
     
     st.divider()
     
@@ -511,9 +622,13 @@ def render_data_management():
     if st.button("🗑️ 清空所有活动记录", type="secondary"):
         confirm = st.checkbox("确认清空所有活动记录（不删除学生账号）")
         if confirm:
-            delete_all_activities()
-            st.success("已清空所有活动记录")
-            st.rerun()
+            progress_bar = st.progress(0.0)
+            try:
+                delete_all_activities(progress=delete_progress_callback(progress_bar))
+                st.success("已清空所有活动记录")
+                st.rerun()
+            except Exception as e:
+                st.error(f"清空中断（已删除部分保留，可再次继续）: {e}")
     
     st.divider()
     
@@ -551,19 +666,13 @@ def render_module_analytics(module_name):
     # 获取该模块的独立统计数据
     module_data = get_single_module_statistics(module_name)
     
-    # 如果数据库没有数据，尝试从活动记录中计算
+    # 如果数据库没有数据，从各模块汇总中取该模块（已在数据库中按模块聚合，不再拉取活动记录到本地筛选）
     if not module_data:
-        activities = get_student_activities(limit=1000)
-        module_activities = [a for a in activities if a.get('module') == module_name]
-        unique_students = len(set(a.get('student_id') for a in module_activities if a.get('student_id')))
-        today = datetime.now().strftime('%Y-%m-%d')
-        today_activities = [a for a in module_activities if str(a.get('timestamp', ''))[:10] == today]
-        
-        module_data = {
+        module_data = next((m for m in get_module_statistics() if m.get('module') == module_name), None) or {
             'module': module_name,
-            'total_activities': len(module_activities),
-            'unique_students': unique_students,
-            'today_count': len(today_activities)
+            'total_activities': 0,
+            'unique_students': 0,
+            'today_count': 0
         }
     
     # 概览卡片
@@ -601,11 +710,10 @@ def render_module_overview(module_name):
     """渲染模块整体数据"""
     st.subheader(f"📈 {module_name} - 整体学习数据")
     
-    # 获取该模块的活动数据 - 使用module参数筛选
-    activities = get_student_activities(module=module_name, limit=500)
-    module_activities = activities  # 已经是该模块的数据
+    # 行为分布和热门内容在数据库中聚合
+    breakdown = get_module_activity_breakdown(module_name)
     
-    if not module_activities:
+    if not breakdown['activity_types']:
         st.info(f"📊 {module_name}暂无学习数据记录")
         st.markdown("""
         **提示：** 当学生在此模块进行学习活动后，系统会自动记录并在此展示：
@@ -620,45 +728,26 @@ def render_module_overview(module_name):
     with col1:
         # 活动类型分布
         st.markdown("#### 📊 学习行为分布")
-        activity_types = {}
-        for a in module_activities:
-            t = a.get('activity_type', '其他')
-            activity_types[t] = activity_types.get(t, 0) + 1
-        
-        if activity_types:
-            fig = px.pie(
-                values=list(activity_types.values()),
-                names=list(activity_types.keys()),
-                title=f'{module_name} - 学习行为类型分布'
-            )
-            fig.update_layout(paper_bgcolor='rgba(0,0,0,0)')
-            st.plotly_chart(fig, use_container_width=True)
+        fig = px.pie(
+            values=[t['count'] for t in breakdown['activity_types']],
+            names=[t['activity_type'] for t in breakdown['activity_types']],
+            title=f'{module_name} - 学习行为类型分布'
+        )
+        fig.update_layout(paper_bgcolor='rgba(0,0,0,0)')
+        st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         # 热门内容
         st.markdown("#### 🔥 热门学习内容")
-        content_counts = {}
-        for a in module_activities:
-            c = a.get('content_name')
-            if c:
-                content_counts[c] = content_counts.get(c, 0) + 1
-        
-        if content_counts:
-            sorted_content = sorted(content_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-            for i, (name, count) in enumerate(sorted_content, 1):
-                st.markdown(f"**{i}. {name}** - {count}次访问")
+        if breakdown['popular_content']:
+            for i, item in enumerate(breakdown['popular_content'], 1):
+                st.markdown(f"**{i}. {item['content_name']}** - {item['count']}次访问")
         else:
             st.info("暂无内容访问记录")
     
-    # 最近活动记录
-    st.markdown(f"#### 📝 {module_name} - 最近学习记录")
-    df = pd.DataFrame(module_activities[:20])
-    display_cols = ['student_name', 'activity_type', 'content_name', 'timestamp']
-    display_cols = [c for c in display_cols if c in df.columns]
-    if display_cols:
-        df_display = df[display_cols].copy()
-        df_display.columns = ['学生', '行为', '内容', '时间'][:len(display_cols)]
-        st.dataframe(df_display, use_container_width=True, hide_index=True)
+    # 学习记录（分页，按需查看更早的记录）
+    st.markdown(f"#### 📝 {module_name} - 学习记录")
+    render_activity_pages(f"overview_{module_name}", page_size=20, module=module_name)
 
 def render_module_student_detail(module_name):
     """渲染模块个人数据"""
@@ -723,6 +812,10 @@ def render_module_student_detail(module_name):
             </div>
             """, unsafe_allow_html=True)
         
+        # 更早的记录按需分页加载
+        with st.expander(f"📜 查看全部{module_name}学习记录"):
+            render_activity_pages(f"student_{module_name}", student_id=student_id, module=module_name)
+        
         # 导出该学生数据
         df = pd.DataFrame(student_module_activities)
         csv = df.to_csv(index=False, encoding='utf-8-sig')
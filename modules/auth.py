@@ -3,9 +3,14 @@
 处理学生登录和教师登录验证
 """
 
+import threading
+
 import streamlit as st
 from datetime import datetime
 
+from modules.graph_repository import read_query, read_transaction, write_query
+from modules.query_cache import DEFAULT_TTL, TAG_ACTIVITY, TAG_MODULE_STATS, TAG_STUDENT, invalidate, module_tag
+
 # 可选导入Neo4j（仅本地开发需要）
 try:
     from neo4j import GraphDatabase
@@ -89,14 +94,16 @@ def get_all_secret_keys():
 # 教师密码
 TEACHER_PASSWORD = "admin888"
 
-# 全局缓存的Neo4j驱动（避免重复创建连接）
+# 全局缓存的Neo4j驱动（避免重复创建连接；连通性由 neo4j_health 后台线程检查）
 _cached_driver = None
-_driver_last_check = 0  # 上次检查时间戳
+_driver_lock = threading.Lock()
 
 def get_neo4j_driver():
     """获取Neo4j连接（使用缓存避免重复连接）"""
-    global _cached_driver, _driver_last_check
-    import time
+    global _cached_driver
+    
+    if _cached_driver is not None:
+        return _cached_driver
     
     # 获取配置（延迟加载）
     config = _get_neo4j_config()
@@ -108,124 +115,103 @@ def get_neo4j_driver():
     if not HAS_NEO4J or not neo4j_uri:
         return None
     
-    current_time = time.time()
-    
-    # 如果已有缓存的driver，且距离上次检查不超过60秒，直接返回
-    if _cached_driver is not None:
-        if current_time - _driver_last_check < 60:
+    # 创建新的driver
+    with _driver_lock:
+        if _cached_driver is not None:
             return _cached_driver
         try:
-            # 验证连接是否仍然有效（每60秒检查一次）
-            _cached_driver.verify_connectivity()
-            _driver_last_check = current_time
+            _cached_driver = GraphDatabase.driver(
+                neo4j_uri, 
+                auth=(neo4j_username, neo4j_password),
+                max_connection_lifetime=300,  # 5分钟
+                connection_timeout=10,
+                max_connection_pool_size=10,
+                # 托管事务的重试由 graph_repository 统一控制（带抖动和次数上限）
+                max_transaction_retry_time=0
+            )
             return _cached_driver
-        except:
-            # 连接失效，重新创建
-            try:
-                _cached_driver.close()
-            except:
-                pass
-            _cached_driver = None
-    
-    # 创建新的driver
-    try:
-        _cached_driver = GraphDatabase.driver(
-            neo4j_uri, 
-            auth=(neo4j_username, neo4j_password),
-            max_connection_lifetime=300,  # 5分钟
-            connection_timeout=10,
-            max_connection_pool_size=10
-        )
-        _driver_last_check = current_time
-        return _cached_driver
-    except Exception as e:
-        print(f"Neo4j连接创建失败: {e}")
-        return None
+        except Exception as e:
+            print(f"Neo4j连接创建失败: {e}")
+            return None
 
-# 全局变量：标记Neo4j是否可用
-_neo4j_available = None
-_neo4j_error = None
+def reset_neo4j_driver():
+    """关闭并丢弃缓存的驱动，下次获取时重新创建（由健康监测在连续失败后调用）"""
+    global _cached_driver
+    with _driver_lock:
+        driver, _cached_driver = _cached_driver, None
+    if driver is not None:
+        try:
+            driver.close()
+        except Exception:
+            pass
+
+# 未配置Neo4j时的错误说明（连接类错误由健康监测记录）
+_neo4j_config_error = None
+# 本进程是否已等待过第一次探测
+_first_check_done = False
 
 def check_neo4j_available():
-    """检查Neo4j是否可用"""
-    global _neo4j_available, _neo4j_error
+    """检查Neo4j是否可用（只读取健康监测的熔断状态，不在请求中探测连接）"""
+    global _neo4j_config_error, _first_check_done
     
-    # 如果 Streamlit 还没准备好，返回 None（不缓存结果）
+    # 如果 Streamlit 还没准备好，返回 False（配置可能还读不到）
     if not _is_streamlit_ready():
         return False
     
-    if _neo4j_available is not None:
-        return _neo4j_available
-    try:
-        driver = get_neo4j_driver()
-        if driver is None:
-            _neo4j_available = False
-            _neo4j_error = "无法创建Neo4j驱动：get_neo4j_driver()返回None"
-            print(f"[Neo4j检查失败] {_neo4j_error}")
-            return False
-            
-        with driver.session() as session:
-            result = session.run("RETURN 1")
-            result.single()
-        # 不关闭driver，保持连接池复用
-        _neo4j_available = True
-        _neo4j_error = None
-        print("[Neo4j检查成功] 连接正常")
-    except Exception as e:
-        _neo4j_available = False
-        _neo4j_error = str(e)
-        print(f"[Neo4j检查失败] {e}")
-    return _neo4j_available
+    config = _get_neo4j_config()
+    if not HAS_NEO4J or not config['uri']:
+        _neo4j_config_error = "未安装neo4j驱动" if not HAS_NEO4J else "未配置NEO4J_URI"
+        return False
+    _neo4j_config_error = None
+    
+    from modules.neo4j_health import get_health_monitor
+    monitor = get_health_monitor()
+    if not _first_check_done:
+        # 进程启动后的第一次检查最多等待一次探测结果，之后都是 O(1) 读取
+        monitor.wait_ready()
+        _first_check_done = True
+    
+    available = monitor.is_available()
+    if available:
+        # 首次连接成功后确保约束和索引存在（每个进程只执行一次）
+        from modules.schema_manager import ensure_schema_once
+        ensure_schema_once(get_neo4j_driver())
+    return available
 
 def get_neo4j_error():
     """获取Neo4j连接错误信息"""
-    return _neo4j_error
+    if _neo4j_config_error:
+        return _neo4j_config_error
+    from modules.neo4j_health import get_health_stats
+    stats = get_health_stats()
+    return stats['last_error'] if stats else None
 
 def register_student(student_id, student_name):
     """注册或更新学生信息"""
     try:
-        driver = get_neo4j_driver()
-        
-        with driver.session() as session:
-            session.run("""
-                MERGE (s:gfz_Student {student_id: $student_id})
-                SET s.name = $name,
-                    s.last_login = datetime(),
-                    s.login_count = COALESCE(s.login_count, 0) + 1
-            """, student_id=student_id, name=student_name)
-        
-        # 不关闭driver，保持连接池复用
+        write_query("""
+            MERGE (s:gfz_Student {student_id: $student_id})
+            SET s.name = $name,
+                s.last_login = datetime(),
+                s.login_count = COALESCE(s.login_count, 0) + 1
+        """, {"student_id": student_id, "name": student_name}, name="注册学生")
+        invalidate(TAG_STUDENT)
     except Exception as e:
         print(f"Neo4j连接失败，跳过学生注册: {e}")
-        pass
 
 def log_activity(student_id, activity_type, module_name, content_id=None, content_name=None, details=None):
-    """记录学生学习活动"""
-    # 如果Neo4j不可用，直接跳过
-    if not check_neo4j_available():
+    """记录学生学习活动（放入后台队列，批量异步写入；Neo4j暂时不可用时落盘，恢复后回放）"""
+    # 未配置Neo4j（如云端演示环境）时直接跳过
+    if not HAS_NEO4J or not _get_neo4j_config()['uri']:
         return
     
-    try:
-        driver = get_neo4j_driver()
-        
-        with driver.session() as session:
-            session.run("""
-                MERGE (s:gfz_Student {student_id: $student_id})
-                CREATE (a:gfz_Activity {
-                    id: randomUUID(),
-                    activity_type: $activity_type,
-                    module_name: $module_name,
-                    content_id: $content_id,
-                    content_name: $content_name,
-                    details: $details,
-                    timestamp: datetime()
-                })
-                CREATE (s)-[:PERFORMED]->(a)
-            """, student_id=student_id, activity_type=activity_type, 
-                module_name=module_name, content_id=content_id,
-                content_name=content_name, details=details)
-    except Exception as e:
-        pass
+    from modules.activity_writer import get_activity_writer, build_activity_event, spool_activity
+    event = build_activity_event(student_id, activity_type, module_name,
+                                 content_id=content_id, content_name=content_name, details=details)
+    if check_neo4j_available():
+        get_activity_writer().submit(event)
+    else:
+        spool_activity(event)
 
 def get_all_students():
     """获取所有学生列表"""
@@ -233,74 +219,97 @@ def get_all_students():
         return []
     
     try:
-        driver = get_neo4j_driver()
-        
-        with driver.session() as session:
-            result = session.run("""
-                MATCH (s:gfz_Student)
-                OPTIONAL MATCH (s)-[:PERFORMED]->(a:gfz_Activity)
-                WITH s, count(a) as activity_count
-                RETURN s.student_id as student_id, 
-                       s.name as name,
-                       activity_count
-                ORDER BY activity_count DESC
-            """)
-            
-            students = [dict(record) for record in result]
-        
-        return students
-    except:
+        # 读取写入时维护的学生计数（见 activity_rollup），不再扫描活动节点
+        return read_query("""
+            MATCH (s:gfz_Student)
+            RETURN s.student_id as student_id, 
+                   s.name as name,
+                   COALESCE(s.activity_count, 0) as activity_count
+            ORDER BY activity_count DESC
+        """, name="学生列表", cache_ttl=DEFAULT_TTL, cache_tags=(TAG_STUDENT,))
+    except Exception as e:
+        print(f"获取学生列表失败: {e}")
         return []
 
-def get_student_activities(student_id=None, module=None, limit=100):
-    """获取学生活动记录"""
+# 活动记录分页：每页条数
+ACTIVITY_PAGE_SIZE = 50
+
+def get_activity_page(cursor=None, page_size=ACTIVITY_PAGE_SIZE, student_id=None, module=None,
+                      activity_type=None, start=None, end=None):
+    """
+    按时间倒序分页读取活动记录（键集分页）
+    cursor 为上一页返回的 next_cursor，即 (时间戳字符串, 活动id)，从该位置之后继续读取；
+    每页都是一次索引范围扫描，翻到再早的页也不会变慢，也不需要在内存中保留之前的页
+    筛选条件都在数据库中执行：学生、模块（只比较 module_name 以便走索引；只有旧字段 module 的历史记录
+    在运行日键回填（同时补写 module_name）之前不会出现在按模块筛选的结果中）、
+    活动类型、时间范围 [start, end)（ISO 字符串或 datetime）
+    返回 {'items': [dict], 'next_cursor': 下一页游标或 None（没有更早的记录）}
+    """
     if not check_neo4j_available():
-        return []
+        return {'items': [], 'next_cursor': None}
+    
+    if student_id:
+        query = "MATCH (s:gfz_Student {student_id: $student_id})-[:PERFORMED]->(a:gfz_Activity)"
+    else:
+        query = "MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)"
+    conditions = ["a.timestamp IS NOT NULL"]
+    params = {"limit": page_size + 1}
+    if student_id:
+        params["student_id"] = student_id
+    
+    if module:
+        conditions.append("a.module_name = $module")
+        params["module"] = module
+    
+    if activity_type:
+        conditions.append("a.activity_type = $activity_type")
+        params["activity_type"] = activity_type
+    
+    if start:
+        conditions.append("a.timestamp >= datetime($start)")
+        params["start"] = start.isoformat() if hasattr(start, 'isoformat') else start
+    
+    if end:
+        conditions.append("a.timestamp < datetime($end)")
+        params["end"] = end.isoformat() if hasattr(end, 'isoformat') else end
+    
+    if cursor:
+        # 时间戳相同的记录按 id 排序，保证翻页不重不漏
+        conditions.append("(a.timestamp < datetime($cursor_ts) "
+                          "OR (a.timestamp = datetime($cursor_ts) AND a.id < $cursor_id))")
+        params["cursor_ts"], params["cursor_id"] = cursor
+    
+    query += """
+        WHERE """ + " AND ".join(conditions) + """
+        RETURN s.student_id as student_id,
+               s.name as student_name,
+               a.id as id,
+               COALESCE(a.activity_type, a.type) as activity_type,
+               COALESCE(a.module_name, a.module) as module,
+               a.content_id as content_id,
+               a.content_name as content_name,
+               a.details as details,
+               toString(a.timestamp) as timestamp
+        ORDER BY a.timestamp DESC, a.id DESC
+        LIMIT $limit
+    """
     
     try:
-        driver = get_neo4j_driver()
-        
-        with driver.session() as session:
-            query = """
-                MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)
-                WHERE 1=1
-            """
-            params = {"limit": limit}
-            
-            if student_id:
-                query += " AND s.student_id = $student_id"
-                params["student_id"] = student_id
-            
-            if module:
-                query += " AND COALESCE(a.module_name, a.module) = $module"
-                params["module"] = module
-            
-            query += """
-                RETURN s.student_id as student_id,
-                       s.name as student_name,
-                       COALESCE(a.activity_type, a.type) as activity_type,
-                       COALESCE(a.module_name, a.module) as module,
-                       a.content_id as content_id,
-                       a.content_name as content_name,
-                       a.details as details,
-                       a.timestamp as timestamp
-                ORDER BY a.timestamp DESC
-                LIMIT $limit
-            """
-            
-            result = session.run(query, **params)
-            activities = []
-            for record in result:
-                activity = dict(record)
-                # 将timestamp转换为字符串，避免Date序列化问题
-                if 'timestamp' in activity and activity['timestamp']:
-                    activity['timestamp'] = str(activity['timestamp'])
-                activities.append(activity)
-        
-        return activities
+        items = read_query(query, params, name="活动记录分页")
     except Exception as e:
-        print(f"获取学生活动失败: {e}")
-        return []
+        print(f"获取活动记录失败: {e}")
+        return {'items': [], 'next_cursor': None}
+    
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = (last['timestamp'], last['id'])
+    return {'items': items, 'next_cursor': next_cursor}
+
+def get_student_activities(student_id=None, module=None, limit=100):
+    """获取学生最近的活动记录（第一页；需要继续翻页时使用 get_activity_page）"""
+    return get_activity_page(page_size=limit, student_id=student_id, module=module)['items']
 
 def get_module_statistics():
     """获取各模块使用统计"""
@@ -308,24 +317,19 @@ def get_module_statistics():
         return []
     
     try:
-        driver = get_neo4j_driver()
-        
-        with driver.session() as session:
-            # 获取每个模块的详细统计
-            result = session.run("""
-                MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)
-                WITH COALESCE(a.module_name, a.module) as module, 
-                     count(a) as total_activities,
-                     count(DISTINCT s) as unique_students,
-                     collect(DISTINCT s.student_id) as student_ids
-                RETURN module, total_activities, unique_students, 0 as today_count
-                ORDER BY total_activities DESC
-            """)
-            
-            stats = [dict(record) for record in result]
-        
-        return stats
-    except:
+        # 获取每个模块的详细统计（读取模块汇总节点）
+        return read_query("""
+            MATCH (m:gfz_ModuleStats)
+            WHERE m.total_visits > 0
+            OPTIONAL MATCH (d:gfz_ModuleDayStats {module_name: m.module_name, day: date()})
+            RETURN m.module_name as module,
+                   m.total_visits as total_activities,
+                   m.unique_students as unique_students,
+                   COALESCE(d.visits, 0) as today_count
+            ORDER BY total_activities DESC
+        """, name="模块统计", cache_ttl=DEFAULT_TTL, cache_tags=(TAG_ACTIVITY,))
+    except Exception as e:
+        print(f"获取模块统计失败: {e}")
         return []
 
 def get_all_modules_statistics():
@@ -334,33 +338,50 @@ def get_all_modules_statistics():
         return {}
     
     try:
-        driver = get_neo4j_driver()
+        records = read_query("""
+            MATCH (m:gfz_ModuleStats)
+            WHERE m.total_visits > 0
+            RETURN m.module_name as module, m.total_visits as total_visits, m.unique_students as unique_students
+        """, name="全部模块统计", cache_ttl=DEFAULT_TTL, cache_tags=(TAG_ACTIVITY,))
         
-        with driver.session() as session:
-            result = session.run("""
-                MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)
-                WITH COALESCE(a.module_name, a.module) as module, count(a) as total_visits, count(DISTINCT s) as unique_students
-                RETURN module, total_visits, unique_students
-            """)
-            
-            stats_dict = {}
-            for record in result:
-                module = record['module']
-                total_visits = record['total_visits']
-                unique_students = record['unique_students']
-                avg_visits = round(total_visits / unique_students, 1) if unique_students > 0 else 0
-                stats_dict[module] = {
-                    'module': module,
-                    'total_visits': total_visits,
-                    'unique_students': unique_students,
-                    'avg_visits_per_student': avg_visits
-                }
+        stats_dict = {}
+        for record in records:
+            module = record['module']
+            total_visits = record['total_visits']
+            unique_students = record['unique_students']
+            avg_visits = round(total_visits / unique_students, 1) if unique_students > 0 else 0
+            stats_dict[module] = {
+                'module': module,
+                'total_visits': total_visits,
+                'unique_students': unique_students,
+                'avg_visits_per_student': avg_visits
+            }
         
         return stats_dict
     except Exception as e:
         print(f"获取所有模块统计失败: {e}")
         return {}
 
+def _read_single_module_statistics(tx, module_name):
+    """单模块统计的两条查询放在同一个读事务中"""
+    # 总访问次数和学生数
+    record = tx.run("""
+        MATCH (m:gfz_ModuleStats {module_name: $module})
+        RETURN m.total_visits as total_activities,
+               m.unique_students as unique_students
+    """, module=module_name).single()
+    total_activities = record['total_activities'] if record else 0
+    unique_students = record['unique_students'] if record else 0
+    
+    # 近7天访问（按日汇总，包含今天在内的最近7个自然日）
+    record = tx.run("""
+        MATCH (d:gfz_ModuleDayStats {module_name: $module})
+        WHERE d.day > date() - duration('P7D')
+        RETURN COALESCE(sum(d.visits), 0) as recent_count
+    """, module=module_name).single()
+    recent_count = record['recent_count'] if record else 0
+    return total_activities, unique_students, recent_count
+
 def get_single_module_statistics(module_name):
     """获取单个模块的详细统计"""
     if not check_neo4j_available():
@@ -373,34 +394,12 @@ def get_single_module_statistics(module_name):
         }
     
     try:
-        driver = get_neo4j_driver()
+        total_activities, unique_students, recent_count = read_transaction(
+            _read_single_module_statistics, module_name, name="单模块统计",
+            cache_ttl=DEFAULT_TTL, cache_tags=(TAG_MODULE_STATS, module_tag(module_name)))
         
-        with driver.session() as session:
-            # 总访问次数和学生数
-            result = session.run("""
-                MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)
-                WHERE COALESCE(a.module_name, a.module) = $module
-                RETURN count(a) as total_activities,
-                       count(DISTINCT s) as unique_students
-            """, module=module_name)
-            
-            record = result.single()
-            total_activities = record['total_activities'] if record else 0
-            unique_students = record['unique_students'] if record else 0
-            
-            # 计算人均访问次数
-            avg_visits = round(total_activities / unique_students, 1) if unique_students > 0 else 0
-            
-            # 近7天访问
-            result = session.run("""
-                MATCH (a:gfz_Activity)
-                WHERE COALESCE(a.module_name, a.module) = $module
-                  AND a.timestamp > datetime() - duration('P7D')
-                RETURN count(a) as recent_count
-            """, module=module_name)
-            
-            record = result.single()
-            recent_count = record['recent_count'] if record else 0
+        # 计算人均访问次数
+        avg_visits = round(total_activities / unique_students, 1) if unique_students > 0 else 0
         
         return {
             'module': module_name,
@@ -419,41 +418,24 @@ def get_single_module_statistics(module_name):
             'recent_7d_visits': 0
         }
 
-def delete_student_data(student_id):
-    """删除学生及其所有活动数据"""
+def delete_student_data(student_id, progress=None):
+    """
+    分批删除学生及其所有活动数据（见 bulk_delete），返回删除的活动数；学生不存在时返回 None
+    删除失败时抛出异常，已提交的批次保留，再次调用会继续删除剩余部分
+    """
     if not check_neo4j_available():
-        return
+        return None
     
-    try:
-        driver = get_neo4j_driver()
-        
-        with driver.session() as session:
-            # 删除活动记录
-            session.run("""
-                MATCH (s:gfz_Student {student_id: $student_id})-[:PERFORMED]->(a:gfz_Activity)
-                DETACH DELETE a
-            """, student_id=student_id)
-            
-            # 删除学生节点
-            session.run("""
-                MATCH (s:gfz_Student {student_id: $student_id})
-                DETACH DELETE s
-            """, student_id=student_id)
-    except:
-        pass
+    from modules.bulk_delete import delete_student
+    return delete_student(student_id, progress=progress)
 
-def delete_all_activities():
-    """删除所有活动记录"""
+def delete_all_activities(progress=None):
+    """分批删除所有活动记录，返回删除数；失败时抛出异常，再次调用会继续"""
     if not check_neo4j_available():
-        return
+        return None
     
-    try:
-        driver = get_neo4j_driver()
-        
-        with driver.session() as session:
-            session.run("MATCH (a:gfz_Activity) DETACH DELETE a")
-    except:
-        pass
+    from modules.bulk_delete import delete_all_activities as bulk_delete_all_activities
+    return bulk_delete_all_activities(progress=progress)
 
 def render_login_page():
     """渲染登录页面"""
@@ -537,7 +519,4 @@ def logout():
     keys_to_clear = list(st.session_state.keys())
     for key in keys_to_clear:
         del st.session_state[key]
-    
-    # 重置Neo4j可用性检查
-    global _neo4j_available
-    _neo4j_available = None
+
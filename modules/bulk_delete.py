@@ -0,0 +1,198 @@
+"""
+批量删除模块
+删除学生或清空活动记录时按固定批次分多个事务执行，避免一次 DETACH DELETE 整个集合耗尽内存或超时：
+- 开始时在库中创建删除任务节点 gfz_DeleteJob（记录总数、已删除数，删除学生时还记录其按模块-日的活动数）
+- 每批删除和任务进度在同一事务中提交；中途中断后任务节点仍在，可从剩余记录继续
+- 全部批次完成后，才在一个事务中更新汇总计数、删除任务节点，并让查询缓存失效
+"""
+
+import json
+
+from modules.activity_rollup import clear_rollups, student_day_counts, subtract_student
+from modules.graph_repository import read_query, write_transaction
+from modules.query_cache import TAG_ACTIVITY, TAG_MODULE_STATS, TAG_STUDENT, invalidate
+
+# 每批删除的节点数
+DELETE_BATCH_SIZE = 2000
+
+# 任务类型
+KIND_STUDENT = "student"
+KIND_ACTIVITIES = "activities"
+KIND_ALL = "all"
+
+KIND_LABELS = {
+    KIND_STUDENT: "删除学生",
+    KIND_ACTIVITIES: "清除所有学习记录",
+    KIND_ALL: "清除所有学生和学习记录",
+}
+
+# 各类任务依次执行的批量删除语句（每条删除最多 $batch_size 个节点并返回删除数）
+_STAGES = {
+    KIND_STUDENT: [
+        """
+        MATCH (s:gfz_Student {student_id: $target})-[:PERFORMED]->(a:gfz_Activity)
+        WITH a LIMIT $batch_size
+        DETACH DELETE a
+        RETURN count(*) AS deleted
+        """,
+    ],
+    KIND_ACTIVITIES: [
+        """
+        MATCH (a:gfz_Activity)
+        WITH a LIMIT $batch_size
+        DETACH DELETE a
+        RETURN count(*) AS deleted
+        """,
+    ],
+    KIND_ALL: [
+        """
+        MATCH (a:gfz_Activity)
+        WITH a LIMIT $batch_size
+        DETACH DELETE a
+        RETURN count(*) AS deleted
+        """,
+        """
+        MATCH (s:gfz_Student)
+        WITH s LIMIT $batch_size
+        DETACH DELETE s
+        RETURN count(*) AS deleted
+        """,
+    ],
+}
+
+_TOTAL_QUERIES = {
+    KIND_STUDENT: """
+        MATCH (s:gfz_Student {student_id: $target})
+        OPTIONAL MATCH (s)-[:PERFORMED]->(a:gfz_Activity)
+        RETURN count(a) AS total, count(DISTINCT s) AS found
+    """,
+    KIND_ACTIVITIES: """
+        MATCH (a:gfz_Activity)
+        RETURN count(a) AS total, 1 AS found
+    """,
+    KIND_ALL: """
+        CALL { MATCH (a:gfz_Activity) RETURN count(a) AS activities }
+        CALL { MATCH (s:gfz_Student) RETURN count(s) AS students }
+        RETURN activities + students AS total, 1 AS found
+    """,
+}
+
+_CREATE_JOB_QUERY = """
+    MERGE (j:gfz_DeleteJob {key: $key})
+      ON CREATE SET j.kind = $kind, j.target = $target, j.total = $total, j.deleted = 0,
+                    j.day_counts = $day_counts, j.started_at = datetime()
+    RETURN j {.*} AS job
+"""
+
+_PROGRESS_QUERY = """
+    MATCH (j:gfz_DeleteJob {key: $key})
+    SET j.deleted = j.deleted + $deleted, j.updated_at = datetime()
+"""
+
+_DELETE_JOB_QUERY = """
+    MATCH (j:gfz_DeleteJob {key: $key})
+    DELETE j
+"""
+
+
+def _job_key(kind, target):
+    return f"{kind}:{target or ''}"
+
+
+def _create_job_tx(tx, kind, target):
+    key = _job_key(kind, target)
+    existing = tx.run("MATCH (j:gfz_DeleteJob {key: $key}) RETURN j {.*} AS job", key=key).single()
+    if existing:
+        # 已有未完成的同一任务：沿用其开始时记录的总数和汇总快照
+        return existing['job']
+    record = tx.run(_TOTAL_QUERIES[kind], target=target).single()
+    if not record['found']:
+        return None
+    day_counts = json.dumps(student_day_counts(tx, target)) if kind == KIND_STUDENT else None
+    return tx.run(_CREATE_JOB_QUERY, key=key, kind=kind, target=target,
+                  total=record['total'], day_counts=day_counts).single()['job']
+
+
+def start_delete_job(kind, target=None):
+    """创建（或取回未完成的）删除任务，返回任务字典；删除学生时学生不存在返回 None"""
+    return write_transaction(_create_job_tx, kind, target, name=KIND_LABELS[kind])
+
+
+def get_pending_delete_jobs():
+    """库中未完成的删除任务（上次中断留下的），按开始时间排序"""
+    return read_query("""
+        MATCH (j:gfz_DeleteJob)
+        RETURN j.key as key, j.kind as kind, j.target as target,
+               j.total as total, j.deleted as deleted, toString(j.started_at) as started_at
+        ORDER BY j.started_at
+    """, name="未完成的删除任务")
+
+
+def _delete_batch_tx(tx, key, query, target, batch_size):
+    deleted = tx.run(query, target=target, batch_size=batch_size).single()['deleted']
+    if deleted:
+        tx.run(_PROGRESS_QUERY, key=key, deleted=deleted).consume()
+    return deleted
+
+
+def _finish_job_tx(tx, job):
+    """所有批次完成后：更新汇总计数、删除学生节点（删除学生时）、删除任务节点"""
+    if job['kind'] == KIND_STUDENT:
+        subtract_student(tx, job['target'], json.loads(job.get('day_counts') or '[]'))
+        tx.run("""
+            MATCH (s:gfz_Student {student_id: $student_id})
+            DETACH DELETE s
+        """, student_id=job['target']).consume()
+    else:
+        clear_rollups(tx)
+    tx.run(_DELETE_JOB_QUERY, key=job['key']).consume()
+
+
+def run_delete_job(job, batch_size=DELETE_BATCH_SIZE, progress=None):
+    """
+    按批执行删除任务直到完成，返回任务累计删除的节点数
+    progress(已删除数, 总数) 在每批提交后调用；任一批失败时抛出异常，已提交的批次保留，可再次调用继续
+    """
+    deleted = job.get('deleted') or 0
+    total = job.get('total') or 0
+    for query in _STAGES[job['kind']]:
+        while True:
+            count = write_transaction(_delete_batch_tx, job['key'], query, job.get('target'), batch_size,
+                                      name=KIND_LABELS[job['kind']])
+            if not count:
+                break
+            deleted += count
+            if progress:
+                progress(deleted, max(total, deleted))
+    write_transaction(_finish_job_tx, job, name=f"{KIND_LABELS[job['kind']]}完成")
+    invalidate(TAG_ACTIVITY, TAG_STUDENT, TAG_MODULE_STATS)
+    target = f" {job['target']}" if job.get('target') else ""
+    print(f"[批量删除] {KIND_LABELS[job['kind']]}{target} 完成，共删除 {deleted} 个节点")
+    return deleted
+
+
+def resume_delete_job(key, batch_size=DELETE_BATCH_SIZE, progress=None):
+    """继续一个未完成的删除任务（key 来自 get_pending_delete_jobs）"""
+    kind, _, target = key.partition(':')
+    job = start_delete_job(kind, target or None)
+    return run_delete_job(job, batch_size=batch_size, progress=progress)
+
+
+def delete_student(student_id, batch_size=DELETE_BATCH_SIZE, progress=None):
+    """分批删除学生及其所有活动；学生不存在时返回 None，否则返回删除的节点数（不含学生节点）"""
+    job = start_delete_job(KIND_STUDENT, student_id)
+    if job is None:
+        return None
+    return run_delete_job(job, batch_size=batch_size, progress=progress)
+
+
+def delete_all_activities(batch_size=DELETE_BATCH_SIZE, progress=None):
+    """分批删除所有活动记录（保留学生），返回删除数"""
+    job = start_delete_job(KIND_ACTIVITIES)
+    return run_delete_job(job, batch_size=batch_size, progress=progress)
+
+
+def delete_all_data(batch_size=DELETE_BATCH_SIZE, progress=None):
+    """分批删除所有活动记录和学生，返回删除数"""
+    job = start_delete_job(KIND_ALL)
+    return run_delete_job(job, batch_size=batch_size, progress=progress)
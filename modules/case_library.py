@@ -5,6 +5,8 @@
 
 import streamlit as st
 
+from modules.graph_repository import is_neo4j_available, read_transaction
+
 # 可选导入Elasticsearch（仅本地开发需要）
 try:
     from elasticsearch import Elasticsearch
@@ -31,16 +33,6 @@ def ensure_list(value, default=None):
         return [line.strip() for line in value.split('\n') if line.strip()]
     return default
 
-def check_neo4j_available():
-    """检查Neo4j是否可用"""
-    from modules.auth import check_neo4j_available as auth_check
-    return auth_check()
-
-def get_neo4j_driver():
-    """获取Neo4j连接（复用auth模块的缓存连接）"""
-    from modules.auth import get_neo4j_driver as auth_get_driver
-    return auth_get_driver()
-
 def get_current_student():
     """获取当前学生信息"""
     if st.session_state.get('user_role') == 'student':
@@ -104,37 +96,35 @@ def search_cases(query="", difficulty=None):
     except Exception:
         return []
 
+def _read_case_detail(tx, case_id):
+    # 获取病例基本信息
+    case = tx.run("""
+        MATCH (c:gfz_Case {id: $case_id})
+        RETURN c
+    """, case_id=case_id).single()
+    if not case:
+        return None
+    
+    case_data = dict(case['c'])
+    
+    # 获取关联的知识点
+    result = tx.run("""
+        MATCH (c:gfz_Case {id: $case_id})-[:RELATES_TO]->(k:gfz_KnowledgePoint)
+        RETURN k.id as id, k.name as name
+    """, case_id=case_id)
+    
+    case_data['knowledge_points'] = [dict(record) for record in result]
+    return case_data
+
 def get_case_detail(case_id):
     """从Neo4j获取病例详情"""
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return None
     
     try:
-        driver = get_neo4j_driver()
-        
-        with driver.session() as session:
-            # 获取病例基本信息
-            result = session.run("""
-                MATCH (c:gfz_Case {id: $case_id})
-                RETURN c
-            """, case_id=case_id)
-            
-            case = result.single()
-            if not case:
-                return None
-            
-            case_data = dict(case['c'])
-            
-            # 获取关联的知识点
-            result = session.run("""
-                MATCH (c:gfz_Case {id: $case_id})-[:RELATES_TO]->(k:gfz_KnowledgePoint)
-                RETURN k.id as id, k.name as name
-            """, case_id=case_id)
-            
-            case_data['knowledge_points'] = [dict(record) for record in result]
-        
-        return case_data
-    except Exception:
+        return read_transaction(_read_case_detail, case_id, name="病例详情")
+    except Exception as e:
+        print(f"获取病例详情失败 {case_id}: {e}")
         return None
 
 
@@ -272,7 +262,7 @@ def get_all_sample_cases():
     """获取所有案例数据（从 Neo4j 或本地数据读取）"""
     try:
         # 优先从 Neo4j 读取
-        if check_neo4j_available():
+        if is_neo4j_available():
             from modules.data_provider import get_all_cases
             cases = get_all_cases()
             if cases:
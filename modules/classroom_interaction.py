@@ -5,19 +5,10 @@
 
 import streamlit as st
 from datetime import datetime
-from openai import OpenAI
 from streamlit_autorefresh import st_autorefresh
-from config.settings import *
-
-def check_neo4j_available():
-    """检查Neo4j是否可用"""
-    from modules.auth import check_neo4j_available as auth_check
-    return auth_check()
-
-def get_neo4j_driver():
-    """获取Neo4j连接（复用auth模块的缓存连接）"""
-    from modules.auth import get_neo4j_driver as auth_get_driver
-    return auth_get_driver()
+from modules.graph_repository import is_neo4j_available, read_query, read_single, write_transaction, write_query
+from modules.llm_client import get_llm_client
+from modules.llm_stream import stream_chat_completion, write_stream
 
 def get_current_student():
     """获取当前学生信息"""
@@ -41,107 +32,90 @@ def log_interaction_activity(activity_type, content_id=None, content_name=None,
         details=details
     )
 
+def _create_question_tx(tx, question_text):
+    # 先关闭所有活跃问题
+    tx.run("MATCH (q:gfz_Question {status: 'active'}) SET q.status = 'closed'").consume()
+    
+    # 创建新问题
+    result = tx.run("""
+        CREATE (q:gfz_Question {
+            id: randomUUID(),
+            text: $text,
+            created_at: datetime(),
+            status: 'active'
+        })
+        RETURN q.id as id
+    """, text=question_text)
+    
+    return result.single()['id']
+
 def create_question(question_text):
     """教师创建问题"""
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return None
     
     try:
-        driver = get_neo4j_driver()
-        
-        with driver.session() as session:
-            # 先关闭所有活跃问题
-            session.run("MATCH (q:gfz_Question {status: 'active'}) SET q.status = 'closed'")
-            
-            # 创建新问题
-            result = session.run("""
-                CREATE (q:gfz_Question {
-                    id: randomUUID(),
-                    text: $text,
-                    created_at: datetime(),
-                    status: 'active'
-                })
-                RETURN q.id as id
-            """, text=question_text)
-            
-            question_id = result.single()['id']
-        
-        return question_id
-    except Exception:
+        return write_transaction(_create_question_tx, question_text, name="发布课堂问题")
+    except Exception as e:
+        print(f"发布问题失败: {e}")
         return None
 
 def get_active_question():
     """获取当前活跃问题"""
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return None
     
     try:
-        driver = get_neo4j_driver()
-        
-        with driver.session() as session:
-            result = session.run("""
-                MATCH (q:gfz_Question {status: 'active'})
-                RETURN q.id as id, q.text as text, q.created_at as created_at
-                ORDER BY q.created_at DESC
-                LIMIT 1
-            """)
-            
-            record = result.single()
-            question = dict(record) if record else None
-        
-        return question
-    except Exception:
+        return read_single("""
+            MATCH (q:gfz_Question {status: 'active'})
+            RETURN q.id as id, q.text as text, q.created_at as created_at
+            ORDER BY q.created_at DESC
+            LIMIT 1
+        """, name="当前课堂问题")
+    except Exception as e:
+        print(f"获取当前问题失败: {e}")
         return None
 
 def submit_reply(question_id, student_name, content):
     """学生提交回复"""
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return
     
     try:
-        driver = get_neo4j_driver()
-        
-        with driver.session() as session:
-            session.run("""
-                MATCH (q:gfz_Question {id: $question_id})
-                MERGE (s:gfz_Student {name: $student_name})
-                CREATE (s)-[:REPLIED {
-                    content: $content,
-                    timestamp: datetime(),
-                    length: size($content)
-                }]->(q)
-            """, question_id=question_id, student_name=student_name, content=content)
-    except Exception:
-        pass
+        write_query("""
+            MATCH (q:gfz_Question {id: $question_id})
+            MERGE (s:gfz_Student {name: $student_name})
+            CREATE (s)-[:REPLIED {
+                content: $content,
+                timestamp: datetime(),
+                length: size($content)
+            }]->(q)
+        """, {"question_id": question_id, "student_name": student_name, "content": content}, name="提交课堂回复")
+    except Exception as e:
+        print(f"提交回复失败: {e}")
 
 def get_recent_replies(question_id, limit=20):
     """获取最新回复"""
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return []
     
     try:
-        driver = get_neo4j_driver()
-        
-        with driver.session() as session:
-            result = session.run("""
-                MATCH (s:gfz_Student)-[r:REPLIED]->(q:gfz_Question {id: $question_id})
-                RETURN s.name as student_name, r.content as content, r.timestamp as timestamp
-                ORDER BY r.timestamp DESC
-                LIMIT $limit
-            """, question_id=question_id, limit=limit)
-            
-            replies = [dict(record) for record in result]
-        
-        return replies
-    except Exception:
+        return read_query("""
+            MATCH (s:gfz_Student)-[r:REPLIED]->(q:gfz_Question {id: $question_id})
+            RETURN s.name as student_name, r.content as content, r.timestamp as timestamp
+            ORDER BY r.timestamp DESC
+            LIMIT $limit
+        """, {"question_id": question_id, "limit": limit}, name="最新课堂回复")
+    except Exception as e:
+        print(f"获取回复失败: {e}")
         return []
 
-def summarize_replies_with_ai(question_text, replies):
-    """使用AI总结学生回复"""
-    client = OpenAI(
-        api_key=DEEPSEEK_API_KEY,
-        base_url=DEEPSEEK_BASE_URL
-    )
+def summarize_replies_with_ai(question_text, replies, stream=False):
+    """
+    使用AI总结学生回复
+    stream=True 时返回逐段产出文本的生成器，用 llm_stream.write_stream 显示
+    """
+    client = get_llm_client()
     
     replies_text = '\n'.join([f"- {r['content']}" for r in replies])
     
@@ -160,11 +134,14 @@ def summarize_replies_with_ai(question_text, replies):
 请用简洁、专业的语言，帮助教师快速掌握学生的学习情况。
 """
     
-    response = client.chat.completions.create(
+    request = dict(
         model="deepseek-chat",
-        messages=[{"role": "user", "content": prompt}],
-        stream=False
+        messages=[{"role": "user", "content": prompt}]
     )
+    if stream:
+        return stream_chat_completion(client, "课堂回复总结", **request)
+    
+    response = client.chat.completions.create(stream=False, **request)
     
     return response.choices[0].message.content
 
@@ -203,8 +180,9 @@ def render_classroom_interaction():
             st.markdown(f"### 当前问题")
             st.info(current_q['text'])
             
-            # 自动刷新
-            count = st_autorefresh(interval=3000, key="teacher_refresh")
+            # 自动刷新（AI 总结生成期间暂停，避免刷新打断流式输出）
+            if not st.session_state.get('summarizing_replies'):
+                count = st_autorefresh(interval=3000, key="teacher_refresh")
             
             st.markdown("### 学生回复（实时弹幕）")
             replies = get_recent_replies(current_q['id'])
@@ -221,14 +199,22 @@ def render_classroom_interaction():
                 
                 # AI总结
                 st.divider()
-                if st.button("🤖 AI总结回复"):
-                    with st.spinner("AI正在分析..."):
-                        try:
-                            summary = summarize_replies_with_ai(current_q['text'], replies)
-                            st.markdown("### AI总结")
-                            st.success(summary)
-                        except Exception as e:
-                            st.error(f"AI总结失败: {str(e)}")
+                if st.button("🤖 AI总结回复", on_click=lambda: st.session_state.update(summarizing_replies=True)):
+                    try:
+                        # 流式输出，边生成边显示；完成后保存，恢复自动刷新后仍然显示
+                        st.markdown("### AI总结")
+                        summary = write_stream(summarize_replies_with_ai(current_q['text'], replies, stream=True))
+                        st.session_state['reply_summary'] = {'question_id': current_q['id'], 'summary': summary}
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"AI总结失败: {str(e)}")
+                    finally:
+                        st.session_state['summarizing_replies'] = False
+                else:
+                    saved_summary = st.session_state.get('reply_summary')
+                    if saved_summary and saved_summary['question_id'] == current_q['id']:
+                        st.markdown("### AI总结")
+                        st.success(saved_summary['summary'])
             else:
                 st.info("暂无学生回复")
         else:
@@ -2,33 +2,34 @@
 从 Neo4j 读取案例和知识图谱数据
 """
 
-from modules.auth import get_neo4j_driver, check_neo4j_available
+import threading
+import time
+
+from modules.graph_repository import is_neo4j_available, read_query, read_single
 
 def get_all_cases():
     """从 Neo4j 获取所有案例"""
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return []
     
     try:
-        driver = get_neo4j_driver()
-        with driver.session() as session:
-            result = session.run("""
-                MATCH (c:gfz_Case)
-                OPTIONAL MATCH (c)-[:RELATED_TO_CHAPTER]->(ch:gfz_Chapter)
-                OPTIONAL MATCH (c)-[:RELATED_TO_KP]->(kp:gfz_KnowledgePoint)
-                RETURN {
-                    id: c.id,
-                    title: c.title,
-                    category: c.category,
-                    difficulty: c.difficulty,
-                    content: c.content,
-                    related_chapters: collect(distinct ch.name),
-                    related_kps: collect(distinct kp.id)
-                } as case
-                ORDER BY c.id
-            """)
-            
-            cases = [dict(record['case']) for record in result]
+        records = read_query("""
+            MATCH (c:gfz_Case)
+            OPTIONAL MATCH (c)-[:RELATED_TO_CHAPTER]->(ch:gfz_Chapter)
+            OPTIONAL MATCH (c)-[:RELATED_TO_KP]->(kp:gfz_KnowledgePoint)
+            RETURN {
+                id: c.id,
+                title: c.title,
+                category: c.category,
+                difficulty: c.difficulty,
+                content: c.content,
+                related_chapters: collect(distinct ch.name),
+                related_kps: collect(distinct kp.id)
+            } as case
+            ORDER BY c.id
+        """, name="全部案例")
+        
+        cases = [dict(record['case']) for record in records]
         return cases
     except Exception as e:
         print(f"获取案例失败: {e}")
@@ -36,134 +37,178 @@ def get_all_cases():
 
 def get_case_by_id(case_id):
     """从 Neo4j 获取指定 ID 的案例"""
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return None
     
     try:
-        driver = get_neo4j_driver()
-        with driver.session() as session:
-            result = session.run("""
-                MATCH (c:gfz_Case {id: $case_id})
-                OPTIONAL MATCH (c)-[:RELATED_TO_CHAPTER]->(ch:gfz_Chapter)
-                OPTIONAL MATCH (c)-[:RELATED_TO_KP]->(kp:gfz_KnowledgePoint)
-                RETURN {
-                    id: c.id,
-                    title: c.title,
-                    category: c.category,
-                    difficulty: c.difficulty,
-                    content: c.content,
-                    related_chapters: collect(distinct ch.name),
-                    related_kps: collect(distinct kp.id)
-                } as case
-            """, case_id=case_id)
-            
-            record = result.single()
-            if record:
-                return dict(record['case'])
+        record = read_single("""
+            MATCH (c:gfz_Case {id: $case_id})
+            OPTIONAL MATCH (c)-[:RELATED_TO_CHAPTER]->(ch:gfz_Chapter)
+            OPTIONAL MATCH (c)-[:RELATED_TO_KP]->(kp:gfz_KnowledgePoint)
+            RETURN {
+                id: c.id,
+                title: c.title,
+                category: c.category,
+                difficulty: c.difficulty,
+                content: c.content,
+                related_chapters: collect(distinct ch.name),
+                related_kps: collect(distinct kp.id)
+            } as case
+        """, {"case_id": case_id}, name="案例详情")
+        
+        if record:
+            return dict(record['case'])
         return None
     except Exception as e:
         print(f"获取案例失败: {e}")
         return None
 
+# 一次查询取回 模块→章节→知识点 的完整树和知识点之间的 PREREQUISITE 关系
+_KNOWLEDGE_GRAPH_QUERY = """
+    CALL {
+        MATCH (m:gfz_Module)
+        WITH m ORDER BY m.id
+        RETURN collect(m {
+            .id, .name, .description,
+            chapters: [(m)-[:CONTAINS]->(c:gfz_Chapter) | c {
+                .id, .name,
+                knowledge_points: [(c)-[:CONTAINS]->(k:gfz_KnowledgePoint) | k {
+                    .id, .name, importance: coalesce(k.importance, 3)
+                }]
+            }]
+        }) AS modules
+    }
+    CALL {
+        MATCH (a:gfz_KnowledgePoint)-[:PREREQUISITE]->(b:gfz_KnowledgePoint)
+        RETURN collect({source: a.id, target: b.id}) AS prerequisites
+    }
+    RETURN modules, prerequisites
+"""
+
+# 知识图谱进程级缓存：数据只在导入/修改图谱时变化，所有会话共享同一份
+# version 在 invalidate_knowledge_graph() 时加一，由图谱派生的数据（HTML、布局等）可用它作为缓存键
+# 图谱也可能被其他进程（导入脚本）修改，超过 KNOWLEDGE_GRAPH_TTL 秒后重新读取一次
+KNOWLEDGE_GRAPH_TTL = 3600
+_graph_lock = threading.Lock()
+_graph_cache = {'version': 0, 'data': None, 'loaded_at': 0.0}
+
+
+def _sort_by_id(items):
+    return sorted(items, key=lambda item: item.get('id') or '')
+
+
+def _load_knowledge_graph():
+    record = read_single(_KNOWLEDGE_GRAPH_QUERY, name="知识图谱")
+    if record is None:
+        return None
+    modules = []
+    for module in record['modules']:
+        chapters = []
+        for chapter in _sort_by_id(module['chapters']):
+            chapters.append({
+                "id": chapter['id'],
+                "name": chapter['name'],
+                "knowledge_points": _sort_by_id(chapter['knowledge_points'])
+            })
+        modules.append({
+            "id": module['id'],
+            "name": module['name'],
+            "description": module['description'],
+            "chapters": chapters
+        })
+    return {
+        "modules": modules,
+        "prerequisites": record['prerequisites'],
+        "source": "neo4j"
+    }
+
+
+def get_knowledge_graph_version():
+    """当前知识图谱缓存版本号"""
+    return _graph_cache['version']
+
+
+def invalidate_knowledge_graph():
+    """丢弃缓存的知识图谱（导入或修改图谱后调用），下次读取时重新查询"""
+    with _graph_lock:
+        _graph_cache['version'] += 1
+        _graph_cache['data'] = None
+    print(f"[知识图谱缓存] 已失效，版本 {_graph_cache['version']}")
+
+
 def get_knowledge_graph():
-    """从 Neo4j 获取完整的知识图谱"""
-    if not check_neo4j_available():
+    """
+    从 Neo4j 获取完整的知识图谱（含 prerequisites 前置关系列表）
+    结果在进程内缓存并被所有调用方共享，调用方不要修改返回的字典
+    """
+    if not is_neo4j_available():
         return None
     
-    try:
-        driver = get_neo4j_driver()
-        with driver.session() as session:
-            # 获取所有模块
-            modules_result = session.run("""
-                MATCH (m:gfz_Module)
-                RETURN m.id as id, m.name as name, m.description as description
-                ORDER BY m.id
-            """)
-            
-            modules = []
-            for module_record in modules_result:
-                module = {
-                    "id": module_record["id"],
-                    "name": module_record["name"],
-                    "description": module_record["description"],
-                    "chapters": []
-                }
-                
-                # 获取该模块的所有章节
-                chapters_result = session.run("""
-                    MATCH (m:gfz_Module {id: $module_id})-[:CONTAINS]->(c:gfz_Chapter)
-                    RETURN c.id as id, c.name as name
-                    ORDER BY c.id
-                """, module_id=module["id"])
-                
-                for chapter_record in chapters_result:
-                    chapter = {
-                        "id": chapter_record["id"],
-                        "name": chapter_record["name"],
-                        "knowledge_points": []
-                    }
-                    
-                    # 获取该章节的所有知识点
-                    kps_result = session.run("""
-                        MATCH (c:gfz_Chapter {id: $chapter_id})-[:CONTAINS]->(k:gfz_KnowledgePoint)
-                        RETURN k.id as id, k.name as name, k.importance as importance
-                        ORDER BY k.id
-                    """, chapter_id=chapter["id"])
-                    
-                    for kp_record in kps_result:
-                        chapter["knowledge_points"].append({
-                            "id": kp_record["id"],
-                            "name": kp_record["name"],
-                            "importance": kp_record["importance"] or 3
-                        })
-                    
-                    module["chapters"].append(chapter)
-                
-                modules.append(module)
-            
-            return {
-                "modules": modules,
-                "source": "neo4j"
-            }
-    except Exception as e:
-        print(f"获取知识图谱失败: {e}")
-        return None
+    cached = _graph_cache['data']
+    if cached is not None and time.monotonic() - _graph_cache['loaded_at'] < KNOWLEDGE_GRAPH_TTL:
+        return cached
+    
+    with _graph_lock:
+        # 等锁期间其他会话可能已经加载完成
+        cached = _graph_cache['data']
+        if cached is not None and time.monotonic() - _graph_cache['loaded_at'] < KNOWLEDGE_GRAPH_TTL:
+            return cached
+        try:
+            data = _load_knowledge_graph()
+        except Exception as e:
+            print(f"获取知识图谱失败: {e}")
+            return None
+        if data is not None:
+            if cached is not None:
+                # TTL 到期重新读取：数据可能已被其他进程修改，派生缓存一并换代
+                _graph_cache['version'] += 1
+            _graph_cache['data'] = data
+            _graph_cache['loaded_at'] = time.monotonic()
+        return data
 
 def get_knowledge_modules():
     """获取知识模块列表（用于导航）"""
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return []
     
     try:
-        driver = get_neo4j_driver()
-        with driver.session() as session:
-            result = session.run("""
-                MATCH (m:gfz_Module)
-                OPTIONAL MATCH (m)-[:CONTAINS]->(c:gfz_Chapter)
-                OPTIONAL MATCH (c)-[:CONTAINS]->(k:gfz_KnowledgePoint)
-                RETURN m.id as id, m.name as name, 
-                       count(distinct c) as chapter_count,
-                       count(distinct k) as kp_count
-                ORDER BY m.id
-            """)
-            
-            modules = [dict(record) for record in result]
-        return modules
+        return read_query("""
+            MATCH (m:gfz_Module)
+            OPTIONAL MATCH (m)-[:CONTAINS]->(c:gfz_Chapter)
+            OPTIONAL MATCH (c)-[:CONTAINS]->(k:gfz_KnowledgePoint)
+            RETURN m.id as id, m.name as name,
+                   count(distinct c) as chapter_count,
+                   count(distinct k) as kp_count
+            ORDER BY m.id
+        """, name="知识模块列表")
     except Exception as e:
         print(f"获取模块列表失败: {e}")
         return []
 
-def search_knowledge_points(keyword):
-    """搜索知识点"""
-    if not check_neo4j_available():
+# Lucene 查询语法中的特殊字符，用户输入按字面匹配时需要转义
+_LUCENE_SPECIAL = set('+-&|!(){}[]^"~*?:\\/')
+
+def _lucene_escape(keyword):
+    return "".join("\\" + char if char in _LUCENE_SPECIAL else char for char in keyword)
+
+def search_knowledge_points(keyword, limit=20):
+    """
+    搜索知识点：走 Neo4j 全文索引（cjk 分析器），按相关度和重要程度排序
+    Neo4j 不可用或全文索引尚未建立时，改用本地图谱的内存索引
+    """
+    keyword = (keyword or "").strip()
+    if not keyword:
         return []
     
-    try:
-        driver = get_neo4j_driver()
-        with driver.session() as session:
-            result = session.run("""
-                MATCH (k:gfz_KnowledgePoint)
-                WHERE k.name CONTAINS $keyword
+    if is_neo4j_available():
+        try:
+            records = read_query("""
+                CALL db.index.fulltext.queryNodes('gfz_knowledge_point_fulltext', $query)
+                YIELD node AS k, score
+                // 相关度按重要程度（1~5）加权 0.8~1.2 倍
+                WITH k, score, score * (0.7 + 0.1 * coalesce(k.importance, 3)) AS rank
+                ORDER BY rank DESC
+                LIMIT $limit
                 OPTIONAL MATCH (c:gfz_Chapter)-[:CONTAINS]->(k)
                 OPTIONAL MATCH (m:gfz_Module)-[:CONTAINS]->(c)
                 RETURN {
@@ -171,13 +216,14 @@ def search_knowledge_points(keyword):
                     name: k.name,
                     importance: k.importance,
                     chapter_name: c.name,
-                    module_name: m.name
+                    module_name: m.name,
+                    score: score
                 } as kp
-                LIMIT 20
-            """, keyword=keyword)
-            
-            kps = [dict(record['kp']) for record in result]
-        return kps
-    except Exception as e:
-        print(f"搜索知识点失败: {e}")
-        return []
+                ORDER BY rank DESC
+            """, {"query": _lucene_escape(keyword), "limit": limit}, name="知识点搜索")
+            return [dict(record['kp']) for record in records]
+        except Exception as e:
+            print(f"搜索知识点失败，改用本地索引: {e}")
+    
+    from modules.knowledge_search import search_local_knowledge_points
+    return search_local_knowledge_points(keyword, limit=limit)
@@ -0,0 +1,29 @@
+"""
+知识图谱渐进展开组件（双向 Streamlit 组件）
+前端见 graph_explorer_frontend/index.html：首屏只画 initial 中的节点，点击节点返回 {node, seq}，
+Python 取出该节点的邻居后作为 expansion 传回，前端合并进已有的 vis DataSet
+前端用到的静态资源加载函数和图谱解码函数不在 index.html 中复制一份，而是作为 runtime 参数传入
+（static_assets.LOADER_JS、graph_wire.DECODER_JS），与其他图谱页面共用同一份代码
+"""
+
+from pathlib import Path
+
+import streamlit.components.v1 as components
+
+from modules.graph_wire import DECODER_JS
+from modules.static_assets import LOADER_JS, vis_network_urls
+
+_FRONTEND_DIR = Path(__file__).parent / "graph_explorer_frontend"
+_component = components.declare_component("graph_explorer", path=str(_FRONTEND_DIR))
+# 前端首次渲染时执行，定义 loadStaticAssets() 和 decodeGraph()
+_RUNTIME_JS = LOADER_JS + DECODER_JS
+
+
+def graph_explorer(initial, expansion=None, height=1000, key=None):
+    """
+    渲染渐进展开图谱
+    initial: {"nodes": [...], "edges": [...]} 首屏数据；expansion: 最近一次点击的邻居 {"seq", "node", "nodes", "edges"}
+    返回最近一次点击 {"node": 节点id, "seq": 序号}，没有点击时返回 None
+    """
+    return _component(initial=initial, expansion=expansion, height=height, assets=vis_network_urls(),
+                      runtime=_RUNTIME_JS, key=key, default=None)
@@ -0,0 +1,177 @@
+"""
+知识图谱布局模块
+在服务端一次性计算节点坐标，浏览器端关闭物理引擎直接按坐标绘制，不再每次加载都重新做力导向布局：
+- 径向树布局：模块/章节/知识点按层级排在同心圆上，每棵子树按叶子数分配扇区（O(n)，任意规模可用）
+- 力导向微调：以径向布局为初始位置，用 NumPy 做少量迭代，让关联边（前置、相关）两端靠近
+- 结果按调用方给的键（含图谱数据版本）在进程内缓存，所有会话共享
+"""
+
+import math
+import threading
+from collections import OrderedDict
+
+# 可选导入 NumPy（没有时只用径向布局）
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# 相邻两层之间的半径差、同一层相邻节点的最小弧长（像素）
+RING_GAP = 450
+NODE_SPACING = 140
+# 力导向微调的迭代次数；节点数超过上限时跳过（两两斥力的内存为 O(n²)）
+FORCE_ITERATIONS = 60
+FORCE_MAX_NODES = 1500
+# 缓存的布局数量上限
+MAX_LAYOUTS = 64
+
+
+def tree_parents(edges, tree_types):
+    """从 (起点, 终点, 类型) 边中取出树形关系：子节点 -> 父节点（同一子节点只取第一条）"""
+    parents = {}
+    for source, target, edge_type in edges:
+        if edge_type in tree_types and target not in parents and source != target:
+            parents[target] = source
+    return parents
+
+
+def _tree(node_ids, parents):
+    """返回 (根节点列表, 子节点表, 深度)；父节点不在图中或成环的节点当作根"""
+    id_set = set(node_ids)
+    children = {}
+    roots = []
+    for node_id in node_ids:
+        parent = parents.get(node_id)
+        if parent in id_set:
+            children.setdefault(parent, []).append(node_id)
+        else:
+            roots.append(node_id)
+
+    base = 0 if len(roots) == 1 else 1
+    depth = {}
+    stack = [(root, base) for root in reversed(roots)]
+    while True:
+        while stack:
+            node_id, d = stack.pop()
+            if node_id in depth:
+                continue
+            depth[node_id] = d
+            for child in reversed(children.get(node_id, ())):
+                stack.append((child, d + 1))
+        # 成环的节点从任何根都到不了，取环上第一个节点作为新根
+        orphan = next((node_id for node_id in node_ids if node_id not in depth), None)
+        if orphan is None:
+            break
+        roots.append(orphan)
+        stack.append((orphan, base))
+    return roots, children, depth
+
+
+def radial_tree_layout(node_ids, parents):
+    """径向树布局，返回 {节点: [x, y]}"""
+    if not node_ids:
+        return {}
+    roots, children, depth = _tree(node_ids, parents)
+
+    # 子树叶子数（后序遍历），决定扇区大小
+    weight = {}
+    for node_id in sorted(depth, key=depth.get, reverse=True):
+        kids = [child for child in children.get(node_id, ()) if depth.get(child) == depth[node_id] + 1]
+        weight[node_id] = max(1, sum(weight[child] for child in kids))
+
+    # 每层半径：至少比上一层大 RING_GAP，且周长能排下该层全部节点
+    per_depth = {}
+    for d in depth.values():
+        per_depth[d] = per_depth.get(d, 0) + 1
+    radius = {}
+    previous = None
+    for d in sorted(per_depth):
+        r = 0.0 if d == 0 else max(d * RING_GAP, per_depth[d] * NODE_SPACING / (2 * math.pi))
+        if previous is not None:
+            r = max(r, previous + RING_GAP)
+        radius[d] = previous = r
+
+    positions = {}
+    total = sum(weight[root] for root in roots)
+    stack = []
+    start = 0.0
+    for root in roots:
+        span = 2 * math.pi * weight[root] / total
+        stack.append((root, start, span))
+        start += span
+    while stack:
+        node_id, start, span = stack.pop()
+        angle = start + span / 2
+        r = radius[depth[node_id]]
+        positions[node_id] = [r * math.cos(angle), r * math.sin(angle)]
+        kids = [child for child in children.get(node_id, ()) if depth.get(child) == depth[node_id] + 1]
+        kid_total = sum(weight[child] for child in kids)
+        for child in kids:
+            child_span = span * weight[child] / kid_total
+            stack.append((child, start, child_span))
+            start += child_span
+    return positions
+
+
+def force_refine(positions, edges, iterations=FORCE_ITERATIONS):
+    """以给定坐标为初始位置做力导向微调（Fruchterman-Reingold，温度逐步降低），就地更新 positions"""
+    if not HAS_NUMPY or len(positions) < 3 or len(positions) > FORCE_MAX_NODES:
+        return positions
+    ids = list(positions)
+    index = {node_id: i for i, node_id in enumerate(ids)}
+    pos = np.array([positions[node_id] for node_id in ids], dtype=float)
+    pairs = np.array([(index[s], index[t]) for s, t in edges if s in index and t in index and s != t], dtype=int)
+    # 固定种子的微小扰动，避免重合点之间斥力方向不确定
+    pos += np.random.RandomState(42).uniform(-1, 1, pos.shape)
+
+    k = NODE_SPACING * 1.2
+    temperature = RING_GAP * 0.25
+    for step in range(iterations):
+        delta = pos[:, None, :] - pos[None, :, :]
+        dist2 = np.maximum((delta ** 2).sum(axis=2), 1.0)
+        disp = (delta * (k * k / dist2)[:, :, None]).sum(axis=1)
+        if len(pairs):
+            edge_delta = pos[pairs[:, 0]] - pos[pairs[:, 1]]
+            edge_dist = np.sqrt(np.maximum((edge_delta ** 2).sum(axis=1), 1.0))
+            pull = edge_delta * (edge_dist / k)[:, None]
+            np.add.at(disp, pairs[:, 0], -pull)
+            np.add.at(disp, pairs[:, 1], pull)
+        length = np.sqrt(np.maximum((disp ** 2).sum(axis=1), 1e-9))
+        limit = temperature * (1 - step / iterations)
+        pos += disp * (np.minimum(length, limit) / length)[:, None]
+
+    for node_id, i in index.items():
+        positions[node_id] = [float(pos[i, 0]), float(pos[i, 1])]
+    return positions
+
+
+def compute_layout(node_ids, edges, parents, refine=True):
+    """
+    计算布局，返回 {节点: (x, y)}（整数坐标）
+    edges 为 [(起点, 终点)]，parents 为树形关系（子节点 -> 父节点），决定径向布局的层级
+    """
+    positions = radial_tree_layout(list(node_ids), parents)
+    if refine:
+        force_refine(positions, edges)
+    return {node_id: (int(round(x)), int(round(y))) for node_id, (x, y) in positions.items()}
+
+
+# 进程级布局缓存
+_layouts = OrderedDict()
+_layout_lock = threading.Lock()
+
+
+def get_layout(key, node_ids, edges, parents):
+    """按 key 缓存的 compute_layout；key 应包含图谱数据版本，数据变化后自然换用新布局"""
+    with _layout_lock:
+        positions = _layouts.get(key)
+        if positions is not None:
+            _layouts.move_to_end(key)
+            return positions
+    positions = compute_layout(node_ids, edges, parents)
+    with _layout_lock:
+        _layouts[key] = positions
+        while len(_layouts) > MAX_LAYOUTS:
+            _layouts.popitem(last=False)
+    return positions
@@ -0,0 +1,284 @@
+"""
+图数据库访问层
+所有模块统一通过这里读写 Neo4j：
+- 读写分别走 execute_read / execute_write 托管事务（读请求可路由到只读副本）
+- 连接类/瞬时错误自动重试（指数退避 + 随机抖动），连接错误上报健康监测
+- 每个查询有超时，读查询有返回行数上限
+- 调用次数、重试、失败、耗时在此统一统计
+- 读查询可选用进程级结果缓存（query_cache），按标签失效
+- 每次执行按查询指纹记录耗时、行数和调用函数（query_metrics），可按比例抽样 PROFILE 记录 db hits
+"""
+
+import random
+import sys
+import threading
+import time
+
+from modules.query_cache import get_query_cache, make_key
+from modules.query_metrics import fingerprint, get_query_metrics, normalize_query, sum_db_hits
+
+# 可选导入Neo4j（云端演示环境可能未安装）
+try:
+    from neo4j import unit_of_work
+    from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+    HAS_NEO4J = True
+except ImportError:
+    HAS_NEO4J = False
+    unit_of_work = None
+    ServiceUnavailable = SessionExpired = TransientError = ()
+
+# 查询超时（秒）
+READ_TIMEOUT = 15.0
+WRITE_TIMEOUT = 30.0
+# 读查询默认最多返回的行数，超出部分丢弃并记录
+MAX_ROWS = 5000
+# 重试：最多重试次数与退避参数（秒）
+MAX_RETRIES = 3
+RETRY_BASE_DELAY = 0.2
+RETRY_MAX_DELAY = 2.0
+# 单条语句查询以此比例抽样加 PROFILE 执行，记录 db hits（0 表示关闭；PROFILE 本身有额外开销）
+PROFILE_SAMPLE_RATE = 0.0
+
+
+class GraphUnavailableError(RuntimeError):
+    """Neo4j 未配置或熔断中，本次请求未发送到数据库"""
+
+
+def is_neo4j_available():
+    """Neo4j 当前是否可用（只读健康监测状态，不做网络操作）"""
+    from modules.auth import check_neo4j_available
+    return check_neo4j_available()
+
+
+def _is_connectivity_error(error):
+    return isinstance(error, (ServiceUnavailable, SessionExpired))
+
+
+def _is_retryable(error):
+    if isinstance(error, (ServiceUnavailable, SessionExpired, TransientError)):
+        return True
+    is_retryable = getattr(error, 'is_retryable', None)
+    return bool(is_retryable()) if callable(is_retryable) else False
+
+
+def _retry_delay(attempt):
+    """第 attempt 次重试前的等待时间：指数退避，乘以 [0.5, 1) 的随机抖动"""
+    return min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+
+# ---------- 统计 ----------
+
+_stats_lock = threading.Lock()
+_stats = {
+    'reads': 0,
+    'writes': 0,
+    'retries': 0,
+    'failures': 0,
+    'unavailable': 0,
+    'truncated': 0,
+    'total_ms': 0.0,
+    'max_ms': 0.0,
+    'last_error': None
+}
+
+
+def _record(access_mode, elapsed_ms, retries, error=None):
+    with _stats_lock:
+        _stats['reads' if access_mode == 'read' else 'writes'] += 1
+        _stats['retries'] += retries
+        _stats['total_ms'] += elapsed_ms
+        _stats['max_ms'] = round(max(_stats['max_ms'], elapsed_ms), 2)
+        if error is not None:
+            _stats['failures'] += 1
+            _stats['last_error'] = str(error)
+
+
+def _incr(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def set_profile_sample_rate(rate):
+    """设置 PROFILE 抽样比例（0~1）"""
+    global PROFILE_SAMPLE_RATE
+    PROFILE_SAMPLE_RATE = min(max(float(rate), 0.0), 1.0)
+
+
+def _caller():
+    """调用数据库访问层的业务函数（跳过本模块和缓存模块内部的栈帧）"""
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_globals.get('__name__') in _INTERNAL_MODULES:
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    return f"{frame.f_globals.get('__name__')}.{frame.f_code.co_name}"
+
+
+def _row_count(result):
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        return 1
+    if result is None:
+        return 0
+    return None
+
+
+def get_repository_stats():
+    """数据库访问统计：读写次数、重试、失败、平均/最大耗时"""
+    with _stats_lock:
+        stats = dict(_stats)
+    calls = stats['reads'] + stats['writes']
+    stats['avg_ms'] = round(stats['total_ms'] / calls, 2) if calls else 0.0
+    stats['total_ms'] = round(stats['total_ms'], 2)
+    return stats
+
+
+# ---------- 事务执行 ----------
+
+def _execute(access_mode, work, args, timeout, name, query=None, profile_box=None):
+    """
+    在托管事务中执行 work(tx, *args)，按需重试；失败时抛出最后一次的异常
+    query 为单条语句的查询文本（按其指纹统计），否则按 work 函数统计；profile_box 接收抽样 PROFILE 的 db hits
+    """
+    if query is not None:
+        metric_key, metric_query = fingerprint(query), normalize_query(query)
+    else:
+        metric_key = metric_query = f"tx:{work.__module__}.{work.__qualname__}"
+    caller = _caller()
+    
+    if not is_neo4j_available():
+        _incr('unavailable')
+        raise GraphUnavailableError("Neo4j不可用")
+    from modules.auth import get_neo4j_driver
+    driver = get_neo4j_driver()
+    if driver is None:
+        _incr('unavailable')
+        raise GraphUnavailableError("Neo4j驱动不可用")
+
+    if timeout and unit_of_work is not None:
+        work = unit_of_work(timeout=timeout)(work)
+
+    start = time.perf_counter()
+    attempt = 0
+    while True:
+        try:
+            with driver.session() as session:
+                if access_mode == 'read':
+                    result = session.execute_read(work, *args)
+                else:
+                    result = session.execute_write(work, *args)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            _record(access_mode, elapsed_ms, attempt)
+            get_query_metrics().record(metric_key, name or metric_key, access_mode, metric_query, caller,
+                                       elapsed_ms, rows=_row_count(result),
+                                       db_hits=(profile_box or {}).get('db_hits'))
+            return result
+        except Exception as e:
+            if _is_retryable(e) and attempt < MAX_RETRIES:
+                attempt += 1
+                time.sleep(_retry_delay(attempt))
+                continue
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            _record(access_mode, elapsed_ms, attempt, error=e)
+            get_query_metrics().record(metric_key, name or metric_key, access_mode, metric_query, caller,
+                                       elapsed_ms, error=e)
+            if _is_connectivity_error(e):
+                from modules.neo4j_health import get_health_monitor
+                get_health_monitor().report_failure(e)
+            print(f"[数据库{'读' if access_mode == 'read' else '写'}失败] {name or '未命名查询'}: {e}")
+            raise
+
+
+def _cached(key, cache_ttl, cache_tags, load):
+    """cache_ttl 为 None 时不使用缓存；否则先查缓存，未命中再执行 load() 并写入"""
+    if cache_ttl is None:
+        return load()
+    cache = get_query_cache()
+    hit, value = cache.get(key)
+    if hit:
+        return value
+    generation = cache.generation_for(cache_tags)
+    value = load()
+    cache.set(key, value, ttl=cache_ttl, tags=cache_tags, generation=generation)
+    return value
+
+
+def read_transaction(work, *args, timeout=READ_TIMEOUT, name=None, cache_ttl=None, cache_tags=()):
+    """
+    在只读托管事务中执行 work(tx, *args) 并返回其结果（用于需要多条语句的读取）
+    指定 cache_ttl（秒）时结果按 work 和参数缓存，cache_tags 用于写入后失效
+    """
+    key = make_key('tx', f"{work.__module__}.{work.__qualname__}", args)
+    return _cached(key, cache_ttl, cache_tags, lambda: _execute('read', work, args, timeout, name))
+
+
+def write_transaction(work, *args, timeout=WRITE_TIMEOUT, name=None):
+    """在写托管事务中执行 work(tx, *args)，多条语句要么全部提交要么全部回滚"""
+    return _execute('write', work, args, timeout, name)
+
+
+def _fetch(result, max_rows, name):
+    records = []
+    for record in result:
+        if max_rows is not None and len(records) >= max_rows:
+            _incr('truncated')
+            print(f"[数据库读取] {name or '未命名查询'} 超过 {max_rows} 行，已截断")
+            break
+        records.append(dict(record))
+    return records
+
+
+def _fetch_first(result):
+    records = result.fetch(1)
+    return dict(records[0]) if records else None
+
+
+def _statement(query, params, fetch, profile_box):
+    """单条语句的 work：按抽样比例在语句前加 PROFILE，执行计划中的 db hits 写入 profile_box"""
+    profile = PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+    
+    def work(tx):
+        result = tx.run(("PROFILE " + query) if profile else query, params or {})
+        value = fetch(result)
+        summary = result.consume()
+        if profile:
+            profile_box['db_hits'] = sum_db_hits(summary.profile)
+        return value
+    return work
+
+
+def read_query(query, params=None, timeout=READ_TIMEOUT, max_rows=MAX_ROWS, name=None,
+               cache_ttl=None, cache_tags=()):
+    """执行只读查询，返回 [dict]（每条记录一个字典）；cache_ttl/cache_tags 同 read_transaction"""
+    def load():
+        box = {}
+        work = _statement(query, params, lambda result: _fetch(result, max_rows, name), box)
+        return _execute('read', work, (), timeout, name, query=query, profile_box=box)
+    key = make_key('query', query, params or {}, max_rows)
+    return _cached(key, cache_ttl, cache_tags, load)
+
+
+def read_single(query, params=None, timeout=READ_TIMEOUT, name=None):
+    """执行只读查询，返回第一条记录（dict）或 None"""
+    box = {}
+    work = _statement(query, params, _fetch_first, box)
+    return _execute('read', work, (), timeout, name, query=query, profile_box=box)
+
+
+def read_value(query, params=None, key='count', default=0, timeout=READ_TIMEOUT, name=None):
+    """执行只读查询，返回第一条记录中 key 字段的值（常用于 count 查询）"""
+    record = read_single(query, params, timeout=timeout, name=name)
+    if record is None or record.get(key) is None:
+        return default
+    return record[key]
+
+
+def write_query(query, params=None, timeout=WRITE_TIMEOUT, name=None):
+    """执行写查询，返回 [dict]（查询有 RETURN 时）"""
+    box = {}
+    work = _statement(query, params, lambda result: _fetch(result, None, name), box)
+    return _execute('write', work, (), timeout, name, query=query, profile_box=box)
+
+
+_INTERNAL_MODULES = {__name__, 'modules.query_cache'}
@@ -0,0 +1,135 @@
+"""
+图谱传输格式模块
+发给浏览器的 vis.js 数据改用紧凑格式，由页面中的 decodeGraph() 还原成 vis 节点/边：
+- 节点、边用整数 id（在完整图谱中的序号，各页面、各次展开一致，可直接合并去重）
+- 颜色、大小、形状、边框、字号按 (分类, 层级) 放进样式表，节点只记样式序号
+- 节点标签、边类型各存一份去重表；提示文字（"名称 (分类)"）在浏览器端拼出，不再传输
+"""
+
+import json
+from functools import lru_cache
+
+# 节点样式中由分类/层级决定、在浏览器端按样式表补全的字段
+LEVEL_SIZES = {1: 60, 2: 50, 3: 40}
+EDGE_COLOR = "#999999"
+
+# 把紧凑格式还原成 vis.js 的 {nodes, edges}
+DECODER_JS = """
+function decodeGraph(g) {
+    var nodes = g.n.map(function(n) {
+        var style = g.s[n[1]];
+        var label = g.l[n[4]];
+        return {
+            id: n[0], x: n[2], y: n[3], label: label,
+            title: label + " (" + g.c[style[0]] + ")",
+            color: style[1], size: style[2], shape: "dot",
+            borderWidth: n[0] === g.sel ? 5 : 2,
+            font: {size: style[3]}
+        };
+    });
+    var edges = g.e.map(function(e) {
+        var type = g.t[e[3]];
+        return {id: e[0], from: e[1], to: e[2], label: type, title: type, color: g.ec, arrows: "to"};
+    });
+    return {nodes: nodes, edges: edges};
+}
+"""
+
+
+@lru_cache(maxsize=1)
+def _graph_ids():
+    """完整图谱中节点和关系的整数 id：节点 id -> 序号，(起点, 终点, 类型) -> 序号"""
+    from data.knowledge_graph_graph_format import get_nodes, get_relationships
+    node_ids = {node["id"]: i for i, node in enumerate(get_nodes())}
+    rel_ids = {}
+    for i, rel in enumerate(get_relationships()):
+        rel_ids.setdefault((rel["source"], rel["target"], rel["type"]), i)
+    return node_ids, rel_ids
+
+
+def node_number(node_id):
+    return _graph_ids()[0].get(node_id)
+
+
+def node_key(number):
+    """整数 id -> 原始节点 id（浏览器端点击返回的是整数 id）"""
+    from data.knowledge_graph_graph_format import get_nodes
+    nodes = get_nodes()
+    return nodes[number]["id"] if isinstance(number, int) and 0 <= number < len(nodes) else None
+
+
+def encode_graph(nodes, relationships, positions, selected_node_id=None, colors=None):
+    """
+    图谱节点/关系 -> 紧凑格式（dict，可直接 json.dumps）
+    positions: {节点 id: (x, y)}；colors: {分类: 颜色}
+    """
+    node_ids, rel_ids = _graph_ids()
+    colors = colors or {}
+    categories = []
+    styles = []
+    style_index = {}
+    labels = []
+    label_index = {}
+    encoded_nodes = []
+    for node in nodes:
+        category = node["category"]
+        if category not in categories:
+            categories.append(category)
+        level = node.get("level")
+        style_key = (category, level)
+        if style_key not in style_index:
+            style_index[style_key] = len(styles)
+            styles.append([categories.index(category), colors.get(category, "#888888"),
+                           LEVEL_SIZES.get(level, 40), 14 if level == 1 else 12])
+        label = node["label"]
+        if label not in label_index:
+            label_index[label] = len(labels)
+            labels.append(label)
+        x, y = positions[node["id"]]
+        encoded_nodes.append([node_ids[node["id"]], style_index[style_key], x, y, label_index[label]])
+
+    edge_types = []
+    encoded_edges = []
+    seen = set()
+    for rel in relationships:
+        number = rel_ids[(rel["source"], rel["target"], rel["type"])]
+        if number in seen:
+            continue
+        seen.add(number)
+        if rel["type"] not in edge_types:
+            edge_types.append(rel["type"])
+        encoded_edges.append([number, node_ids[rel["source"]], node_ids[rel["target"]],
+                              edge_types.index(rel["type"])])
+
+    return {
+        "c": categories,
+        "s": styles,
+        "l": labels,
+        "n": encoded_nodes,
+        "t": edge_types,
+        "e": encoded_edges,
+        "ec": EDGE_COLOR,
+        "sel": node_ids.get(selected_node_id, -1)
+    }
+
+
+def dumps(payload):
+    """紧凑 JSON（无多余空格，中文不转义）"""
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def group_node_styles(nodes, keys=("color", "size", "shape", "borderWidth")):
+    """
+    pyvis 节点：把重复的样式字段移到 vis groups，节点只保留 group 名
+    就地修改 nodes，返回 {组名: 样式}，放到 options["groups"]
+    """
+    groups = {}
+    names = {}
+    for node in nodes:
+        style = {key: node.pop(key) for key in keys if key in node}
+        style_key = json.dumps(style, sort_keys=True)
+        if style_key not in names:
+            names[style_key] = f"g{len(names)}"
+            groups[names[style_key]] = style
+        node["group"] = names[style_key]
+    return groups
@@ -3,20 +3,16 @@
 可视化展示五模块知识图谱
 """
 
+import threading
+
 import streamlit as st
 import streamlit.components.v1 as components
 from pyvis.network import Network
 from config.settings import *
-
-def check_neo4j_available():
-    """检查Neo4j是否可用"""
-    from modules.auth import check_neo4j_available as auth_check
-    return auth_check()
-
-def get_neo4j_driver():
-    """获取Neo4j连接（复用auth模块的缓存连接）"""
-    from modules.auth import get_neo4j_driver as auth_get_driver
-    return auth_get_driver()
+from modules.graph_layout import get_layout, tree_parents
+from modules.graph_wire import group_node_styles
+from modules.graph_repository import is_neo4j_available, read_query
+from modules.static_assets import use_static_assets_in_pyvis
 
 def get_current_student():
     """获取当前学生信息"""
@@ -40,77 +36,111 @@ def log_graph_activity(activity_type, content_id=None, content_name=None, detail
         details=details
     )
 
+def _graph_records(graph_data, module_id=None):
+    """把 data_provider 返回的嵌套知识图谱展开成 m/c/k/k2 记录（与下方 Cypher 降级查询的结果格式一致）"""
+    records = []
+    kp_by_id = {}
+    for module in graph_data['modules']:
+        for chapter in module['chapters']:
+            for kp in chapter['knowledge_points']:
+                kp_by_id[kp['id']] = kp
+    prerequisites = {}
+    for edge in graph_data.get('prerequisites', []):
+        if edge['target'] in kp_by_id:
+            prerequisites.setdefault(edge['source'], []).append(kp_by_id[edge['target']])
+    
+    for module in graph_data['modules']:
+        if module_id and module['id'] != module_id:
+            continue
+        for chapter in module['chapters']:
+            for kp in chapter['knowledge_points']:
+                records.append({'m': module, 'c': chapter, 'k': kp, 'k2': None})
+                for target in prerequisites.get(kp['id'], []):
+                    records.append({'m': module, 'c': chapter, 'k': kp, 'k2': target})
+    return records
+
 def get_knowledge_graph_data(module_id=None):
     """从Neo4j或本地数据获取知识图谱数据"""
-    # 优先使用新的 data_provider 模块
-    if check_neo4j_available():
+    # 优先使用 data_provider 的整图缓存（一次查询，之后不再访问数据库）
+    if is_neo4j_available():
         try:
             from modules.data_provider import get_knowledge_graph
             graph_data = get_knowledge_graph()
             if graph_data:
-                return graph_data
-        except:
-            pass
+                return _graph_records(graph_data, module_id)
+        except Exception as e:
+            print(f"获取知识图谱失败: {e}")
     
     # 降级到原来的 Neo4j 查询方式
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return []
     
     try:
-        driver = get_neo4j_driver()
-        
-        with driver.session() as session:
-            if module_id:
-                # 获取特定模块的知识图谱
-                result = session.run(f"""
-                    MATCH path = (m:{NEO4J_LABEL_MODULE_GFZ} {{id: $module_id}})-[:CONTAINS]->(c:{NEO4J_LABEL_CHAPTER_GFZ})-[:CONTAINS]->(k:{NEO4J_LABEL_KNOWLEDGE_GFZ})
-                    OPTIONAL MATCH (k)-[r:PREREQUISITE]->(k2:{NEO4J_LABEL_KNOWLEDGE_GFZ})
-                    RETURN m, c, k, r, k2
-                """, module_id=module_id)
-            else:
-                # 获取所有模块
-                result = session.run(f"""
-                    MATCH (m:{NEO4J_LABEL_MODULE_GFZ})-[:CONTAINS]->(c:{NEO4J_LABEL_CHAPTER_GFZ})-[:CONTAINS]->(k:{NEO4J_LABEL_KNOWLEDGE_GFZ})
-                    RETURN m, c, k
-                    LIMIT 50
-                """)
-            
-            data = [dict(record) for record in result]
-        
-        # 不关闭driver，保持连接池复用
-        return data
-    except Exception:
+        if module_id:
+            # 获取特定模块的知识图谱
+            return read_query(f"""
+                MATCH path = (m:{NEO4J_LABEL_MODULE_GFZ} {{id: $module_id}})-[:CONTAINS]->(c:{NEO4J_LABEL_CHAPTER_GFZ})-[:CONTAINS]->(k:{NEO4J_LABEL_KNOWLEDGE_GFZ})
+                OPTIONAL MATCH (k)-[r:PREREQUISITE]->(k2:{NEO4J_LABEL_KNOWLEDGE_GFZ})
+                RETURN m, c, k, r, k2
+            """, {"module_id": module_id}, name="模块知识图谱")
+        # 获取所有模块
+        return read_query(f"""
+            MATCH (m:{NEO4J_LABEL_MODULE_GFZ})-[:CONTAINS]->(c:{NEO4J_LABEL_CHAPTER_GFZ})-[:CONTAINS]->(k:{NEO4J_LABEL_KNOWLEDGE_GFZ})
+            RETURN m, c, k
+            LIMIT 50
+        """, name="知识图谱概览")
+    except Exception as e:
+        print(f"获取知识图谱数据失败: {e}")
         return []
 
+# 生成的图谱 HTML：(模块, 数据版本) -> HTML 字符串，进程内所有会话共享
+# 字符串不可变，各会话拿到同一份；数据版本变化后旧条目在下次写入时清理
+_html_cache = {}
+_html_lock = threading.Lock()
+
+def _graph_version():
+    """HTML 缓存键中的数据版本：Neo4j 可用时为整图缓存版本，否则使用内置示例数据"""
+    if is_neo4j_available():
+        from modules.data_provider import get_knowledge_graph_version
+        return get_knowledge_graph_version()
+    return "example"
+
 def create_knowledge_graph_viz(module_id=None):
-    """创建知识图谱可视化"""
+    """创建知识图谱可视化，返回 HTML（按模块和图谱数据版本缓存）"""
+    version = _graph_version()
+    key = (module_id, version)
+    html_content = _html_cache.get(key)
+    if html_content is not None:
+        return html_content
+    
+    with _html_lock:
+        html_content = _html_cache.get(key)
+        if html_content is not None:
+            return html_content
+        html_content, source = _build_knowledge_graph_html(module_id, version)
+        if html_content is None:
+            return "<div style='padding:20px;text-align:center;'>知识图谱生成中...</div>"
+        # Neo4j 暂时读取失败时画的是示例数据，不以 Neo4j 数据版本缓存
+        if source == "example" and version != "example":
+            return html_content
+        for stale in [k for k in _html_cache if k[1] != version]:
+            del _html_cache[stale]
+        _html_cache[key] = html_content
+        return html_content
+
+def _build_knowledge_graph_html(module_id=None, version=None):
+    """生成知识图谱 HTML（全部在内存中完成），返回 (html, 数据来源 "neo4j"/"example")"""
     # 使用浅色背景
     net = Network(height="1100px", width="100%", bgcolor="#ffffff", font_color="#333333")
     
-    # 配置物理引擎 - 优化布局，使用直线，减少交叠
+    # 节点坐标在服务端预先计算（graph_layout），浏览器端关闭物理引擎，直接按坐标绘制
     net.set_options("""
     {
         "physics": {
-            "enabled": true,
-            "solver": "barnesHut",
-            "barnesHut": {
-                "gravitationalConstant": -35000,
-                "centralGravity": 0.1,
-                "springLength": 250,
-                "springConstant": 0.02,
-                "damping": 0.5,
-                "avoidOverlap": 1
-            },
-            "stabilization": {
-                "enabled": true,
-                "iterations": 200,
-                "fit": true
-            },
-            "minVelocity": 0.75
+            "enabled": false
         },
         "layout": {
-            "improvedLayout": true,
-            "randomSeed": 42,
+            "improvedLayout": false,
             "hierarchical": false
         },
         "edges": {
@@ -509,14 +539,26 @@ def create_knowledge_graph_viz(module_id=None):
                                width=2.5,
                                smooth=False)
     
-    # 保存并返回HTML
+    # 预先计算的布局：按模块和图谱数据版本缓存
+    source = "neo4j" if data else "example"
+    edge_list = [(edge['from'], edge['to'], edge.get('label')) for edge in net.edges]
+    positions = get_layout(("knowledge_graph", module_id, source, version),
+                           [node['id'] for node in net.nodes],
+                           [edge[:2] for edge in edge_list],
+                           tree_parents(edge_list, ("包含", "涵盖")))
+    for node in net.nodes:
+        node['x'], node['y'] = positions[node['id']]
+        node['physics'] = False
+    
+    # 颜色、大小等重复样式移到 vis groups，每个节点只带组名，减小页面体积
+    net.options['groups'] = group_node_styles(net.nodes)
+    
+    # 直接在内存中生成 HTML，不写临时文件；vis-network 从本地静态资源加载
     try:
-        net.save_graph("temp_graph.html")
-        with open("temp_graph.html", 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        return html_content
-    except Exception:
-        return "<div style='padding:20px;text-align:center;'>知识图谱生成中...</div>"
+        return use_static_assets_in_pyvis(net.generate_html(notebook=False)), source
+    except Exception as e:
+        print(f"生成知识图谱HTML失败: {e}")
+        return None, source
 
 def render_knowledge_graph():
     """渲染知识图谱页面"""
@@ -5,91 +5,111 @@
 
 import streamlit as st
 import json
+from functools import lru_cache
+
 from data.knowledge_graph_graph_format import (
+    CONTAINMENT_TYPES,
     get_graph_data, 
+    get_graph_index,
     get_node_by_id, 
     GFZ_CATEGORY_COLORS
 )
+from modules.graph_layout import get_layout, tree_parents
+from modules.graph_wire import DECODER_JS, dumps, encode_graph, node_key, node_number
+from modules.prerequisite_index import get_prerequisite_index
+from modules.static_assets import loader_script, vis_network_urls
+
+
+# 渐进展开组件的 key（组件值即最近一次点击）
+EXPLORER_KEY = "graph_explorer"
+# 按模块筛选时向下展开的层数（模块 -> 章节 -> 知识点）
+MODULE_FILTER_DEPTH = 2
+
+
+def _layout(key, nodes, relationships):
+    """按 key 缓存的预计算布局（模块/章节/知识点按包含关系分层）"""
+    edge_list = [(rel["source"], rel["target"], rel["type"]) for rel in relationships]
+    return get_layout(key,
+                      [node["id"] for node in nodes],
+                      [edge[:2] for edge in edge_list],
+                      tree_parents(edge_list, CONTAINMENT_TYPES))
+
+
+def _full_layout():
+    graph_data = get_graph_data()
+    return _layout(("interactive", None, MODULE_FILTER_DEPTH),
+                   graph_data.get("nodes", []), graph_data.get("relationships", []))
+
+
+def initial_explorer_payload():
+    """渐进模式的首屏数据：只有模块节点（紧凑格式，见 modules.graph_wire）"""
+    positions = _full_layout()
+    modules = get_graph_index().get_nodes_by_category("模块")
+    return encode_graph(modules, [], positions, colors=GFZ_CATEGORY_COLORS)
+
+
+@lru_cache(maxsize=1024)
+def neighborhood_payload(node_id):
+    """节点的一跳邻居（章节、知识点及其关系），来自图谱索引的邻接表，按节点缓存"""
+    positions = _full_layout()
+    related = get_graph_index().get_related_nodes(node_id)
+    nodes = {}
+    relationships = []
+    for direction in ("outgoing", "incoming"):
+        for item in related[direction]:
+            nodes[item["node"]["id"]] = item["node"]
+            relationships.append(item["relationship"])
+    graph = encode_graph(list(nodes.values()), relationships, positions, colors=GFZ_CATEGORY_COLORS)
+    return {"node": node_number(node_id), "graph": graph}
 
 
-def create_knowledge_graph_html(selected_node_id=None, filter_module=None):
+@lru_cache(maxsize=8)
+def module_subgraphs(depth=MODULE_FILTER_DEPTH):
+    """
+    所有模块的子图：模块名 -> {"nodes", "relationships"}
+    从模块沿包含关系 BFS 到 depth 层（1 层为章节，2 层为知识点），每个深度只计算一次
+    """
+    index = get_graph_index()
+    return {module["label"]: index.subgraph(module["id"], CONTAINMENT_TYPES, max_depth=depth)
+            for module in index.get_nodes_by_category("模块")}
+
+
+def create_knowledge_graph_html(selected_node_id=None, filter_module=None, depth=MODULE_FILTER_DEPTH):
     """
     生成知识图谱的 HTML 内容
-    使用 vis.js 库进行可视化
+    使用 vis.js 库进行可视化；filter_module 为模块名时只显示该模块向下 depth 层的节点
     """
     try:
         graph_data = get_graph_data()
         nodes = graph_data.get("nodes", [])
         relationships = graph_data.get("relationships", [])
         
-        # 如果指定了模块筛选，只显示该模块及其子节点
+        # 如果指定了模块筛选，只显示该模块及其子节点（预先计算的子图，切换模块只是查字典）
         if filter_module:
-            # 找到选中的模块节点
-            module_node = next((n for n in nodes if n["category"] == "模块" and n["label"] == filter_module), None)
-            if module_node:
-                module_id = module_node["id"]
-                # 找出所有相关节点（模块、其章节和知识点）
-                related_node_ids = {module_id}
-                for rel in relationships:
-                    if rel["source"] == module_id:
-                        related_node_ids.add(rel["target"])
-                    # 递归添加二级关系（章节的知识点）
-                    if rel["source"] in related_node_ids:
-                        related_node_ids.add(rel["target"])
-                
-                # 筛选节点和关系
-                nodes = [n for n in nodes if n["id"] in related_node_ids]
-                relationships = [r for r in relationships if r["source"] in related_node_ids and r["target"] in related_node_ids]
+            subgraph = module_subgraphs(depth).get(filter_module)
+            if subgraph:
+                nodes = subgraph["nodes"]
+                relationships = subgraph["relationships"]
         
         if not nodes:
             return None
         
-        # 转换节点数据格式供 vis.js 使用
-        vis_nodes = []
-        for node in nodes:
-            color = GFZ_CATEGORY_COLORS.get(node["category"], "#888888")
-            
-            # 根据层级设置节点大小
-            size_map = {1: 60, 2: 50, 3: 40}
-            size = size_map.get(node["level"], 40)
-            
-            # 如果是选中的节点，增加边框宽度
-            border_width = 5 if selected_node_id == node["id"] else 2
-            
-            vis_nodes.append({
-                "id": node["id"],
-                "label": node["label"],
-                "title": f"{node['label']} ({node['category']})",
-                "color": color,
-                "size": size,
-                "shape": "dot",  # 圆形节点
-                "borderWidth": border_width,
-                "font": {"size": 14 if node["level"] == 1 else 12}
-            })
+        # 节点坐标在服务端预先计算并缓存，浏览器端不再做力导向布局
+        positions = _layout(("interactive", filter_module, depth), nodes, relationships)
         
-        # 转换关系数据
-        vis_edges = []
-        for rel in relationships:
-            vis_edges.append({
-                "from": rel["source"],
-                "to": rel["target"],
-                "label": rel["type"],
-                "title": rel["type"],
-                "color": "#999999",
-                "arrows": "to"
-            })
+        # 紧凑格式：整数 id + 分类样式表 + 去重标签，浏览器端由 decodeGraph() 还原成 vis.js 节点/边
+        graph_json = dumps(encode_graph(nodes, relationships, positions, selected_node_id, GFZ_CATEGORY_COLORS))
         
         # 生成 HTML
-        nodes_json = json.dumps(vis_nodes, ensure_ascii=False)
-        edges_json = json.dumps(vis_edges, ensure_ascii=False)
+        assets_json = json.dumps(vis_network_urls())
         
         html_content = f"""
         <!DOCTYPE html>
         <html>
         <head>
             <meta charset="utf-8">
-            <script type="text/javascript" src="https://cdnjs.cloudflare.com/ajax/libs/vis/4.21.0/vis.min.js"></script>
-            <link href="https://cdnjs.cloudflare.com/ajax/libs/vis/4.21.0/vis.min.css" rel="stylesheet" type="text/css" />
+            {loader_script()}
+            <script type="text/javascript">{DECODER_JS}</script>
             <style type="text/css">
                 body {{
                     font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, Cantarell, sans-serif;
@@ -127,96 +147,92 @@ def create_knowledge_graph_html(selected_node_id=None, filter_module=None):
         <body>
             <div id="network"></div>
             <script type="text/javascript">
-                var nodes = new vis.DataSet({nodes_json});
-                var edges = new vis.DataSet({edges_json});
+                // vis-network 从本地静态资源加载（带内容哈希，浏览器缓存），加载完成后再绘制
+                function drawGraph() {{
+                    var graph = decodeGraph({graph_json});
+                    var nodes = new vis.DataSet(graph.nodes);
+                    var edges = new vis.DataSet(graph.edges);
                 
-                var container = document.getElementById('network');
-                var data = {{
-                    nodes: nodes,
-                    edges: edges
-                }};
+                    var container = document.getElementById('network');
+                    var data = {{
+                        nodes: nodes,
+                        edges: edges
+                    }};
                 
-                var options = {{
-                    physics: {{
-                        enabled: true,
-                        barnesHut: {{
-                            gravitationalConstant: -8000,
-                            centralGravity: 0.1,
-                            springLength: 300,
-                            springConstant: 0.01,
-                            avoidOverlap: 0.8,
-                            damping: 0.5
-                        }},
-                        stabilization: {{
-                            enabled: true,
-                            iterations: 300,
-                            fit: true
-                        }}
-                    }},
-                    interaction: {{
-                        hover: true,
-                        navigationButtons: true,
-                        keyboard: true,
-                        dragNodes: true,
-                        dragView: true,
-                        zoomView: true
-                    }},
-                    edges: {{
-                        smooth: {{
+                    var options = {{
+                        physics: {{
                             enabled: false
+                        }},
+                        layout: {{
+                            improvedLayout: false
+                        }},
+                        interaction: {{
+                            hover: true,
+                            navigationButtons: true,
+                            keyboard: true,
+                            dragNodes: true,
+                            dragView: true,
+                            zoomView: true
+                        }},
+                        edges: {{
+                            smooth: {{
+                                enabled: false
+                            }}
                         }}
-                    }}
-                }};
-                
-                var network = new vis.Network(container, data, options);
+                    }};
                 
-                // Handle node click events
-                network.on("click", function(params) {{
-                    if (params.nodes.length > 0) {{
-                        var nodeId = params.nodes[0];
-                        console.log("Clicked node:", nodeId);
-                        // Highlight selected node
-                        nodes.update({{id: nodeId, borderWidth: 5}});
-                        highlightRelated(nodeId);
-                    }}
-                }});
+                    var network = new vis.Network(container, data, options);
+                    network.fit();
                 
-                function highlightRelated(nodeId) {{
-                    // Reset all nodes and edges to default colors
-                    nodes.forEach(function(node) {{
-                        nodes.update({{id: node.id, borderWidth: 2}});
+                    // Handle node click events
+                    network.on("click", function(params) {{
+                        if (params.nodes.length > 0) {{
+                            var nodeId = params.nodes[0];
+                            console.log("Clicked node:", nodeId);
+                            // Highlight selected node
+                            nodes.update({{id: nodeId, borderWidth: 5}});
+                            highlightRelated(nodeId);
+                        }}
                     }});
+                
+                    function highlightRelated(nodeId) {{
+                        // Reset all nodes and edges to default colors
+                        nodes.forEach(function(node) {{
+                            nodes.update({{id: node.id, borderWidth: 2}});
+                        }});
                     
-                    // Find related nodes
-                    var relatedNodeIds = new Set([nodeId]);
-                    var relatedEdgeIds = new Set();
+                        // Find related nodes
+                        var relatedNodeIds = new Set([nodeId]);
+                        var relatedEdgeIds = new Set();
                     
-                    edges.forEach(function(edge) {{
-                        if (edge.from === nodeId || edge.to === nodeId) {{
-                            relatedNodeIds.add(edge.from);
-                            relatedNodeIds.add(edge.to);
-                            relatedEdgeIds.add(edge.id);
-                        }}
-                    }});
+                        edges.forEach(function(edge) {{
+                            if (edge.from === nodeId || edge.to === nodeId) {{
+                                relatedNodeIds.add(edge.from);
+                                relatedNodeIds.add(edge.to);
+                                relatedEdgeIds.add(edge.id);
+                            }}
+                        }});
                     
-                    // Update node colors
-                    nodes.forEach(function(node) {{
-                        if (relatedNodeIds.has(node.id)) {{
-                            nodes.update({{id: node.id, opacity: 1}});
-                        }} else {{
-                            nodes.update({{id: node.id, opacity: 0.3}});
-                        }}
-                    }});
+                        // Update node colors
+                        nodes.forEach(function(node) {{
+                            if (relatedNodeIds.has(node.id)) {{
+                                nodes.update({{id: node.id, opacity: 1}});
+                            }} else {{
+                                nodes.update({{id: node.id, opacity: 0.3}});
+                            }}
+                        }});
                     
-                    // Update edge colors
-                    edges.forEach(function(edge) {{
-                        if (relatedEdgeIds.has(edge.id)) {{
-                            edges.update({{id: edge.id, opacity: 1}});
-                        }} else {{
-                            edges.update({{id: edge.id, opacity: 0.1}});
-                        }}
-                    }});
+                        // Update edge colors
+                        edges.forEach(function(edge) {{
+                            if (relatedEdgeIds.has(edge.id)) {{
+                                edges.update({{id: edge.id, opacity: 1}});
+                            }} else {{
+                                edges.update({{id: edge.id, opacity: 0.1}});
+                            }}
+                        }});
+                    }}
                 }}
+                loadStaticAssets({assets_json}, drawGraph);
             </script>
         </body>
         </html>
@@ -238,6 +254,16 @@ def render_knowledge_graph_interactive():
     if "selected_node" not in st.session_state:
         st.session_state.selected_node = None
     
+    # 渐进模式下的点击：组件值在重跑开始时已在 session_state 中，先处理再渲染侧边栏和图谱
+    clicked = st.session_state.get(EXPLORER_KEY)
+    if clicked and clicked.get("seq") != st.session_state.get("graph_explorer_seq"):
+        st.session_state.graph_explorer_seq = clicked["seq"]
+        # 组件返回的是整数 id，先换回原始节点 id
+        clicked_id = node_key(clicked["node"])
+        if clicked_id:
+            st.session_state.graph_expansion = dict(neighborhood_payload(clicked_id), seq=clicked["seq"])
+            st.session_state.selected_node = get_node_by_id(clicked_id)
+    
     # 侧边栏
     with st.sidebar:
         st.markdown("### 📚 知识导航")
@@ -258,14 +284,24 @@ def render_knowledge_graph_interactive():
                     categories[cat] = []
                 categories[cat].append(node)
             
+            # 搜索：本地前缀树 + 二元组索引，按匹配程度和重要程度排序
+            ranks = None
+            if search_term:
+                from modules.knowledge_search import get_knowledge_search_index
+                matches = get_knowledge_search_index().search(search_term, limit=len(nodes))
+                ranks = {node["id"]: rank for rank, (node, _) in enumerate(matches)}
+                if not ranks:
+                    st.caption("没有匹配的知识点")
+            
             # 显示分类展开器
             for category, cat_nodes in categories.items():
-                with st.expander(f"📁 {category} ({len(cat_nodes)})"):
-                    # 过滤节点
-                    filtered_nodes = cat_nodes
-                    if search_term:
-                        filtered_nodes = [n for n in cat_nodes if search_term.lower() in n["label"].lower()]
-                    
+                # 过滤节点
+                filtered_nodes = cat_nodes
+                if ranks is not None:
+                    filtered_nodes = sorted((n for n in cat_nodes if n["id"] in ranks), key=lambda n: ranks[n["id"]])
+                    if not filtered_nodes:
+                        continue
+                with st.expander(f"📁 {category} ({len(filtered_nodes)})", expanded=ranks is not None):
                     # 显示节点列表
                     for node in filtered_nodes:
                         if st.button(node["label"], key=f"nav_{node['id']}", use_container_width=True):
@@ -295,6 +331,8 @@ def render_knowledge_graph_interactive():
             selected_module = st.selectbox("选择模块", module_options)
         except:
             selected_module = "全部模块"
+        progressive = st.checkbox("渐进展开", value=True,
+                                  help="查看全部模块时先只显示模块，点击节点再展开其章节和知识点")
     
     with col2:
         # 显示颜色图例
@@ -318,6 +356,14 @@ def render_knowledge_graph_interactive():
         # 根据选择的模块筛选节点
         filter_module = None if selected_module == "全部模块" else selected_module
         
+        # 渐进模式：首屏只发送模块节点，点击后只发送该节点的邻居，数据量不随图谱规模增长
+        if progressive and not filter_module:
+            from modules.graph_explorer import graph_explorer
+            graph_explorer(initial_explorer_payload(),
+                           expansion=st.session_state.get("graph_expansion"),
+                           height=1000, key=EXPLORER_KEY)
+            return
+        
         # 生成 HTML (传入筛选条件)
         html_content = create_knowledge_graph_html(selected_node_id, filter_module)
         
@@ -363,6 +409,19 @@ def render_node_detail_panel(node):
     </div>
     """, unsafe_allow_html=True)
     
+    # 前置关系：来自按图谱版本预先计算的传递闭包索引
+    prerequisite_index = get_prerequisite_index()
+    if node["id"] in prerequisite_index:
+        ancestors = prerequisite_index.ancestors(node["id"])
+        descendants = prerequisite_index.descendants(node["id"])
+        st.markdown(f"**前置关系**（最长前置链 {prerequisite_index.depth(node['id'])} 层）")
+        if ancestors:
+            st.markdown("- **需先掌握**: " + " → ".join(prerequisite_index.name(kp_id) for kp_id in ancestors))
+        if descendants:
+            st.markdown("- **后续知识点**: " + "、".join(prerequisite_index.name(kp_id) for kp_id in descendants))
+        if not ancestors and not descendants:
+            st.caption("没有前置或后续知识点")
+    
     # 属性详情
     st.markdown("**详细信息**")
     props = node.get("properties", {})
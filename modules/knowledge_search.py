@@ -0,0 +1,166 @@
+"""
+知识点本地搜索模块
+对图谱节点名称建立字符二元组（bigram）倒排索引和前缀树，侧边栏每次输入都在内存中查找，不访问数据库：
+- 前缀树：按名称前缀补全
+- 倒排索引：按名称中任意位置的连续字符匹配，中文无需分词
+- 结果按匹配程度（完全匹配 > 前缀 > 包含 > 部分字符匹配）和知识点重要程度排序
+数据来自本地图谱（data.knowledge_graph_graph_format），Neo4j 不可用时同样可用
+"""
+
+import threading
+
+# 部分字符匹配时，至少要有这个比例的二元组命中才算结果
+MIN_FUZZY_OVERLAP = 0.5
+DEFAULT_LIMIT = 20
+
+# 匹配程度
+MATCH_EXACT = 4
+MATCH_PREFIX = 3
+MATCH_CONTAINS = 2
+MATCH_FUZZY = 1
+
+
+def _normalize(text):
+    return (text or "").strip().lower()
+
+
+def _bigrams(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class _TrieNode:
+    __slots__ = ('children', 'ids')
+
+    def __init__(self):
+        self.children = {}
+        # 名称以该前缀开头的节点 id
+        self.ids = []
+
+
+class KnowledgeSearchIndex:
+    """节点名称的前缀树 + 二元组倒排索引（构建后只读）"""
+
+    def __init__(self, nodes):
+        self._nodes = {}
+        self._labels = {}
+        self._position = {}
+        self._importance = {}
+        self._bigram_index = {}
+        self._char_index = {}
+        self._trie = _TrieNode()
+        for position, node in enumerate(nodes):
+            node_id = node["id"]
+            label = _normalize(node.get("label") or node.get("name"))
+            self._nodes[node_id] = node
+            self._labels[node_id] = label
+            self._position[node_id] = position
+            self._importance[node_id] = node.get("properties", {}).get("importance", node.get("importance")) or 0
+            for gram in _bigrams(label):
+                self._bigram_index.setdefault(gram, set()).add(node_id)
+            for char in set(label):
+                self._char_index.setdefault(char, set()).add(node_id)
+            trie = self._trie
+            for char in label:
+                trie = trie.children.setdefault(char, _TrieNode())
+                trie.ids.append(node_id)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def _prefix_ids(self, prefix):
+        trie = self._trie
+        for char in prefix:
+            trie = trie.children.get(char)
+            if trie is None:
+                return []
+        return trie.ids
+
+    def autocomplete(self, prefix, limit=DEFAULT_LIMIT):
+        """名称以 prefix 开头的节点，重要程度高、名称短的在前"""
+        prefix = _normalize(prefix)
+        if not prefix:
+            return []
+        ids = sorted(self._prefix_ids(prefix), key=self._rank_key)
+        return [self._nodes[node_id] for node_id in ids[:limit]]
+
+    def _rank_key(self, node_id):
+        return (-self._importance[node_id], len(self._labels[node_id]), self._position[node_id])
+
+    def _candidates(self, query):
+        """返回 {node_id: (匹配程度, 命中比例)}"""
+        if len(query) == 1:
+            return {node_id: (MATCH_CONTAINS, 1.0) for node_id in self._char_index.get(query, ())}
+        grams = _bigrams(query)
+        postings = [self._bigram_index.get(gram, set()) for gram in grams]
+        counts = {}
+        for posting in postings:
+            for node_id in posting:
+                counts[node_id] = counts.get(node_id, 0) + 1
+        matches = {}
+        for node_id, count in counts.items():
+            overlap = count / len(grams)
+            if query in self._labels[node_id]:
+                matches[node_id] = (MATCH_CONTAINS, overlap)
+            elif overlap >= MIN_FUZZY_OVERLAP:
+                matches[node_id] = (MATCH_FUZZY, overlap)
+        return matches
+
+    def search(self, query, limit=DEFAULT_LIMIT, categories=None):
+        """
+        按名称搜索节点，返回 [(节点, 匹配程度)]，按匹配程度、命中比例、重要程度排序
+        categories 非空时只返回这些分类的节点
+        """
+        query = _normalize(query)
+        if not query:
+            return []
+        matches = self._candidates(query)
+        for node_id in self._prefix_ids(query):
+            matches[node_id] = (MATCH_PREFIX, 1.0)
+        for node_id in matches:
+            if self._labels[node_id] == query:
+                matches[node_id] = (MATCH_EXACT, 1.0)
+        if categories:
+            matches = {node_id: match for node_id, match in matches.items()
+                       if self._nodes[node_id].get("category") in categories}
+        ranked = sorted(matches, key=lambda node_id: (-matches[node_id][0], -matches[node_id][1])
+                        + self._rank_key(node_id))
+        return [(self._nodes[node_id], matches[node_id][0]) for node_id in ranked[:limit]]
+
+
+# 进程级单例：本地图谱是静态数据，首次使用时构建
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_knowledge_search_index():
+    """获取本地图谱的搜索索引"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                from data.knowledge_graph_graph_format import get_nodes
+                _index = KnowledgeSearchIndex(get_nodes())
+    return _index
+
+
+def search_local_knowledge_points(keyword, limit=DEFAULT_LIMIT):
+    """
+    在本地图谱中搜索知识点，返回与 data_provider.search_knowledge_points 相同格式的字典列表
+    （id, name, importance, chapter_name, module_name）
+    """
+    from data.knowledge_graph_graph_format import get_graph_index
+    graph_index = get_graph_index()
+    results = []
+    for node, _ in get_knowledge_search_index().search(keyword, limit=limit,
+                                                       categories=("知识点", "重要概念", "应用实践")):
+        properties = node.get("properties", {})
+        chapter = graph_index.get_node(properties.get("parent_chapter"))
+        module = graph_index.get_node(graph_index.get_module_id(node["id"]))
+        results.append({
+            "id": node["id"],
+            "name": node["label"],
+            "importance": properties.get("importance"),
+            "chapter_name": chapter["label"] if chapter else None,
+            "module_name": module["label"] if module else None
+        })
+    return results
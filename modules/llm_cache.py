@@ -0,0 +1,171 @@
+"""
+大模型响应本地缓存
+把 AI 生成的结果按请求内容的规范化哈希存入本地 SQLite，相同请求直接返回，不再调用大模型：
+- 键由调用方给出的请求要素（提示词模板版本、参数等）经排序后的 JSON 计算 SHA-256
+- 条目超过 TTL 视为过期；条目数超过上限时淘汰最久未使用的条目
+- SQLite 使用 WAL 模式，同一台机器上的多个进程可以共享缓存
+- 缓存出错时只打印日志并当作未命中，不影响正常调用
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    from config.settings import LLM_CACHE_PATH
+except (ImportError, AttributeError):
+    LLM_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "llm_cache.sqlite3")
+
+# 条目有效期（秒）与条目数上限
+DEFAULT_TTL = 7 * 24 * 3600
+MAX_ENTRIES = 5000
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS llm_responses (
+        key TEXT PRIMARY KEY,
+        namespace TEXT NOT NULL,
+        response TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        accessed_at REAL NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0
+    )
+"""
+_ACCESS_INDEX = "CREATE INDEX IF NOT EXISTS llm_responses_accessed ON llm_responses (accessed_at)"
+
+# 缓存目录无法创建、文件只读等都属于缓存错误（OSError），与 SQLite 错误一样只记录并当作未命中
+_CACHE_ERRORS = (sqlite3.Error, OSError)
+
+
+def make_cache_key(namespace, parts):
+    """请求要素的规范化哈希：parts 按键排序序列化为 JSON 后计算 SHA-256"""
+    canonical = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{namespace}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite 持久化的大模型响应缓存（线程安全）"""
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl=DEFAULT_TTL, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'stores': 0,
+            'evictions': 0,
+            'errors': 0
+        }
+
+    def _connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            conn.execute(_ACCESS_INDEX)
+            self._conn = conn
+        return self._conn
+
+    def _error(self, action, error):
+        self._stats['errors'] += 1
+        print(f"[AI响应缓存] {action}失败: {error}")
+
+    def get(self, key):
+        """返回缓存的响应文本；未命中或已过期返回 None"""
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connection()
+                row = conn.execute("SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self._stats['misses'] += 1
+                    return None
+                response, created_at = row
+                if now - created_at > self.ttl:
+                    conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                    self._stats['expired'] += 1
+                    self._stats['misses'] += 1
+                    return None
+                conn.execute("UPDATE llm_responses SET accessed_at = ?, hits = hits + 1 WHERE key = ?", (now, key))
+                self._stats['hits'] += 1
+                return response
+            except _CACHE_ERRORS as e:
+                self._error("读取", e)
+                self._stats['misses'] += 1
+                return None
+
+    def put(self, key, response, namespace=""):
+        """写入（覆盖）一条响应，按需淘汰最久未使用的条目"""
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_responses (key, namespace, response, created_at, accessed_at, hits) "
+                    "VALUES (?, ?, ?, ?, ?, 0)",
+                    (key, namespace, response, now, now)
+                )
+                self._stats['stores'] += 1
+                # 写入只发生在一次大模型调用之后，每次都检查上限的开销可以忽略
+                self._evict(conn, now)
+            except _CACHE_ERRORS as e:
+                self._error("写入", e)
+
+    def _evict(self, conn, now):
+        """删除过期条目，再把条目数压到上限以内（按最近访问时间淘汰）"""
+        expired = conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (now - self.ttl,)).rowcount
+        count = conn.execute("SELECT count(*) FROM llm_responses").fetchone()[0]
+        overflow = max(0, count - self.max_entries)
+        if overflow:
+            conn.execute(
+                "DELETE FROM llm_responses WHERE key IN "
+                "(SELECT key FROM llm_responses ORDER BY accessed_at LIMIT ?)",
+                (overflow,)
+            )
+        self._stats['evictions'] += expired + overflow
+
+    def clear(self):
+        """清空缓存条目（统计保留）"""
+        with self._lock:
+            try:
+                self._connection().execute("DELETE FROM llm_responses")
+            except _CACHE_ERRORS as e:
+                self._error("清空", e)
+
+    def stats(self):
+        """缓存指标：命中/未命中/过期/写入/淘汰/错误次数、命中率、条目数"""
+        with self._lock:
+            stats = dict(self._stats)
+            try:
+                stats['entries'] = self._connection().execute("SELECT count(*) FROM llm_responses").fetchone()[0]
+            except _CACHE_ERRORS as e:
+                self._error("统计", e)
+                stats['entries'] = 0
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+# 进程级单例
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """获取全局大模型响应缓存"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMResponseCache()
+    return _cache
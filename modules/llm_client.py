@@ -0,0 +1,87 @@
+"""
+AI 接口客户端模块
+所有 AI 功能（学习路径推荐、教学方案、学习报告、课堂回复总结）共用一个进程级 OpenAI 客户端：
+- 底层是一个 httpx 连接池，keep-alive 连接在请求之间复用，不再每次重新建立 TCP/TLS 连接
+- 连接数、空闲连接数、空闲保持时间和超时在 config/settings.py 中配置
+- 安装了 h2 时启用 HTTP/2，同一连接上可并发多个请求（requirements.txt 中的 httpx[http2] 会安装 h2，未安装时使用 HTTP/1.1）
+- reset_llm_client() 关闭并丢弃连接池（系统设置页面的“重建 AI 连接池”），下次调用时重新创建
+- 显式传入 httpx 客户端，避免 openai 自行创建客户端时与 httpx 版本不兼容（Streamlit Cloud 部署问题）
+客户端放在模块级单例中，Streamlit 重跑和所有会话都复用同一个实例
+"""
+
+import threading
+
+import httpx
+from openai import OpenAI
+
+from config.settings import (
+    DEEPSEEK_API_KEY,
+    DEEPSEEK_BASE_URL,
+    LLM_CONNECT_TIMEOUT,
+    LLM_KEEPALIVE_EXPIRY,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_TIMEOUT
+)
+
+# 可选导入 h2（没有时使用 HTTP/1.1）
+try:
+    import h2  # noqa: F401
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
+# 进程级单例
+_client = None
+_http_client = None
+_client_lock = threading.Lock()
+
+
+def _create_http_client():
+    return httpx.Client(
+        base_url=DEEPSEEK_BASE_URL,
+        timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+        ),
+        http2=HAS_HTTP2,
+        follow_redirects=True
+    )
+
+
+def get_llm_client():
+    """获取共享的 AI 客户端（首次调用时创建；未配置 API Key 时抛出 openai 的异常）"""
+    global _client, _http_client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            http_client = _create_http_client()
+            try:
+                client = OpenAI(
+                    api_key=DEEPSEEK_API_KEY,
+                    base_url=DEEPSEEK_BASE_URL,
+                    http_client=http_client,
+                    timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+                )
+            except Exception:
+                http_client.close()
+                raise
+            _http_client, _client = http_client, client
+            print(f"[AI客户端] 已创建共享连接池（HTTP/2: {'是' if HAS_HTTP2 else '否'}，"
+                  f"最大连接 {LLM_MAX_CONNECTIONS}，空闲保持 {LLM_KEEPALIVE_EXPIRY:.0f}s）")
+    return _client
+
+
+def reset_llm_client():
+    """关闭并丢弃共享客户端，下次获取时重新创建"""
+    global _client, _http_client
+    with _client_lock:
+        http_client, _http_client, _client = _http_client, None, None
+    if http_client is not None:
+        try:
+            http_client.close()
+        except Exception:
+            pass
@@ -0,0 +1,93 @@
+"""
+大模型流式输出模块
+AI 生成的内容按 token 流式返回并逐步显示，不必等完整回答生成后才出现：
+- stream_chat_completion() 是生成器，逐段产出文本；记录首字耗时（TTFT）和总耗时并打印日志
+- 流式请求在产出第一段文本前失败时，自动改用非流式请求，结果一次性产出
+- 用户离开页面（Streamlit 重跑/停止脚本）时生成器被关闭，同时关闭底层 HTTP 流，不再继续接收
+- write_stream() 在页面上逐步渲染并返回完整文本
+"""
+
+import time
+
+
+def _delta_text(chunk):
+    if not chunk.choices:
+        return None
+    return chunk.choices[0].delta.content
+
+
+def stream_chat_completion(client, name, on_error=None, on_complete=None, **request):
+    """
+    流式调用 client.chat.completions.create(**request)，逐段产出回答文本
+    on_error(异常) 返回的文本在调用失败（含非流式回退也失败）时产出，未提供则抛出异常
+    on_complete(完整文本) 在得到完整回答后调用（如写入缓存），中途取消或出错时不调用
+    """
+    start = time.perf_counter()
+    first_token_ms = None
+    parts = []
+    stream = None
+    try:
+        stream = client.chat.completions.create(stream=True, **request)
+        for chunk in stream:
+            text = _delta_text(chunk)
+            if not text:
+                continue
+            if first_token_ms is None:
+                first_token_ms = (time.perf_counter() - start) * 1000
+            parts.append(text)
+            yield text
+    except GeneratorExit:
+        # 消费方停止读取（用户离开页面或脚本重跑），关闭 HTTP 流后退出
+        if stream is not None:
+            stream.close()
+        print(f"[AI流式] {name} 已取消：已接收 {len(''.join(parts))} 字，"
+              f"耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+        raise
+    except Exception as e:
+        if stream is not None:
+            stream.close()
+        if parts:
+            # 已经显示了部分内容，无法整体替换，只在末尾给出提示
+            print(f"[AI流式] {name} 中途失败: {e}")
+            if on_error is None:
+                raise
+            yield "\n\n" + on_error(e)
+            return
+        print(f"[AI流式] {name} 流式请求失败，改用非流式请求: {e}")
+        try:
+            response = client.chat.completions.create(stream=False, **request)
+            content = response.choices[0].message.content or ""
+        except Exception as fallback_error:
+            print(f"[AI流式] {name} 非流式请求同样失败: {fallback_error}")
+            if on_error is None:
+                raise
+            yield on_error(fallback_error)
+            return
+        print(f"[AI流式] {name} 非流式完成：总耗时 {(time.perf_counter() - start) * 1000:.0f}ms，{len(content)} 字")
+        if on_complete is not None and content:
+            on_complete(content)
+        yield content
+        return
+
+    text = "".join(parts)
+    first_token = f"{first_token_ms:.0f}ms" if first_token_ms is not None else "无输出"
+    print(f"[AI流式] {name} 完成：首字 {first_token}，总耗时 {(time.perf_counter() - start) * 1000:.0f}ms，{len(text)} 字")
+    if on_complete is not None and text:
+        on_complete(text)
+
+
+def write_stream(result):
+    """
+    在页面上显示 AI 结果并返回完整文本：生成器逐段渲染，字符串（缓存命中、出错提示等）直接显示
+    渲染被中断时立即关闭生成器，释放底层 HTTP 连接
+    """
+    import streamlit as st
+    if isinstance(result, str):
+        st.markdown(result)
+        return result
+    try:
+        return st.write_stream(result)
+    finally:
+        close = getattr(result, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,245 @@
+"""
+Neo4j 健康监测模块
+后台线程定期探测连接，用熔断器（关闭/打开/半开）记录可用状态：
+- 请求路径只读取当前状态（O(1)），不会在页面渲染中等待连通性检查
+- 连续失败达到阈值后熔断（打开），按指数退避等待后进入半开状态再探测一次，成功则恢复（关闭）
+- 业务查询出错时也可上报失败，加速熔断
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# 熔断器状态
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+STATE_LABELS = {
+    STATE_CLOSED: "正常",
+    STATE_OPEN: "熔断",
+    STATE_HALF_OPEN: "半开（试探中）",
+}
+
+# 正常状态下的探测间隔（秒）
+PROBE_INTERVAL = 15.0
+# 连续失败多少次后熔断
+FAILURE_THRESHOLD = 2
+# 熔断后的退避时间（秒）：从 BASE 开始每次失败翻倍，最多 MAX
+BASE_BACKOFF = 2.0
+MAX_BACKOFF = 120.0
+# 进程首次检查时最多等待第一次探测的秒数
+INITIAL_PROBE_TIMEOUT = 5.0
+# 连续失败多少次后重建驱动（驱动本身可能已损坏）
+RESET_DRIVER_AFTER = 3
+# 保留最近多少次状态切换记录
+MAX_TRANSITIONS = 50
+
+
+class CircuitBreaker:
+    """熔断器：只负责状态与退避计算，由监测线程和业务调用方上报结果"""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, base_backoff=BASE_BACKOFF, max_backoff=MAX_BACKOFF):
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.backoff = base_backoff
+        self.opened_at = None
+        self.last_error = None
+        self.transitions = deque(maxlen=MAX_TRANSITIONS)
+        self._lock = threading.Lock()
+
+    def _transition(self, new_state, reason):
+        if new_state == self.state:
+            return
+        self.transitions.append({
+            'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'from': self.state,
+            'to': new_state,
+            'reason': reason
+        })
+        print(f"[Neo4j熔断器] {STATE_LABELS[self.state]} -> {STATE_LABELS[new_state]}: {reason}")
+        self.state = new_state
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self.backoff = self.base_backoff
+            self.last_error = None
+            self.opened_at = None
+            self._transition(STATE_CLOSED, "探测成功")
+
+    def record_failure(self, error, trip=False):
+        """记录一次失败；trip=True（探测失败）时直接熔断，业务查询失败按阈值累计"""
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_error = str(error)
+            if self.state == STATE_HALF_OPEN:
+                # 半开试探失败：重新熔断并加倍退避
+                self.backoff = min(self.backoff * 2, self.max_backoff)
+                self.opened_at = time.monotonic()
+                self._transition(STATE_OPEN, f"试探失败，{self.backoff:.0f}秒后重试: {error}")
+            elif self.state == STATE_CLOSED and (trip or self.consecutive_failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self._transition(STATE_OPEN, f"连续失败{self.consecutive_failures}次: {error}")
+
+    def try_half_open(self):
+        """熔断且退避时间已过时切换到半开，返回是否应立即试探"""
+        with self._lock:
+            if self.state != STATE_OPEN:
+                return False
+            if time.monotonic() - self.opened_at < self.backoff:
+                return False
+            self._transition(STATE_HALF_OPEN, "退避结束，开始试探")
+            return True
+
+    def seconds_until_retry(self):
+        """熔断状态下距离下次试探的秒数"""
+        if self.state != STATE_OPEN or self.opened_at is None:
+            return 0.0
+        return max(0.0, self.backoff - (time.monotonic() - self.opened_at))
+
+
+class Neo4jHealthMonitor:
+    """后台探测线程 + 熔断器"""
+
+    def __init__(self, driver_provider, reset_driver=None, probe_interval=PROBE_INTERVAL, breaker=None):
+        self._driver_provider = driver_provider
+        self._reset_driver = reset_driver
+        self.probe_interval = probe_interval
+        self.breaker = breaker or CircuitBreaker()
+        self._ready = threading.Event()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._probe_stats = {
+            'probes': 0,
+            'probe_failures': 0,
+            'last_probe_ms': 0.0,
+            'max_probe_ms': 0.0,
+            'total_probe_ms': 0.0,
+            'last_probe_at': None
+        }
+
+    def start(self):
+        """启动后台探测线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="gfz-neo4j-health", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wait_ready(self, timeout=INITIAL_PROBE_TIMEOUT):
+        """等待第一次探测完成（只在进程首次检查时调用）"""
+        return self._ready.wait(timeout)
+
+    def is_available(self):
+        """请求路径调用：只读当前状态，不做任何网络操作"""
+        return self._ready.is_set() and self.breaker.state == STATE_CLOSED
+
+    def report_failure(self, error):
+        """业务查询遇到连接类错误时上报，并唤醒探测线程尽快复查"""
+        self.breaker.record_failure(error)
+        self._wake.set()
+
+    def probe(self):
+        """执行一次连通性探测，返回是否成功"""
+        start = time.perf_counter()
+        error = None
+        try:
+            driver = self._driver_provider()
+            if driver is None:
+                raise RuntimeError("无法创建Neo4j驱动：get_neo4j_driver()返回None")
+            driver.verify_connectivity()
+        except Exception as e:
+            error = e
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            stats = self._probe_stats
+            stats['probes'] += 1
+            stats['last_probe_ms'] = round(elapsed_ms, 2)
+            stats['max_probe_ms'] = round(max(stats['max_probe_ms'], elapsed_ms), 2)
+            stats['total_probe_ms'] += elapsed_ms
+            stats['last_probe_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            if error is not None:
+                stats['probe_failures'] += 1
+
+        if error is None:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure(error, trip=True)
+            if self._reset_driver and self.breaker.consecutive_failures % RESET_DRIVER_AFTER == 0:
+                self._reset_driver()
+        self._ready.set()
+        return error is None
+
+    def _next_wait(self):
+        if self.breaker.state == STATE_OPEN:
+            return max(0.05, self.breaker.seconds_until_retry())
+        if self.breaker.consecutive_failures:
+            # 尚未熔断但已有失败：尽快复查，确认是偶发还是故障
+            return self.breaker.base_backoff
+        return self.probe_interval
+
+    def _run(self):
+        self.probe()
+        while not self._stop.is_set():
+            self._wake.wait(self._next_wait())
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            if self.breaker.state == STATE_OPEN and not self.breaker.try_half_open():
+                continue
+            self.probe()
+
+    def stats(self):
+        """监测指标：熔断状态、连续失败次数、探测耗时、状态切换记录"""
+        with self._lock:
+            stats = dict(self._probe_stats)
+        probes = stats['probes']
+        stats['avg_probe_ms'] = round(stats['total_probe_ms'] / probes, 2) if probes else 0.0
+        stats['total_probe_ms'] = round(stats['total_probe_ms'], 2)
+        stats['state'] = self.breaker.state
+        stats['state_label'] = STATE_LABELS[self.breaker.state]
+        stats['consecutive_failures'] = self.breaker.consecutive_failures
+        stats['retry_in_seconds'] = round(self.breaker.seconds_until_retry(), 1)
+        stats['last_error'] = self.breaker.last_error
+        stats['transitions'] = list(self.breaker.transitions)
+        return stats
+
+
+# 进程级单例
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def get_health_monitor(driver_provider=None, reset_driver=None):
+    """获取全局健康监测器，首次调用时启动探测线程"""
+    global _monitor
+    if _monitor is None:
+        with _monitor_lock:
+            if _monitor is None:
+                if driver_provider is None:
+                    from modules.auth import get_neo4j_driver, reset_neo4j_driver
+                    driver_provider, reset_driver = get_neo4j_driver, reset_neo4j_driver
+                monitor = Neo4jHealthMonitor(driver_provider, reset_driver=reset_driver)
+                monitor.start()
+                _monitor = monitor
+    return _monitor
+
+
+def get_health_stats():
+    """获取健康监测指标（未启动时返回None）"""
+    if _monitor is None:
+        return None
+    return _monitor.stats()
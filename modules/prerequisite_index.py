@@ -0,0 +1,195 @@
+"""
+知识点前置关系索引模块
+对 PREREQUISITE 关系预先计算传递闭包、拓扑顺序和每个知识点的最长前置链深度：
+- 知识点按拓扑顺序编号，祖先（必须先掌握的全部知识点）和后代各存一个位集（Python 整数），
+  "X 之前要学什么"、"A 是否是 B 的前置" 都是位运算，无需临时遍历图
+- 位集中的位按拓扑顺序排列，取出的知识点天然是可学习的先后顺序
+- 索引按图谱数据版本缓存，只有图谱变化（invalidate 或 TTL 重新读取）时才重建
+数据来自 Neo4j 整图缓存（data_provider.get_knowledge_graph），不可用时使用内置示例数据
+"""
+
+import heapq
+import threading
+
+
+def _bits(mask):
+    """位集中为 1 的位序号，从低到高"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class PrerequisiteIndex:
+    """知识点前置关系的传递闭包索引（构建后只读）"""
+
+    def __init__(self, knowledge_points, prerequisites):
+        """
+        knowledge_points: [{"id", "name"}]，prerequisites: [(前置知识点 id, 后续知识点 id)]
+        成环的知识点无法排序，按原始顺序排在最后，其中指向前面的关系被忽略并打印提示
+        """
+        names = {kp["id"]: kp.get("name") for kp in knowledge_points}
+        original = {kp_id: i for i, kp_id in enumerate(names)}
+        successors = {kp_id: [] for kp_id in names}
+        in_degree = dict.fromkeys(names, 0)
+        edges = set()
+        for source, target in prerequisites:
+            if source in names and target in names and source != target and (source, target) not in edges:
+                edges.add((source, target))
+                successors[source].append(target)
+                in_degree[target] += 1
+
+        # Kahn 拓扑排序，同一批可学的知识点保持原始（教材）顺序
+        ready = [(original[kp_id], kp_id) for kp_id, degree in in_degree.items() if degree == 0]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            _, kp_id = heapq.heappop(ready)
+            order.append(kp_id)
+            for target in successors[kp_id]:
+                in_degree[target] -= 1
+                if in_degree[target] == 0:
+                    heapq.heappush(ready, (original[target], target))
+        cyclic = [kp_id for kp_id in names if in_degree[kp_id] > 0]
+        if cyclic:
+            print(f"[前置关系索引] {len(cyclic)} 个知识点的前置关系成环，部分关系已忽略: {cyclic[:5]}")
+            order.extend(cyclic)
+
+        self._order = order
+        self._names = names
+        self._position = {kp_id: i for i, kp_id in enumerate(order)}
+        position = self._position
+        # 只保留从拓扑序靠前指向靠后的边（成环的边被丢弃）
+        parents = [[] for _ in order]
+        for source, target in edges:
+            if position[source] < position[target]:
+                parents[position[target]].append(position[source])
+
+        # 按拓扑顺序合并前置知识点的祖先位集，同时得到最长前置链深度
+        ancestors = [0] * len(order)
+        depth = [0] * len(order)
+        for i, direct in enumerate(parents):
+            mask = 0
+            for parent in direct:
+                mask |= ancestors[parent] | (1 << parent)
+                depth[i] = max(depth[i], depth[parent] + 1)
+            ancestors[i] = mask
+        descendants = [0] * len(order)
+        for i in range(len(order) - 1, -1, -1):
+            for parent in parents[i]:
+                descendants[parent] |= descendants[i] | (1 << i)
+        self._ancestors = ancestors
+        self._descendants = descendants
+        self._depth = depth
+        self._direct = [sorted(direct) for direct in parents]
+        self.edge_count = len(edges)
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, kp_id):
+        return kp_id in self._position
+
+    def _ids(self, mask):
+        return [self._order[i] for i in _bits(mask)]
+
+    def name(self, kp_id):
+        return self._names.get(kp_id)
+
+    def topological_order(self):
+        """全部知识点的拓扑顺序（前置在前）"""
+        return list(self._order)
+
+    def position(self, kp_id):
+        """知识点在拓扑顺序中的序号，不在索引中时为 None"""
+        return self._position.get(kp_id)
+
+    def depth(self, kp_id):
+        """最长前置链的长度（没有前置为 0），不在索引中时为 None"""
+        i = self._position.get(kp_id)
+        return None if i is None else self._depth[i]
+
+    def direct_prerequisites(self, kp_id):
+        i = self._position.get(kp_id)
+        return [] if i is None else [self._order[j] for j in self._direct[i]]
+
+    def ancestors(self, kp_id):
+        """学习 kp_id 之前必须掌握的全部知识点（传递闭包），按拓扑顺序"""
+        i = self._position.get(kp_id)
+        return [] if i is None else self._ids(self._ancestors[i])
+
+    def descendants(self, kp_id):
+        """以 kp_id 为（直接或间接）前置的全部知识点，按拓扑顺序"""
+        i = self._position.get(kp_id)
+        return [] if i is None else self._ids(self._descendants[i])
+
+    def is_prerequisite(self, source, target):
+        """source 是否是 target 的（直接或间接）前置知识点"""
+        i = self._position.get(source)
+        j = self._position.get(target)
+        return i is not None and j is not None and bool(self._ancestors[j] >> i & 1)
+
+    def learning_order(self, kp_ids, mastered=()):
+        """
+        学习 kp_ids 的顺序：目标知识点加上它们尚未掌握的全部前置知识点，按拓扑顺序
+        不在索引中的 id 追加在末尾（保持传入顺序）
+        """
+        mask = 0
+        unknown = []
+        for kp_id in kp_ids:
+            i = self._position.get(kp_id)
+            if i is None:
+                if kp_id not in unknown:
+                    unknown.append(kp_id)
+            else:
+                mask |= self._ancestors[i] | (1 << i)
+        for kp_id in mastered:
+            i = self._position.get(kp_id)
+            if i is not None:
+                mask &= ~(1 << i)
+        return self._ids(mask) + unknown
+
+
+def _current_graph():
+    """(数据版本, 树形图谱)：Neo4j 整图缓存优先，否则使用内置示例数据"""
+    from modules.graph_repository import is_neo4j_available
+    if is_neo4j_available():
+        from modules.data_provider import get_knowledge_graph, get_knowledge_graph_version
+        # 先读取图谱（TTL 到期时会换代）再取版本号
+        graph = get_knowledge_graph()
+        if graph:
+            return get_knowledge_graph_version(), graph
+    from data.knowledge_graph_gfz import GFZ_KNOWLEDGE_GRAPH
+    return "example", GFZ_KNOWLEDGE_GRAPH
+
+
+def build_prerequisite_index(graph):
+    """
+    从树形图谱（模块→章节→知识点 + prerequisites）构建索引
+    前置关系兼容 Neo4j 的 {source, target} 和内置示例数据的 {from, to}
+    """
+    knowledge_points = [kp for module in graph.get("modules", [])
+                        for chapter in module.get("chapters", [])
+                        for kp in chapter.get("knowledge_points", [])]
+    pairs = [(rel.get("source", rel.get("from")), rel.get("target", rel.get("to")))
+             for rel in graph.get("prerequisites", [])]
+    return PrerequisiteIndex(knowledge_points, pairs)
+
+
+# 进程级缓存：(数据版本, 索引)
+_index_cache = {'version': None, 'index': None}
+_index_lock = threading.Lock()
+
+
+def get_prerequisite_index():
+    """获取当前图谱版本的前置关系索引（版本变化时重建）"""
+    version, graph = _current_graph()
+    if _index_cache['index'] is not None and _index_cache['version'] == version:
+        return _index_cache['index']
+    with _index_lock:
+        if _index_cache['index'] is None or _index_cache['version'] != version:
+            index = build_prerequisite_index(graph)
+            _index_cache['version'] = version
+            _index_cache['index'] = index
+            print(f"[前置关系索引] 已构建，版本 {version}，{len(index)} 个知识点，{index.edge_count} 条前置关系")
+        return _index_cache['index']
@@ -0,0 +1,163 @@
+"""
+查询结果缓存模块
+进程级缓存，供所有教师会话共享（Streamlit 每次重跑不再重复执行相同的聚合查询）：
+- 按查询语句和参数生成键，每条缓存有自己的过期时间（TTL）
+- 条目数超过上限时淘汰最久未使用的（LRU）
+- 每条缓存带若干标签，写入/删除数据时只让相关标签的缓存失效
+- 每个标签有自己的失效代数：查询执行期间它的标签被失效过，结果才不写入缓存，其他标签的写入不受影响
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+# 默认过期时间（秒）与最大条目数
+DEFAULT_TTL = 60.0
+MAX_ENTRIES = 512
+
+# 缓存标签：
+# - TAG_ACTIVITY：跨模块的活动聚合（概况、趋势、热门内容、全部模块统计），
+#   活动写入不使其失效（否则学生活跃时几乎每批都清空），靠 TTL 限定陈旧时间；删除/修复数据时失效
+# - TAG_STUDENT：学生列表，新学生注册时失效，活动计数的变化同样靠 TTL
+# - TAG_MODULE_STATS + module_tag(模块名)：单模块统计，写入时只失效对应模块，删除时全部失效
+TAG_ACTIVITY = "activity"
+TAG_STUDENT = "student"
+TAG_MODULE_STATS = "module_stats"
+
+
+def module_tag(module_name):
+    """单个模块统计的标签"""
+    return f"module_stats:{module_name}"
+
+
+def make_key(*parts):
+    """把查询语句/函数名和参数转成缓存键（参数可能含列表等不可哈希的值，统一转成字符串）"""
+    normalized = []
+    for part in parts:
+        if isinstance(part, dict):
+            part = sorted(part.items())
+        normalized.append(part)
+    return repr(normalized)
+
+
+class QueryCache:
+    """带 TTL、LRU 上限和标签失效的线程安全缓存"""
+
+    def __init__(self, max_entries=MAX_ENTRIES, default_ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        # key -> (过期时间, 值, 标签)
+        self._entries = OrderedDict()
+        # 标签 -> {key}
+        self._tags = {}
+        # 失效代数：clear() 使全局代数加一，invalidate() 使对应标签的代数加一；
+        # 查询开始后它的任一标签发生过失效，结果可能已过时，不再写入缓存
+        self.generation = 0
+        self._tag_generations = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evictions': 0,
+            'invalidations': 0,
+            'stale_skips': 0
+        }
+
+    def get(self, key):
+        """返回 (是否命中, 值)；命中时返回值的副本，调用方修改不会影响缓存"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return False, None
+            expires_at, value, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+        return True, copy.deepcopy(value)
+
+    def generation_for(self, tags=()):
+        """查询开始前调用：全局代数和各标签代数的快照，传给 set() 的 generation"""
+        with self._lock:
+            return self._generation_for(tags)
+
+    def _generation_for(self, tags):
+        return (self.generation,) + tuple(self._tag_generations.get(tag, 0) for tag in tags)
+
+    def set(self, key, value, ttl=None, tags=(), generation=None):
+        """写入缓存；generation 为查询开始前 generation_for(tags) 的快照，期间这些标签有失效则放弃写入"""
+        with self._lock:
+            if generation is not None and generation != self._generation_for(tags):
+                self._stats['stale_skips'] += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            expires_at = time.monotonic() + (ttl if ttl is not None else self.default_ttl)
+            self._entries[key] = (expires_at, copy.deepcopy(value), tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, *tags):
+        """删除带有任一指定标签的缓存，返回删除的条目数"""
+        removed = 0
+        with self._lock:
+            for tag in tags:
+                self._tag_generations[tag] = self._tag_generations.get(tag, 0) + 1
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    removed += 1
+            self._stats['invalidations'] += removed
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._stats['invalidations'] += len(self._entries)
+            self._entries.clear()
+            self._tags.clear()
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self):
+        """命中/未命中次数、命中率、当前条目数"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+# 进程级单例
+_cache = QueryCache()
+
+
+def get_query_cache():
+    """获取全局查询缓存"""
+    return _cache
+
+
+def invalidate(*tags):
+    """让指定标签的缓存失效（写入/删除数据后调用）"""
+    return _cache.invalidate(*tags)
+
+
+def get_query_cache_stats():
+    return _cache.stats()
@@ -0,0 +1,151 @@
+"""
+查询性能统计模块
+graph_repository 每执行一次查询记录一条：耗时、返回行数、查询指纹、调用函数，可选抽样 PROFILE 的 db hits
+按查询指纹聚合，保留最近若干次耗时计算 p50/p95/p99，供系统设置页展示和导出 CSV
+"""
+
+import csv
+import hashlib
+import io
+import re
+import threading
+from collections import Counter, deque
+from functools import lru_cache
+
+# 每个查询指纹保留最近多少次耗时用于计算分位数
+WINDOW_SIZE = 1000
+# 最多统计多少个不同的查询指纹（超出后新指纹归入 "其他"）
+MAX_FINGERPRINTS = 500
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+_CSV_FIELDS = ['fingerprint', 'name', 'access_mode', 'top_caller', 'count', 'errors',
+               'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'total_ms', 'avg_rows',
+               'profiled', 'avg_db_hits', 'query']
+
+
+@lru_cache(maxsize=1024)
+def normalize_query(query):
+    """去掉字面量和多余空白，相同结构的查询得到相同文本"""
+    query = _STRING_LITERAL.sub("?", query)
+    query = _NUMBER_LITERAL.sub("?", query)
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(query):
+    """查询指纹：规范化文本的短哈希"""
+    return hashlib.sha1(normalize_query(query).encode('utf-8')).hexdigest()[:10]
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class _QueryStats:
+    def __init__(self, name, access_mode, query):
+        self.name = name
+        self.access_mode = access_mode
+        self.query = query
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.total_rows = 0
+        self.row_samples = 0
+        self.profiled = 0
+        self.total_db_hits = 0
+        self.latencies = deque(maxlen=WINDOW_SIZE)
+        self.callers = Counter()
+
+
+class QueryMetrics:
+    """按查询指纹聚合的耗时分布（线程安全）"""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, name, access_mode, query, caller, elapsed_ms, rows=None, error=None, db_hits=None):
+        with self._lock:
+            if key not in self._stats and len(self._stats) >= MAX_FINGERPRINTS:
+                key, name, query = "other", "其他", ""
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _QueryStats(name, access_mode, query)
+            stats.count += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.latencies.append(elapsed_ms)
+            stats.callers[caller] += 1
+            if error is not None:
+                stats.errors += 1
+            if rows is not None:
+                stats.total_rows += rows
+                stats.row_samples += 1
+            if db_hits is not None:
+                stats.profiled += 1
+                stats.total_db_hits += db_hits
+
+    def snapshot(self):
+        """每个查询指纹一行，按总耗时从高到低排序"""
+        with self._lock:
+            items = [(key, stats, sorted(stats.latencies), stats.callers.most_common(1))
+                     for key, stats in self._stats.items()]
+        rows = []
+        for key, stats, latencies, top_caller in items:
+            rows.append({
+                'fingerprint': key,
+                'name': stats.name,
+                'access_mode': stats.access_mode,
+                'top_caller': top_caller[0][0] if top_caller else '',
+                'count': stats.count,
+                'errors': stats.errors,
+                'p50_ms': round(_percentile(latencies, 50), 2),
+                'p95_ms': round(_percentile(latencies, 95), 2),
+                'p99_ms': round(_percentile(latencies, 99), 2),
+                'max_ms': round(stats.max_ms, 2),
+                'total_ms': round(stats.total_ms, 2),
+                'avg_rows': round(stats.total_rows / stats.row_samples, 1) if stats.row_samples else None,
+                'profiled': stats.profiled,
+                'avg_db_hits': round(stats.total_db_hits / stats.profiled) if stats.profiled else None,
+                'query': stats.query
+            })
+        rows.sort(key=lambda row: row['total_ms'], reverse=True)
+        return rows
+
+    def to_csv(self):
+        """导出全部统计为 CSV 文本"""
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=_CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(self.snapshot())
+        return buffer.getvalue()
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+def sum_db_hits(profile):
+    """递归累加 PROFILE 执行计划中各算子的 db hits"""
+    if not profile:
+        return 0
+    hits = profile.get('dbHits') or profile.get('db_hits') or 0
+    for child in profile.get('children', []):
+        hits += sum_db_hits(child)
+    return hits
+
+
+# 进程级单例
+_metrics = QueryMetrics()
+
+
+def get_query_metrics():
+    """获取全局查询统计"""
+    return _metrics
@@ -5,35 +5,23 @@
 
 import streamlit as st
 from datetime import datetime
-from openai import OpenAI
 from config.settings import *
 import pandas as pd
-
-def check_neo4j_available():
-    """检查Neo4j是否可用"""
-    from modules.auth import check_neo4j_available as auth_check
-    return auth_check()
-
-def get_neo4j_driver():
-    """获取Neo4j连接"""
-    from modules.auth import get_neo4j_driver as auth_get_driver
-    return auth_get_driver()
+from modules.graph_repository import is_neo4j_available, read_query, read_transaction
+from modules.llm_client import get_llm_client
+from modules.llm_stream import stream_chat_completion, write_stream
 
 def get_all_students():
     """获取所有学生列表"""
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return []
     
     try:
-        driver = get_neo4j_driver()
-        with driver.session() as session:
-            result = session.run("""
-                MATCH (s:gfz_Student)
-                RETURN s.student_id as student_id, s.name as name
-                ORDER BY s.student_id
-            """)
-            students = [dict(record) for record in result]
-        return students
+        return read_query("""
+            MATCH (s:gfz_Student)
+            RETURN s.student_id as student_id, s.name as name
+            ORDER BY s.student_id
+        """, name="报告学生列表")
     except Exception as e:
         st.error(f"获取学生列表失败: {e}")
         return []
@@ -48,203 +36,209 @@ def get_all_modules():
         {"module_id": "课中互动", "name": "课中互动"}
     ]
 
+def _read_student_learning_data(tx, student_id):
+    """在同一个读事务中读取学生信息、活动记录和统计"""
+    # 获取学生基本信息
+    student_info = tx.run("""
+        MATCH (s:gfz_Student {student_id: $student_id})
+        RETURN s.student_id as student_id, s.name as name
+    """, student_id=student_id).single()
+    
+    if not student_info:
+        return None
+    
+    # 获取学习活动记录
+    activities = tx.run("""
+        MATCH (s:gfz_Student {student_id: $student_id})-[:PERFORMED]->(a:gfz_Activity)
+        RETURN 
+            a.activity_type as activity_type,
+            a.module_name as module_name,
+            a.content_name as content_name,
+            a.timestamp as timestamp,
+            a.details as details
+        ORDER BY a.timestamp DESC
+        LIMIT 100
+    """, student_id=student_id)
+    
+    activity_list = [dict(record) for record in activities]
+    
+    # 获取学生统计信息
+    stats = tx.run("""
+        MATCH (s:gfz_Student {student_id: $student_id})-[:PERFORMED]->(a:gfz_Activity)
+        RETURN 
+            count(a) as total_activities,
+            count(DISTINCT a.module_name) as modules_accessed,
+            max(a.timestamp) as last_activity
+    """, student_id=student_id).single()
+    
+    stats_dict = dict(stats) if stats else {}
+    
+    return {
+        'student_info': dict(student_info),
+        'activities': activity_list,
+        'stats': stats_dict
+    }
+
 def get_student_learning_data(student_id):
     """获取学生的学习数据"""
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return None
     
     try:
-        driver = get_neo4j_driver()
-        with driver.session() as session:
-            # 获取学生基本信息
-            student_info = session.run("""
-                MATCH (s:gfz_Student {student_id: $student_id})
-                RETURN s.student_id as student_id, s.name as name
-            """, student_id=student_id).single()
-            
-            if not student_info:
-                return None
-            
-            # 获取学习活动记录
-            activities = session.run("""
-                MATCH (s:gfz_Student {student_id: $student_id})-[:PERFORMED]->(a:gfz_Activity)
-                RETURN 
-                    a.activity_type as activity_type,
-                    a.module_name as module_name,
-                    a.content_name as content_name,
-                    a.timestamp as timestamp,
-                    a.details as details
-                ORDER BY a.timestamp DESC
-                LIMIT 100
-            """, student_id=student_id)
-            
-            activity_list = [dict(record) for record in activities]
-            
-            # 获取学生统计信息
-            stats = session.run("""
-                MATCH (s:gfz_Student {student_id: $student_id})-[:PERFORMED]->(a:gfz_Activity)
-                RETURN 
-                    count(a) as total_activities,
-                    count(DISTINCT a.module_name) as modules_accessed,
-                    max(a.timestamp) as last_activity
-            """, student_id=student_id).single()
-            
-            stats_dict = dict(stats) if stats else {}
-            
-        return {
-            'student_info': dict(student_info),
-            'activities': activity_list,
-            'stats': stats_dict
-        }
+        return read_transaction(_read_student_learning_data, student_id, name="学生学习数据")
     except Exception as e:
         st.error(f"获取学生数据失败: {e}")
         return None
 
+def _read_module_learning_data(tx, module_id):
+    """在同一个读事务中读取板块的学生统计、总体统计和热门内容"""
+    # module_id 就是板块名称（案例库、知识图谱等）
+    module_name = module_id
+    
+    # 获取该板块的学习活动统计
+    student_stats = tx.run("""
+        MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)
+        WHERE a.module_name = $module_name
+        RETURN 
+            s.student_id as student_id,
+            s.name as student_name,
+            count(a) as activity_count,
+            max(a.timestamp) as last_activity
+        ORDER BY activity_count DESC
+    """, module_name=module_name)
+    
+    stats_list = [dict(record) for record in student_stats]
+    
+    # 获取板块总体统计
+    overall_stats = tx.run("""
+        MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)
+        WHERE a.module_name = $module_name
+        RETURN 
+            count(DISTINCT s) as student_count,
+            count(a) as total_activities
+    """, module_name=module_name).single()
+    
+    # 获取该板块的热门内容
+    popular_content = tx.run("""
+        MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)
+        WHERE a.module_name = $module_name AND a.content_name IS NOT NULL
+        RETURN 
+            a.content_name as content_name,
+            count(a) as access_count,
+            count(DISTINCT s) as student_count
+        ORDER BY access_count DESC
+        LIMIT 10
+    """, module_name=module_name)
+    
+    content_list = [dict(record) for record in popular_content]
+    
+    return {
+        'module_info': {'module_id': module_id, 'name': module_name},
+        'student_stats': stats_list,
+        'overall_stats': dict(overall_stats) if overall_stats else {'student_count': 0, 'total_activities': 0},
+        'popular_content': content_list
+    }
+
 def get_module_learning_data(module_id):
     """获取某个系统板块的学习数据（案例库、知识图谱等）"""
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return None
     
     try:
-        driver = get_neo4j_driver()
-        with driver.session() as session:
-            # module_id 就是板块名称（案例库、知识图谱等）
-            module_name = module_id
-            
-            # 获取该板块的学习活动统计
-            student_stats = session.run("""
-                MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)
-                WHERE a.module_name = $module_name
-                RETURN 
-                    s.student_id as student_id,
-                    s.name as student_name,
-                    count(a) as activity_count,
-                    max(a.timestamp) as last_activity
-                ORDER BY activity_count DESC
-            """, module_name=module_name)
-            
-            stats_list = [dict(record) for record in student_stats]
-            
-            # 获取板块总体统计
-            overall_stats = session.run("""
-                MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)
-                WHERE a.module_name = $module_name
-                RETURN 
-                    count(DISTINCT s) as student_count,
-                    count(a) as total_activities
-            """, module_name=module_name).single()
-            
-            # 获取该板块的热门内容
-            popular_content = session.run("""
-                MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)
-                WHERE a.module_name = $module_name AND a.content_name IS NOT NULL
-                RETURN 
-                    a.content_name as content_name,
-                    count(a) as access_count,
-                    count(DISTINCT s) as student_count
-                ORDER BY access_count DESC
-                LIMIT 10
-            """, module_name=module_name)
-            
-            content_list = [dict(record) for record in popular_content]
-            
-        return {
-            'module_info': {'module_id': module_id, 'name': module_name},
-            'student_stats': stats_list,
-            'overall_stats': dict(overall_stats) if overall_stats else {'student_count': 0, 'total_activities': 0},
-            'popular_content': content_list
-        }
+        return read_transaction(_read_module_learning_data, module_id, name="板块学习数据")
     except Exception as e:
         st.error(f"获取板块数据失败: {e}")
         return None
 
+def _read_overall_learning_data(tx):
+    """在同一个读事务中读取整体统计、各板块情况、活跃学生和热门内容"""
+    # 获取总体统计
+    overall_stats = tx.run(f"""
+        MATCH (s:{NEO4J_LABEL_STUDENT_GFZ})
+        WITH count(s) as total_students
+        MATCH (k:{NEO4J_LABEL_KNOWLEDGE_GFZ})
+        WITH total_students, count(k) as total_kp
+        OPTIONAL MATCH (s:{NEO4J_LABEL_STUDENT_GFZ})-[:PERFORMED]->(a:{NEO4J_LABEL_ACTIVITY_GFZ})
+        RETURN 
+            total_students,
+            total_kp,
+            count(a) as total_activities
+    """).single()
+    
+    # 获取各板块学习情况
+    module_stats = tx.run(f"""
+        MATCH (m:{NEO4J_LABEL_MODULE_GFZ})
+        OPTIONAL MATCH (m)-[:CONTAINS]->(c:{NEO4J_LABEL_CHAPTER_GFZ})-[:CONTAINS]->(k:{NEO4J_LABEL_KNOWLEDGE_GFZ})
+        WITH m, count(DISTINCT k) as kp_count, count(DISTINCT c) as chapter_count
+        OPTIONAL MATCH (s:{NEO4J_LABEL_STUDENT_GFZ})-[:PERFORMED]->(a:{NEO4J_LABEL_ACTIVITY_GFZ})
+        WHERE a.module_name = m.name
+        RETURN 
+            m.name as module_name,
+            kp_count,
+            chapter_count,
+            count(DISTINCT s) as student_count,
+            count(a) as activity_count
+        ORDER BY m.id
+    """)
+    
+    module_list = [dict(record) for record in module_stats]
+    
+    # 获取活跃学生Top10
+    active_students = tx.run("""
+        MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)
+        RETURN 
+            s.student_id as student_id,
+            s.name as student_name,
+            count(a) as activity_count
+        ORDER BY activity_count DESC
+        LIMIT 10
+    """)
+    
+    active_list = [dict(record) for record in active_students]
+    
+    # 获取热门学习内容
+    popular_content = tx.run("""
+        MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)
+        WHERE a.content_name IS NOT NULL
+        RETURN 
+            a.content_name as content_name,
+            a.module_name as module_name,
+            count(DISTINCT s) as student_count,
+            count(a) as access_count
+        ORDER BY access_count DESC
+        LIMIT 10
+    """)
+    
+    popular_list = [dict(record) for record in popular_content]
+    
+    return {
+        'overall_stats': dict(overall_stats) if overall_stats else {},
+        'module_stats': module_list,
+        'active_students': active_list,
+        'popular_content': popular_list
+    }
+
 def get_overall_learning_data():
     """获取整体学习数据"""
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return None
     
     try:
-        driver = get_neo4j_driver()
-        with driver.session() as session:
-            # 获取总体统计
-            overall_stats = session.run(f"""
-                MATCH (s:{NEO4J_LABEL_STUDENT_GFZ})
-                WITH count(s) as total_students
-                MATCH (k:{NEO4J_LABEL_KNOWLEDGE_GFZ})
-                WITH total_students, count(k) as total_kp
-                OPTIONAL MATCH (s:{NEO4J_LABEL_STUDENT_GFZ})-[:PERFORMED]->(a:{NEO4J_LABEL_ACTIVITY_GFZ})
-                RETURN 
-                    total_students,
-                    total_kp,
-                    count(a) as total_activities
-            """).single()
-            
-            # 获取各板块学习情况
-            module_stats = session.run(f"""
-                MATCH (m:{NEO4J_LABEL_MODULE_GFZ})
-                OPTIONAL MATCH (m)-[:CONTAINS]->(c:{NEO4J_LABEL_CHAPTER_GFZ})-[:CONTAINS]->(k:{NEO4J_LABEL_KNOWLEDGE_GFZ})
-                WITH m, count(DISTINCT k) as kp_count, count(DISTINCT c) as chapter_count
-                OPTIONAL MATCH (s:{NEO4J_LABEL_STUDENT_GFZ})-[:PERFORMED]->(a:{NEO4J_LABEL_ACTIVITY_GFZ})
-                WHERE a.module_name = m.name
-                RETURN 
-                    m.name as module_name,
-                    kp_count,
-                    chapter_count,
-                    count(DISTINCT s) as student_count,
-                    count(a) as activity_count
-                ORDER BY m.id
-            """)
-            
-            module_list = [dict(record) for record in module_stats]
-            
-            # 获取活跃学生Top10
-            active_students = session.run("""
-                MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)
-                RETURN 
-                    s.student_id as student_id,
-                    s.name as student_name,
-                    count(a) as activity_count
-                ORDER BY activity_count DESC
-                LIMIT 10
-            """)
-            
-            active_list = [dict(record) for record in active_students]
-            
-            # 获取热门学习内容
-            popular_content = session.run("""
-                MATCH (s:gfz_Student)-[:PERFORMED]->(a:gfz_Activity)
-                WHERE a.content_name IS NOT NULL
-                RETURN 
-                    a.content_name as content_name,
-                    a.module_name as module_name,
-                    count(DISTINCT s) as student_count,
-                    count(a) as access_count
-                ORDER BY access_count DESC
-                LIMIT 10
-            """)
-            
-            popular_list = [dict(record) for record in popular_content]
-            
-        return {
-            'overall_stats': dict(overall_stats) if overall_stats else {},
-            'module_stats': module_list,
-            'active_students': active_list,
-            'popular_content': popular_list
-        }
+        return read_transaction(_read_overall_learning_data, name="整体学习数据")
     except Exception as e:
         st.error(f"获取整体数据失败: {e}")
         return None
 
-def generate_personal_report_with_ai(student_data):
-    """使用AI生成个人学习报告"""
+def generate_personal_report_with_ai(student_data, stream=False):
+    """
+    使用AI生成个人学习报告
+    stream=True 时返回逐段产出文本的生成器，用 llm_stream.write_stream 显示
+    """
     if not student_data:
         return "无法生成报告：学生数据为空"
     
     try:
-        client = OpenAI(
-            api_key=DEEPSEEK_API_KEY,
-            base_url=DEEPSEEK_BASE_URL
-        )
+        client = get_llm_client()
         
         # 构建提示词
         student_info = student_data['student_info']
@@ -292,7 +286,7 @@ def generate_personal_report_with_ai(student_data):
 - 使用 Markdown 格式输出
 """
         
-        response = client.chat.completions.create(
+        request = dict(
             model="deepseek-chat",
             messages=[
                 {"role": "system", "content": "你是一位经验丰富的高分子物理教师，擅长分析学生的学习数据并给出专业的指导建议。"},
@@ -301,6 +295,11 @@ def generate_personal_report_with_ai(student_data):
             temperature=0.7,
             max_tokens=2000
         )
+        if stream:
+            return stream_chat_completion(client, "个人学习报告",
+                                          on_error=lambda e: f"生成报告失败：{str(e)}", **request)
+        
+        response = client.chat.completions.create(**request)
         
         report = response.choices[0].message.content
         return report
@@ -308,16 +307,16 @@ def generate_personal_report_with_ai(student_data):
     except Exception as e:
         return f"生成报告失败：{str(e)}"
 
-def generate_module_report_with_ai(module_data):
-    """使用AI生成系统板块学习报告（案例库、知识图谱等）"""
+def generate_module_report_with_ai(module_data, stream=False):
+    """
+    使用AI生成系统板块学习报告（案例库、知识图谱等）
+    stream=True 时返回逐段产出文本的生成器，用 llm_stream.write_stream 显示
+    """
     if not module_data:
         return "无法生成报告：板块数据为空"
     
     try:
-        client = OpenAI(
-            api_key=DEEPSEEK_API_KEY,
-            base_url=DEEPSEEK_BASE_URL
-        )
+        client = get_llm_client()
         
         module_info = module_data['module_info']
         student_stats = module_data['student_stats']
@@ -366,7 +365,7 @@ def generate_module_report_with_ai(module_data):
 - 使用 Markdown 格式输出
 """
         
-        response = client.chat.completions.create(
+        request = dict(
             model="deepseek-chat",
             messages=[
                 {"role": "system", "content": "你是一位经验丰富的高分子物理教师，擅长分析学习系统各功能板块的使用效果并给出改进建议。"},
@@ -375,6 +374,11 @@ def generate_module_report_with_ai(module_data):
             temperature=0.7,
             max_tokens=2000
         )
+        if stream:
+            return stream_chat_completion(client, "板块学习报告",
+                                          on_error=lambda e: f"生成报告失败：{str(e)}", **request)
+        
+        response = client.chat.completions.create(**request)
         
         report = response.choices[0].message.content
         return report
@@ -382,16 +386,16 @@ def generate_module_report_with_ai(module_data):
     except Exception as e:
         return f"生成报告失败：{str(e)}"
 
-def generate_overall_report_with_ai(overall_data):
-    """使用AI生成整体学习报告"""
+def generate_overall_report_with_ai(overall_data, stream=False):
+    """
+    使用AI生成整体学习报告
+    stream=True 时返回逐段产出文本的生成器，用 llm_stream.write_stream 显示
+    """
     if not overall_data:
         return "无法生成报告：整体数据为空"
     
     try:
-        client = OpenAI(
-            api_key=DEEPSEEK_API_KEY,
-            base_url=DEEPSEEK_BASE_URL
-        )
+        client = get_llm_client()
         
         overall_stats = overall_data['overall_stats']
         module_stats = overall_data['module_stats']
@@ -430,7 +434,7 @@ def generate_overall_report_with_ai(overall_data):
 - 使用 Markdown 格式输出
 """
         
-        response = client.chat.completions.create(
+        request = dict(
             model="deepseek-chat",
             messages=[
                 {"role": "system", "content": "你是一位经验丰富的高分子物理教师和教学管理专家，擅长分析整体教学数据并给出战略性的教学改进建议。"},
@@ -439,6 +443,11 @@ def generate_overall_report_with_ai(overall_data):
             temperature=0.7,
             max_tokens=2500
         )
+        if stream:
+            return stream_chat_completion(client, "整体学习报告",
+                                          on_error=lambda e: f"生成报告失败：{str(e)}", **request)
+        
+        response = client.chat.completions.create(**request)
         
         report = response.choices[0].message.content
         return report
@@ -451,7 +460,7 @@ def render_report_generator():
     st.markdown("## 📊 学习报告生成")
     st.markdown("---")
     
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         st.error("❌ Neo4j数据库连接失败，无法生成报告")
         return
     
@@ -516,21 +525,21 @@ def render_personal_report_generator():
                 st.error("未找到该学生的学习数据")
                 return
             
-            # 生成报告
-            report = generate_personal_report_with_ai(student_data)
-            
-            # 显示报告
-            st.markdown("---")
-            st.markdown("### 📄 学习报告")
-            st.markdown(report)
-            
-            # 下载按钮
-            st.download_button(
-                label="📥 下载报告",
-                data=report,
-                file_name=f"学习报告_{student_data['student_info']['name']}_{datetime.now().strftime('%Y%m%d')}.md",
-                mime="text/markdown"
-            )
+        # 生成报告：流式输出，边生成边显示
+        result = generate_personal_report_with_ai(student_data, stream=True)
+        
+        # 显示报告
+        st.markdown("---")
+        st.markdown("### 📄 学习报告")
+        report = write_stream(result)
+        
+        # 下载按钮
+        st.download_button(
+            label="📥 下载报告",
+            data=report,
+            file_name=f"学习报告_{student_data['student_info']['name']}_{datetime.now().strftime('%Y%m%d')}.md",
+            mime="text/markdown"
+        )
 
 def render_module_report_generator():
     """渲染板块报告生成界面"""
@@ -575,21 +584,21 @@ def render_module_report_generator():
                 st.error("未找到该板块的学习数据")
                 return
             
-            # 生成报告
-            report = generate_module_report_with_ai(module_data)
-            
-            # 显示报告
-            st.markdown("---")
-            st.markdown("### 📄 板块学习报告")
-            st.markdown(report)
-            
-            # 下载按钮
-            st.download_button(
-                label="📥 下载报告",
-                data=report,
-                file_name=f"板块报告_{selected_module}_{datetime.now().strftime('%Y%m%d')}.md",
-                mime="text/markdown"
-            )
+        # 生成报告：流式输出，边生成边显示
+        result = generate_module_report_with_ai(module_data, stream=True)
+        
+        # 显示报告
+        st.markdown("---")
+        st.markdown("### 📄 板块学习报告")
+        report = write_stream(result)
+        
+        # 下载按钮
+        st.download_button(
+            label="📥 下载报告",
+            data=report,
+            file_name=f"板块报告_{selected_module}_{datetime.now().strftime('%Y%m%d')}.md",
+            mime="text/markdown"
+        )
 
 def render_overall_report_generator():
     """渲染整体报告生成界面"""
@@ -625,18 +634,18 @@ def render_overall_report_generator():
                 st.error("无法获取整体学习数据")
                 return
             
-            # 生成报告
-            report = generate_overall_report_with_ai(overall_data)
-            
-            # 显示报告
-            st.markdown("---")
-            st.markdown("### 📄 整体学习报告")
-            st.markdown(report)
-            
-            # 下载按钮
-            st.download_button(
-                label="📥 下载报告",
-                data=report,
-                file_name=f"整体学习报告_{datetime.now().strftime('%Y%m%d')}.md",
-                mime="text/markdown"
-            )
+        # 生成报告：流式输出，边生成边显示
+        result = generate_overall_report_with_ai(overall_data, stream=True)
+        
+        # 显示报告
+        st.markdown("---")
+        st.markdown("### 📄 整体学习报告")
+        report = write_stream(result)
+        
+        # 下载按钮
+        st.download_button(
+            label="📥 下载报告",
+            data=report,
+            file_name=f"整体学习报告_{datetime.now().strftime('%Y%m%d')}.md",
+            mime="text/markdown"
+        )
@@ -0,0 +1,276 @@
+"""
+Neo4j 模式（约束/索引）管理模块
+幂等地创建所有 gfz_ 标签所需的唯一约束、范围索引、文本索引和全文索引，并在库中记录模式版本；
+旧版导入脚本建立的未命名范围索引会与同标签同属性的唯一约束冲突，建约束前先删除；
+执行失败的语句（重复数据等）随版本一起记录，不在每次启动时反复重试（--force 时重试）；
+连接中断、超时等瞬时错误不记录，整次检查按退避间隔稍后重试；
+提供 EXPLAIN 检查，确认热点查询走索引查找而不是标签扫描
+"""
+
+import threading
+import time
+
+# 可选导入Neo4j（云端演示环境可能未安装）；瞬时错误时语句本身没有问题，稍后重试即可
+try:
+    from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+    _TRANSIENT_ERRORS = (ServiceUnavailable, SessionExpired, TransientError)
+except ImportError:
+    _TRANSIENT_ERRORS = ()
+
+# 修改下方约束/索引定义时递增，启动时版本落后才会重新执行
+SCHEMA_VERSION = 5
+
+# 唯一约束（同时自带索引）：(名称, 标签, 属性)
+CONSTRAINTS = [
+    ("gfz_student_id_unique", "gfz_Student", "student_id"),
+    ("gfz_activity_id_unique", "gfz_Activity", "id"),
+    ("gfz_case_id_unique", "gfz_Case", "id"),
+    ("gfz_module_id_unique", "gfz_Module", "id"),
+    ("gfz_chapter_id_unique", "gfz_Chapter", "id"),
+    ("gfz_knowledge_point_id_unique", "gfz_KnowledgePoint", "id"),
+    ("gfz_question_id_unique", "gfz_Question", "id"),
+    ("gfz_ability_id_unique", "gfz_Ability", "id"),
+    ("gfz_module_stats_name_unique", "gfz_ModuleStats", "module_name"),
+    ("gfz_delete_job_key_unique", "gfz_DeleteJob", "key"),
+]
+
+# 范围索引：(名称, 标签, 属性列表)
+RANGE_INDEXES = [
+    ("gfz_activity_timestamp", "gfz_Activity", ["timestamp"]),
+    ("gfz_activity_module_name", "gfz_Activity", ["module_name"]),
+    ("gfz_activity_module_timestamp", "gfz_Activity", ["module_name", "timestamp"]),
+    ("gfz_activity_day_key", "gfz_Activity", ["day_key"]),
+    ("gfz_activity_hour_key", "gfz_Activity", ["hour_key"]),
+    ("gfz_student_name", "gfz_Student", ["name"]),
+    ("gfz_knowledge_point_name", "gfz_KnowledgePoint", ["name"]),
+    ("gfz_chapter_name", "gfz_Chapter", ["name"]),
+    ("gfz_question_status", "gfz_Question", ["status"]),
+    ("gfz_module_day_stats", "gfz_ModuleDayStats", ["module_name", "day"]),
+]
+
+# 文本索引（支持 CONTAINS / ENDS WITH）：(名称, 标签, 属性)
+TEXT_INDEXES = [
+    ("gfz_knowledge_point_name_text", "gfz_KnowledgePoint", "name"),
+    ("gfz_case_title_text", "gfz_Case", "title"),
+]
+
+# 全文索引（Lucene，按相关度打分）：(名称, 标签, 属性列表, 分析器)；cjk 分析器把中文切成二元组
+FULLTEXT_INDEXES = [
+    ("gfz_knowledge_point_fulltext", "gfz_KnowledgePoint", ["name"], "cjk"),
+]
+
+# 热点查询：(说明, 查询, 参数)，EXPLAIN 检查其执行计划
+HOT_QUERIES = [
+    ("按学号查学生",
+     "MATCH (s:gfz_Student {student_id: $student_id}) RETURN s",
+     {"student_id": "_"}),
+    ("模块活动记录",
+     "MATCH (a:gfz_Activity) WHERE a.module_name = $module "
+     "RETURN a ORDER BY a.timestamp DESC LIMIT 100",
+     {"module": "_"}),
+    ("今日活动",
+     "MATCH (a:gfz_Activity) WHERE a.day_key = $today RETURN count(a)",
+     {"today": 20260101}),
+    ("近7天活动",
+     "MATCH (a:gfz_Activity) WHERE a.day_key >= $since RETURN a.day_key, count(*)",
+     {"since": 20260101}),
+    ("模块活动分页",
+     "MATCH (a:gfz_Activity) WHERE a.module_name = $module AND a.timestamp < datetime($cursor_ts) "
+     "RETURN a ORDER BY a.timestamp DESC LIMIT 51",
+     {"module": "_", "cursor_ts": "2026-01-01T00:00:00Z"}),
+    ("单模块汇总",
+     "MATCH (m:gfz_ModuleStats {module_name: $module}) RETURN m",
+     {"module": "_"}),
+    ("模块近7天汇总",
+     "MATCH (d:gfz_ModuleDayStats {module_name: $module}) WHERE d.day > date() - duration('P7D') "
+     "RETURN sum(d.visits)",
+     {"module": "_"}),
+    ("按ID查案例",
+     "MATCH (c:gfz_Case {id: $case_id}) RETURN c",
+     {"case_id": "_"}),
+    ("按ID查知识点",
+     "MATCH (k:gfz_KnowledgePoint {id: $kp_id}) RETURN k",
+     {"kp_id": "_"}),
+    ("知识点名称搜索",
+     "MATCH (k:gfz_KnowledgePoint) WHERE k.name CONTAINS $keyword RETURN k",
+     {"keyword": "_"}),
+    ("当前课堂问题",
+     "MATCH (q:gfz_Question {status: 'active'}) RETURN q ORDER BY q.created_at DESC LIMIT 1",
+     {}),
+]
+
+# ensure_schema_once 遇到瞬时错误后的重试间隔（秒），连续失败时加倍
+RETRY_BASE_DELAY = 30.0
+RETRY_MAX_DELAY = 600.0
+
+# 执行计划中表示全量扫描的算子
+_SCAN_OPERATORS = {"NodeByLabelScan", "AllNodesScan"}
+
+_VERSION_QUERY = """
+    MATCH (v:gfz_SchemaVersion {key: 'schema'})
+    RETURN v.version AS version, v.failed AS failed, v.failed_errors AS failed_errors
+"""
+
+_RECORD_VERSION_QUERY = """
+    MERGE (v:gfz_SchemaVersion {key: 'schema'})
+    SET v.version = $version, v.applied_at = datetime(),
+        v.failed = $failed, v.failed_errors = $failed_errors
+"""
+
+# 与唯一约束冲突的旧索引：同一标签、同一单属性、不属于任何约束的范围索引（4.x 中类型为 BTREE）
+_INDEXES_QUERY = """
+    SHOW INDEXES YIELD name, type, entityType, labelsOrTypes, properties, owningConstraint
+    WHERE entityType = 'NODE' AND type IN ['RANGE', 'BTREE'] AND owningConstraint IS NULL
+    RETURN name, labelsOrTypes AS labels, properties
+"""
+
+
+def _schema_statements():
+    """生成全部建约束/建索引语句：[(名称, cypher)]"""
+    statements = []
+    for name, label, prop in CONSTRAINTS:
+        statements.append((name, f"CREATE CONSTRAINT {name} IF NOT EXISTS "
+                                 f"FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE"))
+    for name, label, props in RANGE_INDEXES:
+        columns = ", ".join(f"n.{p}" for p in props)
+        statements.append((name, f"CREATE INDEX {name} IF NOT EXISTS FOR (n:{label}) ON ({columns})"))
+    for name, label, prop in TEXT_INDEXES:
+        statements.append((name, f"CREATE TEXT INDEX {name} IF NOT EXISTS FOR (n:{label}) ON (n.{prop})"))
+    for name, label, props, analyzer in FULLTEXT_INDEXES:
+        columns = ", ".join(f"n.{p}" for p in props)
+        statements.append((name, f"CREATE FULLTEXT INDEX {name} IF NOT EXISTS FOR (n:{label}) ON EACH [{columns}] "
+                                 f"OPTIONS {{indexConfig: {{`fulltext.analyzer`: '{analyzer}'}}}}"))
+    return statements
+
+
+def get_schema_state(driver):
+    """读取库中记录的模式版本和上次执行失败的语句：(版本, [(名称, 错误)])，未初始化时为 (0, [])"""
+    with driver.session() as session:
+        record = session.run(_VERSION_QUERY).single()
+    if not record or record['version'] is None:
+        return 0, []
+    names = record['failed'] or []
+    errors = record['failed_errors'] or []
+    return record['version'], [(name, errors[i] if i < len(errors) else "") for i, name in enumerate(names)]
+
+
+def get_schema_version(driver):
+    """读取库中记录的模式版本（未初始化时返回0）"""
+    return get_schema_state(driver)[0]
+
+
+def _drop_conflicting_indexes(session):
+    """删除与待建唯一约束同标签同属性的独立范围索引（旧版导入脚本建立），返回被删除的索引名"""
+    managed = {name for name, _, _ in RANGE_INDEXES}
+    targets = {(label, prop) for _, label, prop in CONSTRAINTS}
+    dropped = []
+    for record in session.run(_INDEXES_QUERY):
+        labels, props = record['labels'] or [], record['properties'] or []
+        if record['name'] in managed or len(labels) != 1 or len(props) != 1:
+            continue
+        if (labels[0], props[0]) in targets:
+            session.run(f"DROP INDEX `{record['name']}` IF EXISTS").consume()
+            dropped.append(record['name'])
+            print(f"[模式初始化] 已删除与唯一约束冲突的旧索引 {record['name']} ({labels[0]}.{props[0]})")
+    return dropped
+
+
+def ensure_schema(driver, force=False):
+    """
+    创建缺失的约束和索引并记录模式版本（全部语句带 IF NOT EXISTS，可重复执行）
+    库中版本已是最新且未指定 force 时直接返回（report['failed'] 为上次记录的失败项）
+    部分语句失败时仍记录版本和失败项，下次启动不再重试，需修复数据后用 force 重新执行
+    返回 {'version', 'applied', 'created': [名称], 'dropped': [名称], 'failed': [(名称, 错误)]}
+    """
+    current, recorded_failures = get_schema_state(driver)
+    report = {'version': current, 'applied': False, 'created': [], 'dropped': [], 'failed': []}
+    if current >= SCHEMA_VERSION and not force:
+        report['failed'] = recorded_failures
+        return report
+
+    with driver.session() as session:
+        try:
+            report['dropped'] = _drop_conflicting_indexes(session)
+        except Exception as e:
+            # 清理失败时冲突的约束会在下面失败并被记录，其余语句照常执行
+            print(f"[模式初始化] 检查旧索引失败: {e}")
+        for name, statement in _schema_statements():
+            try:
+                session.run(statement).consume()
+                report['created'].append(name)
+            except _TRANSIENT_ERRORS:
+                # 连接/超时问题与语句本身无关，不记录为失败，交给调用方稍后整体重试
+                raise
+            except Exception as e:
+                # 常见原因：已有重复数据导致唯一约束无法建立，其余语句继续执行
+                report['failed'].append((name, str(e)))
+                print(f"[模式初始化] {name} 创建失败: {e}")
+        session.run(_RECORD_VERSION_QUERY, version=SCHEMA_VERSION,
+                    failed=[name for name, _ in report['failed']],
+                    failed_errors=[error for _, error in report['failed']]).consume()
+        report['version'] = SCHEMA_VERSION
+    report['applied'] = True
+    print(f"[模式初始化] 版本 {current} -> {report['version']}，"
+          f"成功 {len(report['created'])} 项，失败 {len(report['failed'])} 项")
+    return report
+
+
+def _plan_operators(plan):
+    """递归收集执行计划中的算子名称（去掉 5.x 的 @neo4j 后缀）"""
+    if not plan:
+        return []
+    operator = plan.get('operatorType') or plan.get('operator_type') or ''
+    operators = [operator.split('@')[0]]
+    for child in plan.get('children', []):
+        operators.extend(_plan_operators(child))
+    return operators
+
+
+def verify_query_plans(driver, queries=None):
+    """
+    对热点查询执行 EXPLAIN（不真正执行），检查是否走索引
+    返回 [{'name', 'uses_index', 'operators', 'error'}]
+    """
+    results = []
+    with driver.session() as session:
+        for name, query, params in queries or HOT_QUERIES:
+            try:
+                summary = session.run("EXPLAIN " + query, **params).consume()
+                operators = _plan_operators(summary.plan)
+                uses_index = (any('Index' in op for op in operators)
+                              and not any(op in _SCAN_OPERATORS for op in operators))
+                results.append({'name': name, 'uses_index': uses_index, 'operators': operators, 'error': None})
+            except Exception as e:
+                results.append({'name': name, 'uses_index': False, 'operators': [], 'error': str(e)})
+    return results
+
+
+# 每个进程在首次连接成功后检查一次；检查抛出异常（连接中断、超时等）时按退避间隔重试，成功后不再检查
+_ensured = False
+_failures = 0
+_next_attempt = 0.0
+_ensure_lock = threading.Lock()
+
+
+def ensure_schema_once(driver):
+    """启动时调用：本进程内成功执行一次即可，出错时稍后重试，不影响应用运行"""
+    global _ensured, _failures, _next_attempt
+    if _ensured or time.monotonic() < _next_attempt:
+        return
+    with _ensure_lock:
+        if _ensured or time.monotonic() < _next_attempt:
+            return
+        try:
+            report = ensure_schema(driver)
+        except Exception as e:
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** _failures))
+            _failures += 1
+            _next_attempt = time.monotonic() + delay
+            print(f"[模式初始化] 失败，{delay:.0f}秒后重试: {e}")
+            return
+        _ensured = True
+        if report['failed'] and not report['applied']:
+            # 上次执行失败的语句不会自动重试，每次启动提示一次
+            names = ", ".join(name for name, _ in report['failed'])
+            print(f"[模式初始化] 警告：{len(report['failed'])} 项约束/索引未能建立（{names}），"
+                  f"修复数据后运行 scripts/init_neo4j_schema.py --force")
@@ -0,0 +1,121 @@
+"""
+前端静态资源模块
+vis-network 等前端库放在 static/lib 下，由 Streamlit 静态文件服务提供（.streamlit/config.toml 中 enableStaticServing）：
+- URL 带内容哈希（?v=...），文件内容不变则 URL 不变，浏览器长期缓存；更新文件后哈希变化，自动换新
+- Streamlit 对 .js/.css 静态文件以 text/plain 返回，不能直接用 <script src> 执行，
+  因此图谱页面用 loadStaticAssets() 以 fetch 取回文本后注入 <script>/<style>（fetch 同样走浏览器缓存）
+- 各图谱页面只发送图谱数据和这段很短的加载代码，不再每次内联或从 CDN 下载几百 KB 的库，离线也可用
+"""
+
+import hashlib
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+
+STATIC_DIR = Path(__file__).parent.parent / "static"
+
+VIS_NETWORK_JS = "lib/vis-9.1.2/vis-network.min.js"
+VIS_NETWORK_CSS = "lib/vis-9.1.2/vis-network.css"
+PYVIS_BINDINGS_JS = "lib/bindings/utils.js"
+
+# 按顺序取回 urls 中的资源并注入页面，全部完成后调用 done()；
+# 任一资源请求失败（非 2xx 或返回 HTML）时在图谱区域显示错误并写入控制台，再调用可选的 failed(error)
+LOADER_JS = """
+function loadStaticAssets(urls, done, failed) {
+    Promise.all(urls.map(function(url) {
+        return fetch(url).then(function(response) {
+            // 静态文件服务未开启或路径错误时会返回 404 或 HTML 页面，不能当作脚本注入
+            var type = response.headers.get("content-type") || "";
+            if (!response.ok || type.indexOf("text/html") >= 0) {
+                throw new Error(url + " 返回 HTTP " + response.status + (type ? " (" + type + ")" : ""));
+            }
+            return response.text();
+        });
+    })).then(function(texts) {
+        texts.forEach(function(text, i) {
+            var element;
+            if (/\\.css(\\?|$)/.test(urls[i])) {
+                element = document.createElement("style");
+                element.textContent = text;
+            } else {
+                element = document.createElement("script");
+                element.text = text;
+            }
+            document.head.appendChild(element);
+        });
+        done();
+    }).catch(function(error) {
+        console.error("[静态资源] 图谱加载失败:", error);
+        var container = document.getElementById("network") || document.getElementById("mynetwork") || document.body;
+        var message = document.createElement("div");
+        message.style.cssText = "padding:16px;color:#b91c1c;font-family:sans-serif;font-size:14px;";
+        message.textContent = "图谱加载失败：" + error.message + "。请检查 .streamlit/config.toml 中的 enableStaticServing 和 baseUrlPath 设置。";
+        container.innerHTML = "";
+        container.appendChild(message);
+        if (failed) {
+            failed(error);
+        }
+    });
+}
+"""
+
+# pyvis 生成的 HTML 中引用 vis-network（CDN）和 lib/bindings/utils.js（相对路径）的标签，
+# 以及模板固定带上的 bootstrap（CDN，图谱页面用不到它的组件）和注释掉的 node_modules 引用
+_PYVIS_ASSET_TAG = re.compile(
+    r'<script[^>]*src="[^"]*(?:vis-network|lib/bindings/utils\.js|bootstrap)[^"]*"[^>]*>\s*</script>'
+    r'|<link[^>]*href="[^"]*(?:vis-network|bootstrap)[^"]*"[^>]*>'
+    r'|<!--(?:(?!-->).)*node_modules(?:(?!-->).)*-->',
+    re.S
+)
+
+# 去掉 bootstrap 后补上模板依赖的少量基础样式（页面边距、卡片容器）
+_PYVIS_BASE_CSS = "<style>body{margin:0;} .card{border:1px solid rgba(0,0,0,.125);border-radius:.25rem;}</style>"
+
+# 页面中从外部地址加载的资源（src/href 指向 http(s)://）
+_REMOTE_ASSET = re.compile(r'(?:src|href)\s*=\s*["\'](https?://[^"\']+)["\']', re.I)
+
+
+def _base_path():
+    import streamlit as st
+    base = (st.get_option("server.baseUrlPath") or "").strip("/")
+    return f"/{base}" if base else ""
+
+
+@lru_cache(maxsize=32)
+def asset_url(path):
+    """static/ 下文件的 URL，带内容哈希"""
+    digest = hashlib.sha256((STATIC_DIR / path).read_bytes()).hexdigest()[:12]
+    return f"{_base_path()}/app/static/{path}?v={digest}"
+
+
+def vis_network_urls():
+    return [asset_url(VIS_NETWORK_CSS), asset_url(VIS_NETWORK_JS)]
+
+
+def loader_script():
+    """定义 loadStaticAssets() 的 <script> 标签"""
+    return f"<script type=\"text/javascript\">{LOADER_JS}</script>"
+
+
+def use_static_assets_in_pyvis(html):
+    """把 pyvis 生成的 HTML 改为从静态资源加载 vis-network 和 utils.js，加载完成后再调用 drawGraph()"""
+    call = "drawGraph();"
+    position = html.rfind(call)
+    if position < 0:
+        print("[静态资源] pyvis 模板中没有找到 drawGraph() 调用，保留原始资源引用")
+        return html
+    urls = vis_network_urls() + [asset_url(PYVIS_BINDINGS_JS)]
+    html = html[:position] + f"loadStaticAssets({json.dumps(urls)}, drawGraph);" + html[position + len(call):]
+    html = _PYVIS_ASSET_TAG.sub("", html)
+    # 放在 </head> 前：加载代码含中文，不挤到 <meta charset> 前面
+    html = html.replace("</head>", loader_script() + _PYVIS_BASE_CSS + "</head>", 1)
+    remote = remote_asset_urls(html)
+    if remote:
+        print(f"[静态资源] pyvis 页面仍引用外部资源，离线时无法加载: {remote}")
+    return html
+
+
+def remote_asset_urls(html):
+    """页面中从 http(s):// 加载的资源地址（离线可用的页面应为空列表）"""
+    return _REMOTE_ASSET.findall(html)
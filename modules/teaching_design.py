@@ -5,8 +5,10 @@
 
 import streamlit as st
 from datetime import datetime
-from openai import OpenAI
 from config.settings import *
+from modules.graph_repository import is_neo4j_available, read_query
+from modules.llm_client import get_llm_client
+from modules.llm_stream import stream_chat_completion, write_stream
 
 # 教学方法列表及其描述
 TEACHING_METHODS = {
@@ -42,63 +44,45 @@ TEACHING_METHODS = {
     }
 }
 
-def check_neo4j_available():
-    """检查Neo4j是否可用"""
-    from modules.auth import check_neo4j_available as auth_check
-    return auth_check()
-
-def get_neo4j_driver():
-    """获取Neo4j连接"""
-    from modules.auth import get_neo4j_driver as auth_get_driver
-    return auth_get_driver()
-
 def get_all_chapters():
     """获取所有章节及其所属模块"""
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return []
     
     try:
-        driver = get_neo4j_driver()
-        with driver.session() as session:
-            result = session.run(f"""
-                MATCH (m:{NEO4J_LABEL_MODULE_GFZ})-[:CONTAINS]->(c:{NEO4J_LABEL_CHAPTER_GFZ})
-                RETURN m.name as module_name, m.order as module_order, c.id as chapter_id, c.name as chapter_name, c.order as chapter_order
-                ORDER BY m.order, c.order
-            """)
-            chapters = [dict(record) for record in result]
-        return chapters
+        return read_query(f"""
+            MATCH (m:{NEO4J_LABEL_MODULE_GFZ})-[:CONTAINS]->(c:{NEO4J_LABEL_CHAPTER_GFZ})
+            RETURN m.name as module_name, m.order as module_order, c.id as chapter_id, c.name as chapter_name, c.order as chapter_order
+            ORDER BY m.order, c.order
+        """, name="章节列表")
     except Exception as e:
         st.error(f"获取章节列表失败: {e}")
         return []
 
 def get_chapter_knowledge_points(chapter_id):
     """获取章节下的所有知识点"""
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         return []
     
     try:
-        driver = get_neo4j_driver()
-        with driver.session() as session:
-            result = session.run(f"""
-                MATCH (c:{NEO4J_LABEL_CHAPTER_GFZ} {{id: $chapter_id}})-[:CONTAINS]->(k:{NEO4J_LABEL_KNOWLEDGE_GFZ})
-                RETURN k.name as name, k.importance as importance
-                ORDER BY k.importance DESC
-            """, chapter_id=chapter_id)
-            knowledge_points = [dict(record) for record in result]
-        return knowledge_points
+        return read_query(f"""
+            MATCH (c:{NEO4J_LABEL_CHAPTER_GFZ} {{id: $chapter_id}})-[:CONTAINS]->(k:{NEO4J_LABEL_KNOWLEDGE_GFZ})
+            RETURN k.name as name, k.importance as importance
+            ORDER BY k.importance DESC
+        """, {"chapter_id": chapter_id}, name="章节知识点")
     except Exception as e:
         st.error(f"获取知识点失败: {e}")
         return []
 
-def generate_teaching_design(chapter_name, knowledge_points, method_key):
-    """使用 DeepSeek AI 生成教学设计方案"""
+def generate_teaching_design(chapter_name, knowledge_points, method_key, stream=False):
+    """
+    使用 DeepSeek AI 生成教学设计方案
+    stream=True 时返回逐段产出文本的生成器，用 llm_stream.write_stream 显示
+    """
     method_info = TEACHING_METHODS.get(method_key, {})
     
     try:
-        client = OpenAI(
-            api_key=DEEPSEEK_API_KEY,
-            base_url=DEEPSEEK_BASE_URL
-        )
+        client = get_llm_client()
         
         # 构建知识点列表
         kp_text = "\n".join([f"- {kp['name']}（重要性：{kp.get('importance', 80)}）" for kp in knowledge_points])
@@ -168,7 +152,7 @@ def generate_teaching_design(chapter_name, knowledge_points, method_key):
 - 总字数2000-3000字
 """
         
-        response = client.chat.completions.create(
+        request = dict(
             model="deepseek-chat",
             messages=[
                 {"role": "system", "content": f"你是一位精通{method_key}教学法的高分子物理教育专家，擅长设计创新、有效的教学方案。"},
@@ -177,6 +161,11 @@ def generate_teaching_design(chapter_name, knowledge_points, method_key):
             temperature=0.7,
             max_tokens=4000
         )
+        if stream:
+            return stream_chat_completion(client, "教学方案",
+                                          on_error=lambda e: f"生成教学方案失败：{str(e)}", **request)
+        
+        response = client.chat.completions.create(**request)
         
         design = response.choices[0].message.content
         return design
@@ -190,7 +179,7 @@ def render_teaching_design():
     st.markdown("根据章节内容和教学方法，AI辅助生成教学设计方案")
     st.markdown("---")
     
-    if not check_neo4j_available():
+    if not is_neo4j_available():
         st.error("❌ Neo4j数据库连接失败，无法获取章节信息")
         return
     
@@ -270,13 +259,18 @@ def render_teaching_design():
         
         knowledge_points = get_chapter_knowledge_points(selected_chapter['chapter_id'])
         
-        with st.spinner(f"正在使用 {selected_method} 设计教学方案..."):
-            design = generate_teaching_design(
+        # 流式生成：方案边生成边显示，完成后清掉预览，由下方统一展示（含下载按钮）
+        preview = st.empty()
+        with preview.container():
+            st.caption(f"正在使用 {selected_method} 设计教学方案...")
+            design = write_stream(generate_teaching_design(
                 selected_chapter_name,
                 knowledge_points,
-                selected_method
-            )
-            
+                selected_method,
+                stream=True
+            ))
+        preview.empty()
+        if design:
             # 保存到 session state
             st.session_state['teaching_design'] = design
             st.session_state['teaching_design_info'] = {
@@ -0,0 +1,59 @@
+"""
+为历史活动回填日键/小时键
+gfz_Activity.day_key（YYYYMMDD）和 hour_key（YYYYMMDDHH）按 UTC 计算，新写入的活动自带这两个字段；
+升级前写入的活动运行一次本脚本即可；同时为只有旧字段 module 的活动补写 module_name。
+按批提交，中断后重新运行会从剩余记录继续
+"""
+
+import argparse
+import io
+import sys
+
+# 设置标准输出编码为 UTF-8
+if sys.stdout.encoding != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from neo4j import GraphDatabase
+from config.settings import NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD
+from modules.activity_rollup import BACKFILL_BATCH_SIZE, backfill_activity_keys, count_missing_keys
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="为历史活动回填日键/小时键")
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE, help="每批处理的活动数")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("🗓️ 活动日键回填工具")
+    print("=" * 60)
+    
+    if not all([NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD]):
+        print("❌ 错误：NEO4J 配置不完整")
+        return False
+    
+    try:
+        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+        print(f"待回填: {count_missing_keys(driver)} 条")
+        total = backfill_activity_keys(driver, batch_size=args.batch_size)
+        driver.close()
+        
+        print("\n" + "=" * 60)
+        print(f"✅ 回填完成，共 {total} 条")
+        print("=" * 60)
+        return True
+        
+    except Exception as e:
+        print(f"\n❌ 回填失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,85 @@
+"""
+知识图谱页面体积对比
+渲染完整课程图谱（不筛选模块）的两个页面，统计实际生成的 HTML 字节数（原始 / gzip）：
+- 交互式知识图谱（knowledge_graph_interactive.create_knowledge_graph_html）
+- 章节知识图谱（pyvis，knowledge_graph.create_knowledge_graph_viz）
+指定 --baseline 时，同样渲染另一份代码目录（如改动前版本的 git worktree）中的页面并对比：
+  git worktree add /tmp/graph-baseline <改动前的提交>
+  python scripts/benchmark_graph_payload.py --baseline /tmp/graph-baseline
+每份代码在单独的子进程中渲染，互不影响。使用内置示例数据，不需要数据库
+"""
+
+import argparse
+import gzip
+import io
+import json
+import subprocess
+import sys
+
+# 设置标准输出编码为 UTF-8
+if sys.stdout.encoding != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+PAGES = [
+    ("交互式图谱", "modules.knowledge_graph_interactive", "create_knowledge_graph_html", ()),
+    ("章节图谱(pyvis)", "modules.knowledge_graph", "create_knowledge_graph_viz", (None,)),
+]
+
+
+def measure(root):
+    """在 root 代码目录下渲染各页面，返回 {页面: [原始字节, gzip字节]}（在子进程中调用）"""
+    import importlib
+    sys.path.insert(0, str(root))
+    sizes = {}
+    for label, module_name, func_name, args in PAGES:
+        html = getattr(importlib.import_module(module_name), func_name)(*args)
+        data = html.encode("utf-8")
+        sizes[label] = [len(data), len(gzip.compress(data))]
+    return sizes
+
+
+def measure_in_subprocess(root):
+    result = subprocess.run([sys.executable, __file__, "--measure", str(root)],
+                            capture_output=True, text=True, encoding="utf-8", check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="知识图谱页面体积对比")
+    parser.add_argument("--baseline", help="对比用的另一份代码目录（如改动前版本的 git worktree）")
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.measure:
+        print(json.dumps(measure(args.measure), ensure_ascii=False))
+        return True
+    
+    print("=" * 60)
+    print("📦 知识图谱页面体积对比（完整课程图谱）")
+    print("=" * 60)
+    
+    current = measure_in_subprocess(PROJECT_ROOT)
+    baseline = measure_in_subprocess(Path(args.baseline).resolve()) if args.baseline else None
+    
+    if baseline is None:
+        print(f"\n{'页面':<16}{'原始(B)':>10}{'gzip(B)':>10}")
+        for label, (raw, compressed) in current.items():
+            print(f"{label:<16}{raw:>10}{compressed:>10}")
+        return True
+    
+    print(f"\n{'页面':<16}{'对比版本 原始/gzip':>20}{'当前 原始/gzip':>20}{'原始占比':>10}{'gzip占比':>10}")
+    for label, (raw, compressed) in current.items():
+        base_raw, base_gzip = baseline[label]
+        print(f"{label:<16}{f'{base_raw}/{base_gzip}':>20}{f'{raw}/{compressed}':>20}"
+              f"{raw / base_raw:>10.1%}{compressed / base_gzip:>10.1%}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,123 @@
+"""
+知识图谱索引性能对比
+把节点+关系形式的图谱复制扩展到约 5 万个节点，对比逐项扫描的旧实现和 KnowledgeGraphIndex 的
+节点查找、相关节点、模块子图耗时。只在本地内存中运行，不需要数据库
+"""
+
+import argparse
+import io
+import random
+import sys
+import time
+
+# 设置标准输出编码为 UTF-8
+if sys.stdout.encoding != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from data.knowledge_graph_graph_format import GFZ_KNOWLEDGE_GRAPH_NODES, KnowledgeGraphIndex
+
+
+def scale_graph(graph, target_nodes):
+    """把图谱整体复制若干份（id 加后缀）直到节点数不少于 target_nodes"""
+    copies = max(1, -(-target_nodes // len(graph["nodes"])))
+    nodes = []
+    relationships = []
+    for i in range(copies):
+        suffix = f"_r{i}"
+        for node in graph["nodes"]:
+            properties = dict(node.get("properties", {}))
+            for key in ("parent_module", "parent_chapter"):
+                if key in properties:
+                    properties[key] += suffix
+            nodes.append(dict(node, id=node["id"] + suffix, properties=properties))
+        for rel in graph["relationships"]:
+            relationships.append(dict(rel, source=rel["source"] + suffix, target=rel["target"] + suffix))
+    return {"nodes": nodes, "relationships": relationships}
+
+
+# ---------- 旧实现（逐项扫描），作为对比基准 ----------
+
+def scan_node_by_id(graph, node_id):
+    for node in graph["nodes"]:
+        if node["id"] == node_id:
+            return node
+    return None
+
+
+def scan_related_nodes(graph, node_id):
+    related = {"outgoing": [], "incoming": []}
+    for rel in graph["relationships"]:
+        if rel["source"] == node_id:
+            target_node = scan_node_by_id(graph, rel["target"])
+            if target_node:
+                related["outgoing"].append({"node": target_node, "relationship": rel})
+        elif rel["target"] == node_id:
+            source_node = scan_node_by_id(graph, rel["source"])
+            if source_node:
+                related["incoming"].append({"node": source_node, "relationship": rel})
+    return related
+
+
+def scan_module_subgraph(graph, module_id):
+    module_nodes = [n for n in graph["nodes"]
+                    if n["id"] == module_id or n.get("properties", {}).get("parent_module") == module_id]
+    module_node_ids = set(n["id"] for n in module_nodes)
+    module_rels = [r for r in graph["relationships"]
+                   if r["source"] in module_node_ids and r["target"] in module_node_ids]
+    return {"nodes": module_nodes, "relationships": module_rels}
+
+
+def timed(func, args_list):
+    """依次调用 func(*args)，返回平均每次耗时（毫秒）"""
+    start = time.perf_counter()
+    for args in args_list:
+        func(*args)
+    return (time.perf_counter() - start) * 1000 / len(args_list)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="知识图谱索引性能对比")
+    parser.add_argument("--nodes", type=int, default=50000, help="扩展后的目标节点数")
+    parser.add_argument("--samples", type=int, default=20, help="每项操作的调用次数")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("⏱️ 知识图谱索引性能对比")
+    print("=" * 60)
+    
+    random.seed(42)
+    graph = scale_graph(GFZ_KNOWLEDGE_GRAPH_NODES, args.nodes)
+    print(f"📊 节点 {len(graph['nodes'])} 个，关系 {len(graph['relationships'])} 条")
+    
+    start = time.perf_counter()
+    index = KnowledgeGraphIndex(graph)
+    print(f"🔨 构建索引: {(time.perf_counter() - start) * 1000:.1f}ms（一次性）")
+    
+    node_ids = [(random.choice(graph["nodes"])["id"],) for _ in range(args.samples)]
+    module_ids = [(node["id"],) for node in random.sample(
+        [node for node in graph["nodes"] if node["category"] == "模块"], args.samples)]
+    
+    cases = [
+        ("节点查找", lambda node_id: scan_node_by_id(graph, node_id), index.get_node, node_ids),
+        ("相关节点", lambda node_id: scan_related_nodes(graph, node_id), index.get_related_nodes, node_ids),
+        ("模块子图", lambda module_id: scan_module_subgraph(graph, module_id), index.subgraph, module_ids),
+    ]
+    print(f"\n{'操作':<8}{'逐项扫描(ms)':>14}{'索引(ms)':>12}{'加速':>10}")
+    for label, baseline, indexed, samples in cases:
+        baseline_ms = timed(baseline, samples)
+        # 子图结果有缓存，这里清空后计时，反映首次查询的成本
+        index._subgraphs.clear()
+        indexed_ms = timed(indexed, samples)
+        print(f"{label:<8}{baseline_ms:>14.3f}{indexed_ms:>12.4f}{baseline_ms / max(indexed_ms, 1e-6):>9.0f}x")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
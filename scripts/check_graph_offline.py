@@ -0,0 +1,54 @@
+"""
+检查知识图谱页面离线可用
+渲染 pyvis 章节图谱页面（全部模块）、交互式图谱页面和渐进式探索组件的 HTML，
+确认其中没有从 http(s):// 加载的资源（前端库都应来自 static/lib）。
+使用内置示例数据时不需要数据库；发现外部资源时以非零状态退出
+"""
+
+import io
+import sys
+
+# 设置标准输出编码为 UTF-8
+if sys.stdout.encoding != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from modules.static_assets import remote_asset_urls
+
+EXPLORER_HTML = Path(__file__).parent.parent / "modules" / "graph_explorer_frontend" / "index.html"
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("🔌 知识图谱页面离线检查")
+    print("=" * 60)
+    
+    from modules.knowledge_graph import create_knowledge_graph_viz
+    from modules.knowledge_graph_interactive import create_knowledge_graph_html
+    pages = [
+        ("章节知识图谱（pyvis）", create_knowledge_graph_viz(None)),
+        ("交互式知识图谱", create_knowledge_graph_html()),
+        ("渐进式探索组件", EXPLORER_HTML.read_text(encoding="utf-8")),
+    ]
+    
+    ok = True
+    for name, html in pages:
+        remote = remote_asset_urls(html)
+        if remote:
+            ok = False
+            print(f"  ✗ {name}: {len(remote)} 个外部资源")
+            for url in remote:
+                print(f"      {url}")
+        else:
+            print(f"  ✓ {name}: 无外部资源（{len(html.encode('utf-8'))} 字节）")
+    return ok
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -22,6 +22,7 @@ from neo4j import GraphDatabase
 from config.settings import NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD
 from data.cases_gfz import CASES_GFZ
 from data.knowledge_graph_gfz import GFZ_KNOWLEDGE_GRAPH
+from modules.schema_manager import ensure_schema
 
 class DataImporter:
     def __init__(self, uri, username, password):
@@ -186,24 +187,12 @@ class DataImporter:
                 print(f"  ✗ 知识图谱导入失败: {e}")
     
     def create_indexes(self):
-        """创建数据库索引以提高查询性能"""
-        print("\n⚡ 创建数据库索引...")
-        with self.driver.session() as session:
-            try:
-                # 为案例创建索引
-                session.run("CREATE INDEX IF NOT EXISTS FOR (c:gfz_Case) ON (c.id)")
-                print("  ✓ 创建案例索引")
-                
-                # 为知识节点创建索引
-                session.run("CREATE INDEX IF NOT EXISTS FOR (k:gfz_KnowledgeNode) ON (k.id)")
-                print("  ✓ 创建知识节点索引")
-                
-                # 为学生创建索引
-                session.run("CREATE INDEX IF NOT EXISTS FOR (s:gfz_Student) ON (s.student_id)")
-                print("  ✓ 创建学生索引")
-                
-            except Exception as e:
-                print(f"  ⚠ 索引创建失败（可能已存在）: {e}")
+        """创建数据库约束和索引以提高查询性能（统一由 schema_manager 维护）"""
+        print("\n⚡ 创建数据库约束和索引...")
+        report = ensure_schema(self.driver, force=True)
+        print(f"  ✓ 已创建/确认 {len(report['created'])} 项，模式版本 {report['version']}")
+        for name, error in report['failed']:
+            print(f"  ⚠ {name} 创建失败: {error}")
     
     def verify_import(self):
         """验证导入结果"""
@@ -0,0 +1,80 @@
+"""
+初始化 Neo4j 约束和索引
+用法：
+  python scripts/init_neo4j_schema.py           # 版本落后时创建缺失的约束/索引
+  python scripts/init_neo4j_schema.py --force   # 无论版本都重新执行（语句幂等）
+  python scripts/init_neo4j_schema.py --verify  # 只检查热点查询的执行计划
+"""
+
+import io
+import sys
+
+# 设置标准输出编码为 UTF-8
+if sys.stdout.encoding != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from neo4j import GraphDatabase
+from config.settings import NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD
+from modules.schema_manager import SCHEMA_VERSION, ensure_schema, verify_query_plans
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="初始化 Neo4j 约束和索引")
+    parser.add_argument("--force", action="store_true", help="忽略已记录的模式版本，重新执行全部语句")
+    parser.add_argument("--verify", action="store_true", help="只检查热点查询的执行计划")
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print(f"⚡ Neo4j 模式初始化工具（目标版本 {SCHEMA_VERSION}）")
+    print("=" * 60)
+    
+    if not all([NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD]):
+        print("❌ 错误：NEO4J 配置不完整")
+        return False
+    
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+    try:
+        ok = True
+        if not args.verify:
+            report = ensure_schema(driver, force=args.force)
+            if report['applied']:
+                for name in report['dropped']:
+                    print(f"\n✓ 已删除与唯一约束冲突的旧索引 {name}")
+                print(f"\n✓ 已创建/确认 {len(report['created'])} 项约束和索引")
+            else:
+                print(f"\n✓ 模式已是最新版本 {report['version']}，无需执行（使用 --force 强制重建）")
+            if report['failed']:
+                print(f"\n⚠ {len(report['failed'])} 项未能建立（修复数据后使用 --force 重试）:")
+            for name, error in report['failed']:
+                print(f"  ✗ {name}: {error}")
+            ok = not report['failed']
+        
+        print("\n🔍 热点查询执行计划检查:")
+        for result in verify_query_plans(driver):
+            if result['error']:
+                print(f"  ✗ {result['name']}: {result['error']}")
+                ok = False
+            elif result['uses_index']:
+                print(f"  ✓ {result['name']}: 索引查找")
+            else:
+                print(f"  ⚠ {result['name']}: 未使用索引 ({' -> '.join(result['operators'])})")
+                ok = False
+        return ok
+    except Exception as e:
+        print(f"\n❌ 执行失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        driver.close()
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
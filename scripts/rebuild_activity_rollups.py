@@ -0,0 +1,52 @@
+"""
+从原始活动记录重建学习统计汇总
+清空 gfz_ModuleStats / gfz_ModuleDayStats / VISITED_MODULE 并按全部 gfz_Activity 重新计算，
+同时重算 gfz_Student.activity_count。首次上线汇总计数或发现计数偏差时运行
+"""
+
+import io
+import sys
+
+# 设置标准输出编码为 UTF-8
+if sys.stdout.encoding != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from neo4j import GraphDatabase
+from config.settings import NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD
+from modules.activity_rollup import rebuild_rollups
+
+
+def main():
+    """主函数"""
+    print("=" * 60)
+    print("🔄 学习统计汇总重建工具")
+    print("=" * 60)
+    
+    if not all([NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD]):
+        print("❌ 错误：NEO4J 配置不完整")
+        return False
+    
+    try:
+        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+        timings = rebuild_rollups(driver)
+        driver.close()
+        
+        print("\n" + "=" * 60)
+        print(f"✅ 汇总重建完成，总用时 {sum(timings.values()):.2f} 秒")
+        print("=" * 60)
+        return True
+        
+    except Exception as e:
+        print(f"\n❌ 重建失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)